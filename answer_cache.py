@@ -0,0 +1,172 @@
+"""Semantic cache for LLM answers, stored in a local SQLite file.
+
+An answer is reusable only within its scope: the same prompt template, the same
+role, the same module and the same retrieved policy chunks. Within a scope, a
+new question hits the cache when its embedding is close enough (cosine) to one
+that was already answered. Scopes are small, so lookup is a brute-force
+similarity over a handful of rows.
+
+Inspect or purge the cache with::
+
+    python answer_cache.py stats
+    python answer_cache.py purge [--template module_question]
+"""
+import argparse
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+import config
+
+# Stands in for the trainee's name in stored answers, so one trainee's answer can be replayed to another
+USER_NAME_TOKEN = "\x00user_name\x00"
+
+
+def scope_key(template_id: str, role: str, module: str, context_ids: Sequence[str], extra: str = "") -> str:
+    key_material = [template_id, role, module, sorted(context_ids), extra]
+    return f"{template_id}:" + hashlib.sha256(json.dumps(key_material).encode("utf-8")).hexdigest()[:32]
+
+
+def _address_pattern(user_name: str) -> "re.Pattern":
+    """The name where the answer addresses the trainee: "Hello Ada!", "Great question, Ada.", "Ada, note that..."
+
+    Only these positions are replaced, so a name that is also a word ("Will", "May", "Hope") leaves the policy text alone.
+    """
+    return re.compile(
+        rf"(^|[.!?]\s+|,\s*|\b(?:Hi|Hello|Hey|Dear|Thanks|Thank you|welcome)\s+){re.escape(user_name)}(?=\s*[,.!?:;]|\s*$)",
+        re.MULTILINE,
+    )
+
+
+def _anonymize(answer: str, user_name: str) -> Optional[str]:
+    """The answer with the trainee's name tokenised, or None if it still mentions them somewhere else"""
+    if not user_name.strip():
+        return answer
+    answer = _address_pattern(user_name).sub(lambda match: match.group(1) + USER_NAME_TOKEN, answer)
+    if re.search(rf"\b{re.escape(user_name)}\b", answer):
+        # Not worth the risk of replaying it, name included, to someone else
+        return None
+    return answer
+
+
+class SemanticAnswerCache:
+    """Nearest-neighbour answer lookup per scope, with TTL and size-based eviction"""
+
+    def __init__(
+        self,
+        path: str = config.ANSWER_CACHE_PATH,
+        max_entries: int = config.ANSWER_CACHE_MAX_ENTRIES,
+        ttl_seconds: float = config.ANSWER_CACHE_TTL_SECONDS,
+    ):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=30, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS answers ("
+            " id INTEGER PRIMARY KEY, scope TEXT NOT NULL, question TEXT NOT NULL, embedding BLOB NOT NULL,"
+            " answer TEXT NOT NULL, created REAL NOT NULL, last_hit REAL NOT NULL, hits INTEGER NOT NULL DEFAULT 0)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS answers_scope ON answers (scope)")
+
+    @staticmethod
+    def _unit(embedding: Sequence[float]) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def lookup(self, scope: str, question_embedding: Sequence[float], threshold: float, user_name: str = "") -> Optional[str]:
+        """Cached answer for the most similar question in scope, if it clears the threshold"""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT id, embedding, answer FROM answers WHERE scope = ? AND created >= ?",
+                (scope, time.time() - self.ttl_seconds),
+            ).fetchall()
+            if not rows:
+                self.misses += 1
+                return None
+            matrix = np.vstack([np.frombuffer(blob, dtype=np.float32) for _, blob, _ in rows])
+            similarities = matrix @ self._unit(question_embedding)
+            best = int(np.argmax(similarities))
+            if similarities[best] < threshold:
+                self.misses += 1
+                return None
+            entry_id, _, answer = rows[best]
+            self._db.execute("UPDATE answers SET hits = hits + 1, last_hit = ? WHERE id = ?", (time.time(), entry_id))
+            self.hits += 1
+        return answer.replace(USER_NAME_TOKEN, user_name)
+
+    def store(self, scope: str, question: str, question_embedding: Sequence[float], answer: str, user_name: str = "") -> None:
+        answer = _anonymize(answer, user_name)
+        if answer is None:
+            return
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO answers (scope, question, embedding, answer, created, last_hit) VALUES (?, ?, ?, ?, ?, ?)",
+                (scope, question, self._unit(question_embedding).tobytes(), answer, now, now),
+            )
+            self._evict(now)
+
+    def _evict(self, now: float) -> None:
+        self._db.execute("DELETE FROM answers WHERE created < ?", (now - self.ttl_seconds,))
+        self._db.execute(
+            "DELETE FROM answers WHERE id NOT IN (SELECT id FROM answers ORDER BY last_hit DESC LIMIT ?)",
+            (self.max_entries,),
+        )
+
+    def purge(self, template_id: Optional[str] = None) -> int:
+        """Delete every cached answer, or only those produced by one prompt template"""
+        with self._lock:
+            if template_id:
+                cursor = self._db.execute("DELETE FROM answers WHERE scope LIKE ?", (f"{template_id}:%",))
+            else:
+                cursor = self._db.execute("DELETE FROM answers")
+            return cursor.rowcount
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            entries, saved = self._db.execute("SELECT COUNT(*), COALESCE(SUM(hits), 0) FROM answers").fetchone()
+            lookups = self.hits + self.misses
+            return {
+                "entries": entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                # Every hit is one LLM round trip that never happened; this total survives restarts
+                "llm_calls_saved": saved,
+            }
+
+
+# --- CLI ---
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Inspect or purge the tutor's semantic answer cache.")
+    parser.add_argument("--path", default=config.ANSWER_CACHE_PATH, help="SQLite file holding the cache")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    subcommands.add_parser("stats", help="Show entry count and LLM calls saved")
+    purge_parser = subcommands.add_parser("purge", help="Delete cached answers")
+    purge_parser.add_argument("--template", help="Only purge answers from this prompt template id")
+    args = parser.parse_args(argv)
+
+    cache = SemanticAnswerCache(args.path)
+    if args.command == "purge":
+        print(f"Purged {cache.purge(args.template)} cached answers")
+    else:
+        stats = cache.stats()
+        print(f"{stats['entries']} cached answers, {stats['llm_calls_saved']} LLM calls saved")
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,105 @@
+"""Offline accuracy and latency of the local challenge grader.
+
+Grades every answer in a labelled CSV (module, role, answer, label) with the
+keyword check the app used before, with the embedding grader, and the way the
+app decides: a keyword hit is correct, the grader decides the rest, and the
+answers it leaves uncertain are the ones that would still go to the LLM. Run
+from the repository root::
+
+    python -m benchmarks.challenge_grading [--csv PATH] [--min-similarity 0.6] [--margin 0.1] [--json out.json]
+"""
+import argparse
+import csv
+import json
+import os
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+
+import config
+from challenge_grader import CORRECT, UNCERTAIN, ChallengeGrader
+from modules import ALL_MODULES, ROLE_SPECIFIC_SCENARIOS
+from rag_index import get_embedding_model
+
+DEFAULT_CSV = os.path.join(os.path.dirname(__file__), "data", "challenge_answers.csv")
+
+
+def find_challenge(module_id: str, role: str = "") -> dict:
+    """The challenge a trainee in this role sees in this module, as customize_module_content builds it"""
+    module_name = next(name for name in ALL_MODULES if name.split(":")[0] == module_id)
+    challenge = next(step["content"] for step in ALL_MODULES[module_name] if step["type"] == "challenge")
+    scenario = ROLE_SPECIFIC_SCENARIOS.get(module_id, {}).get(role)
+    if scenario is None:
+        return challenge
+    return {
+        "prompt": scenario["scenario"],
+        "correct_answer_keyword": challenge["correct_answer_keyword"],
+        "reference_answers": scenario.get("reference_answers", {}),
+    }
+
+
+def run(rows: List[Dict[str, str]], grader: ChallengeGrader) -> dict:
+    challenges = [find_challenge(row["module"], row.get("role", "")) for row in rows]
+    # Embed every reference set up front so latencies reflect steady state
+    for challenge in challenges:
+        grader.grade(challenge, "warm up")
+
+    keyword_hits, decided, decided_hits, app_hits, app_to_llm, seconds = 0, 0, 0, 0, 0, []
+    for row, challenge in zip(rows, challenges):
+        expected = row["label"] == CORRECT
+        keyword_verdict = challenge["correct_answer_keyword"].lower() in row["answer"].lower()
+        keyword_hits += keyword_verdict == expected
+
+        started = time.perf_counter()
+        grade = grader.grade(challenge, row["answer"])
+        seconds.append(time.perf_counter() - started)
+        if grade.verdict != UNCERTAIN:
+            decided += 1
+            decided_hits += (grade.verdict == CORRECT) == expected
+        # As handle_flexible_challenge_response: the keyword first, then the grader; with no LLM, uncertain is incorrect
+        app_hits += (keyword_verdict or grade.verdict == CORRECT) == expected
+        app_to_llm += not keyword_verdict and grade.verdict == UNCERTAIN
+
+    latencies_ms = np.array(seconds) * 1000
+    total = len(rows)
+    return {
+        "answers": total,
+        "keyword_accuracy": keyword_hits / total,
+        "local_coverage": decided / total,
+        "local_accuracy": decided_hits / decided if decided else 0.0,
+        "sent_to_llm": app_to_llm,
+        # Accuracy of the app's decision with no LLM at all
+        "offline_accuracy": app_hits / total,
+        "latency_ms_p50": float(np.percentile(latencies_ms, 50)),
+        "latency_ms_p95": float(np.percentile(latencies_ms, 95)),
+        "latency_ms_max": float(latencies_ms.max()),
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the local challenge grader against labelled answers.")
+    parser.add_argument("--csv", default=DEFAULT_CSV, help="Labelled answers: module, role, answer, label")
+    parser.add_argument("--min-similarity", type=float, default=config.CHALLENGE_GRADER_MIN_SIMILARITY)
+    parser.add_argument("--margin", type=float, default=config.CHALLENGE_GRADER_MARGIN)
+    parser.add_argument("--json", help="Also write the results to this file")
+    args = parser.parse_args(argv)
+
+    with open(args.csv, newline="", encoding="utf-8") as f:
+        rows = list(csv.DictReader(f))
+    grader = ChallengeGrader(get_embedding_model(), min_similarity=args.min_similarity, margin=args.margin)
+    results = run(rows, grader)
+
+    print(f"{results['answers']} labelled answers")
+    print(f"keyword check accuracy     {results['keyword_accuracy']:.1%}")
+    print(f"local grader coverage      {results['local_coverage']:.1%}")
+    print(f"local grader accuracy      {results['local_accuracy']:.1%} of the answers it decided")
+    print(f"app accuracy (no LLM)      {results['offline_accuracy']:.1%} ({results['sent_to_llm']} left for the LLM)")
+    print(f"latency p50/p95/max        {results['latency_ms_p50']:.2f} / {results['latency_ms_p95']:.2f} / {results['latency_ms_max']:.2f} ms")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
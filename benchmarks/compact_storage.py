@@ -0,0 +1,148 @@
+"""Memory and recall of the compact storage mode against the LangChain representation.
+
+Each representation is loaded into a fresh process with memory maps off
+(UETCL_INDEX_MMAP=0), so everything it needs is private to that process:
+
+    langchain      float32 flat index, a Document and metadata dict per chunk in
+                   LangChain's InMemoryDocstore, a dict of ids
+    compact flat   float32 flat index, chunk texts in one UTF-8 buffer and their
+                   ids and metadata in NumPy columns (chunk_store.py)
+    SQfp16, SQ8    the same chunk store, float16 or int8 vectors; with
+                   rescoring, the top k*FAISS_RESCORE_FACTOR candidates are
+                   re-ranked by their float32 vectors, read from a memory map
+
+For each it reports what loading added to the process's private memory
+(RssAnon) and its mapped file pages (RssFile) after the searches, recall@k of
+the index's top-k against an exact float32 search, and the latency of a search
+that returns Documents. Queries are the training CSV's questions. --scale N
+stretches the corpus with N-1 jittered copies, in a temporary directory. Linux
+only (/proc). Run from the repository root::
+
+    python -m benchmarks.compact_storage [--scale 100] [--k 5] [--json out.json]
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from typing import List, Optional
+
+import faiss
+import numpy as np
+import pandas as pd
+
+import config
+from benchmarks.worker_memory import build_scaled_artifact, process_memory_kb
+from index_factory import convert_index, is_lossy
+from rag_index import (
+    INDEX_FILE, META_FILE, artifact_dir_for, get_embedding_model, load_index_artifact, load_or_build_vector_store, save_index_artifact,
+)
+
+# Name -> (factory string, rescore factor); the first is the current representation
+VARIANTS = {
+    "langchain": (None, 0),
+    "compact flat": ("Flat", 0),
+    "SQfp16": ("SQfp16", 0),
+    "SQfp16 rescored": ("SQfp16", config.FAISS_RESCORE_FACTOR),
+    "SQ8": ("SQ8", 0),
+    "SQ8 rescored": ("SQ8", config.FAISS_RESCORE_FACTOR),
+}
+
+
+# --- WORKER ---
+def run_worker(artifact_dir: str, data_dir: str, k: int, rescore_factor: int, writable: bool) -> None:
+    queries = np.load(os.path.join(data_dir, "queries.npy"))
+    truth = np.load(os.path.join(data_dir, "truth.npy"))
+    before = process_memory_kb()
+    vector_store = load_index_artifact(artifact_dir, None, mapped=False, writable=writable, rescore_factor=rescore_factor)
+    if vector_store is None:
+        raise RuntimeError(f"Could not load {artifact_dir}")
+    _, found = vector_store.index.search(queries, k)
+    recall = float(np.mean([len(set(f[f >= 0]) & set(t)) / k for f, t in zip(found, truth)]))
+    seconds = []
+    for query in queries:
+        started = time.perf_counter()
+        vector_store.similarity_search_with_score_by_vector(query.tolist(), k=k)
+        seconds.append(time.perf_counter() - started)
+    after = process_memory_kb()
+    print(json.dumps({
+        "anon_added_mb": (after["RssAnon"] - before["RssAnon"]) / 1024,
+        "file_added_mb": (after["RssFile"] - before["RssFile"]) / 1024,
+        f"recall_at_{k}": recall,
+        "latency_ms_p50": float(np.percentile(np.array(seconds) * 1000, 50)),
+    }))
+
+
+# --- ARTIFACTS ---
+def write_variant(flat_dir: str, target_dir: str, factory: str) -> None:
+    """The flat artifact converted to another index type, with the float32 vectors for rescoring when lossy"""
+    vector_store = load_index_artifact(flat_dir, None, writable=True)
+    flat_index = vector_store.index
+    vector_store.index = convert_index(flat_index, factory)
+    os.makedirs(target_dir, exist_ok=True)
+    rescore_vectors = flat_index.reconstruct_n(0, flat_index.ntotal) if is_lossy(factory) else None
+    save_index_artifact(vector_store, target_dir, rescore_vectors=rescore_vectors)
+    shutil.copy(os.path.join(flat_dir, META_FILE), os.path.join(target_dir, META_FILE))
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Compare memory and recall of compact storage with the LangChain representation.")
+    parser.add_argument("--scale", type=int, default=1, help="Multiply the corpus with jittered copies")
+    parser.add_argument("--k", type=int, default=config.RETRIEVER_K, help="Neighbours per query")
+    parser.add_argument("--json", help="Also write the results to this file")
+    # Set by the parent on the processes it starts
+    parser.add_argument("--worker", nargs=2, help=argparse.SUPPRESS)
+    parser.add_argument("--rescore", type=int, default=0, help=argparse.SUPPRESS)
+    parser.add_argument("--writable", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.worker:
+        run_worker(*args.worker, args.k, args.rescore, args.writable)
+        return 0
+
+    load_or_build_vector_store()
+    embedding_model = get_embedding_model(config.EMBEDDING_MODEL_NAME)
+    work_dir = tempfile.mkdtemp(prefix="compact-storage-")
+    try:
+        flat_dir = os.path.join(work_dir, "Flat")
+        build_scaled_artifact(artifact_dir_for(), flat_dir, max(1, args.scale), embedding_model)
+        flat = faiss.read_index(os.path.join(flat_dir, INDEX_FILE))
+        questions = pd.read_csv(config.TRAINING_DATA_PATH)["Question"].dropna().astype(str).unique().tolist()
+        queries = np.asarray(embedding_model.embed_documents(questions), dtype=np.float32)
+        np.save(os.path.join(work_dir, "queries.npy"), queries)
+        np.save(os.path.join(work_dir, "truth.npy"), flat.search(queries, args.k)[1])
+        chunks = flat.ntotal
+        del flat
+
+        results = []
+        for name, (factory, rescore) in VARIANTS.items():
+            artifact_dir = flat_dir if factory in (None, "Flat") else os.path.join(work_dir, factory)
+            if not os.path.exists(artifact_dir):
+                write_variant(flat_dir, artifact_dir, factory)
+            command = [sys.executable, "-m", "benchmarks.compact_storage", "--worker", artifact_dir, work_dir,
+                       "--k", str(args.k), "--rescore", str(rescore)]
+            if factory is None:
+                command.append("--writable")
+            child = subprocess.run(command, capture_output=True, text=True, env=dict(os.environ, UETCL_INDEX_MMAP="0"))
+            if child.returncode:
+                sys.stderr.write(child.stderr)
+                return 1
+            results.append({"representation": name, "rescore_factor": rescore, **json.loads(child.stdout.strip().splitlines()[-1])})
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    print(f"{chunks} chunks, {len(queries)} queries, k={args.k}")
+    print(f"{'representation':<16} {'private MB':>10} {'mapped MB':>10} {'recall':>7} {'p50 ms':>8}")
+    for row in results:
+        print(f"{row['representation']:<16} {row['anon_added_mb']:>10.1f} {row['file_added_mb']:>10.1f} "
+              f"{row[f'recall_at_{args.k}']:>7.3f} {row['latency_ms_p50']:>8.3f}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"chunks": chunks, "queries": len(queries), "k": args.k, "results": results}, f, indent=2)
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
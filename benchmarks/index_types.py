@@ -0,0 +1,136 @@
+"""Recall, latency and memory of each FAISS index type against the exact flat index.
+
+The corpus is the current index's chunk set, embedded with the configured
+model (served from the embedding cache after the first build). The queries
+are the questions in the training Q&A CSV. For every configuration the flat
+index's top-k is the ground truth. ``--scale N`` adds N-1 slightly jittered
+copies of the corpus to see how the index types behave as the collection
+grows. Run from the repository root::
+
+    python -m benchmarks.index_types [--k 5] [--scale 1] [--config HNSW32:efSearch=32 ...] [--json out.json]
+
+``rescore=N`` re-ranks the top k*N candidates by their float32 vectors, as the
+tutor does for lossy (SQ, PQ) index types; memory is the index's own, without
+those vectors, which the tutor memory-maps.
+"""
+import argparse
+import json
+import os
+import time
+from typing import Dict, List, Optional, Tuple
+
+import faiss
+import numpy as np
+import pandas as pd
+
+import config
+from index_factory import RescoredIndex, apply_search_params, build_index, index_memory_bytes, resolve_factory_string
+from rag_index import CHUNKS_FILE, artifact_dir_for, chunk_id, get_embedding_model, load_corpus_chunks
+
+# Factory string and search parameters; PQ uses 4-bit codes because the corpus is too small to train 8-bit ones
+DEFAULT_CONFIGS = [
+    "Flat",
+    "HNSW32:efSearch=16",
+    "HNSW32:efSearch=64",
+    "IVFauto,Flat:nprobe=1",
+    "IVFauto,Flat:nprobe=8",
+    "IVFauto,PQ48x4:nprobe=8",
+    "IVFauto,PQ48x4:nprobe=8,rescore=4",
+    "SQfp16",
+    "SQ8",
+    "SQ8:rescore=4",
+]
+
+
+def parse_config(spec: str) -> Tuple[str, Dict[str, int]]:
+    """'IVFauto,Flat:nprobe=8' -> ('IVFauto,Flat', {'nprobe': 8})"""
+    factory, _, params = spec.partition(":")
+    return factory, {name: int(value) for name, value in (p.split("=") for p in params.split(",") if p)}
+
+def corpus_texts() -> List[str]:
+    """The indexed chunks, read from the artifact when there is one"""
+    path = os.path.join(artifact_dir_for(), CHUNKS_FILE)
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            texts = [json.loads(line)["text"] for line in f]
+    else:
+        texts = load_corpus_chunks(config.POLICY_MANUAL_PATH, config.TRAINING_DATA_PATH, config.CHUNK_SIZE, config.CHUNK_OVERLAP)
+    return list({chunk_id(text): text for text in texts}.values())
+
+def scaled_corpus(vectors: np.ndarray, scale: int, seed: int = 0) -> np.ndarray:
+    if scale <= 1:
+        return vectors
+    rng = np.random.default_rng(seed)
+    noise = float(vectors.std()) * 0.05
+    copies = [vectors] + [vectors + rng.normal(0, noise, vectors.shape).astype(np.float32) for _ in range(scale - 1)]
+    return np.vstack(copies)
+
+
+def run(vectors: np.ndarray, queries: np.ndarray, configs: List[str], k: int, repeat: int) -> List[dict]:
+    exact = faiss.IndexFlatL2(vectors.shape[1])
+    exact.add(vectors)
+    _, truth = exact.search(queries, k)
+
+    results = []
+    for spec in configs:
+        factory, params = parse_config(spec)
+        started = time.perf_counter()
+        index = build_index(vectors, factory)
+        build_seconds = time.perf_counter() - started
+        apply_search_params(index, nprobe=params.get("nprobe"), ef_search=params.get("efSearch"))
+        if params.get("rescore"):
+            index = RescoredIndex(index, vectors, params["rescore"])
+
+        _, found = index.search(queries, k)
+        recall = np.mean([len(set(f[f >= 0]) & set(t)) / k for f, t in zip(found, truth)])
+
+        seconds = []
+        for _ in range(repeat):
+            for query in queries:
+                started = time.perf_counter()
+                index.search(query[None, :], k)
+                seconds.append(time.perf_counter() - started)
+        latencies_ms = np.array(seconds) * 1000
+        results.append({
+            "config": spec,
+            "factory": resolve_factory_string(factory, len(vectors)),
+            **params,
+            "build_seconds": build_seconds,
+            f"recall_at_{k}": float(recall),
+            "latency_ms_p50": float(np.percentile(latencies_ms, 50)),
+            "latency_ms_p99": float(np.percentile(latencies_ms, 99)),
+            "memory_bytes": index_memory_bytes(index),
+        })
+    return results
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark FAISS index types against the exact flat index.")
+    parser.add_argument("--k", type=int, default=config.RETRIEVER_K, help="Neighbours per query")
+    parser.add_argument("--scale", type=int, default=1, help="Multiply the corpus with jittered copies")
+    parser.add_argument("--repeat", type=int, default=20, help="Timed passes over the query set")
+    parser.add_argument("--config", action="append", help="FACTORY[:param=value,...]; repeat for several (default: a standard set)")
+    parser.add_argument("--json", help="Also write the results to this file")
+    args = parser.parse_args(argv)
+
+    embedding_model = get_embedding_model()
+    vectors = np.asarray(embedding_model.embed_documents(corpus_texts()), dtype=np.float32)
+    vectors = scaled_corpus(vectors, args.scale)
+    questions = pd.read_csv(config.TRAINING_DATA_PATH)["Question"].dropna().astype(str).unique().tolist()
+    queries = np.asarray(embedding_model.embed_documents(questions), dtype=np.float32)
+    results = run(vectors, queries, args.config or DEFAULT_CONFIGS, args.k, args.repeat)
+
+    print(f"{len(vectors)} vectors, {len(queries)} queries, k={args.k}")
+    print(f"{'config':<34} {'index':<16} {'build s':>8} {'recall':>7} {'p50 ms':>8} {'p99 ms':>8} {'memory KiB':>11}")
+    for row in results:
+        print(
+            f"{row['config']:<34} {row['factory']:<16} {row['build_seconds']:>8.3f} {row[f'recall_at_{args.k}']:>7.3f} "
+            f"{row['latency_ms_p50']:>8.3f} {row['latency_ms_p99']:>8.3f} {row['memory_bytes'] / 1024:>11.1f}"
+        )
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"vectors": len(vectors), "queries": len(queries), "k": args.k, "results": results}, f, indent=2)
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
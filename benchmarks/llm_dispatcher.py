@@ -0,0 +1,105 @@
+"""Load test of the LLM dispatcher against the fake model with injected 429s.
+
+Simulates many sessions streaming answers at once through one dispatcher with
+the configured concurrency, rate limits and retries, while the fake LLM fails
+a share of calls with HTTP 429. Reports how many calls succeeded, retries and
+failures, peak queue depth, the request rate actually sent to the "provider",
+end-to-end latency percentiles and whether any queued call was overtaken.
+With --cohort every session sends the same prompts, which the coalescer turns
+into one request each unless --no-coalescing is given.
+No key or network is needed. Run from the repository root::
+
+    python -m benchmarks.llm_dispatcher [--sessions 20] [--error-rate 0.3] [--rpm 120] [--cohort]
+"""
+import argparse
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+import numpy as np
+
+import config
+from llm_calls import FakeStreamingLLM
+from llm_dispatcher import LLMDispatcher, LLMDispatchError, queue_listener
+from single_flight import SingleFlight
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Load-test the LLM dispatcher against the fake LLM with injected 429s.")
+    parser.add_argument("--sessions", type=int, default=20, help="Concurrent sessions")
+    parser.add_argument("--calls", type=int, default=3, help="Calls per session")
+    parser.add_argument("--error-rate", type=float, default=0.3, help="Share of fake calls failing with a 429")
+    parser.add_argument("--concurrency", type=int, default=config.LLM_MAX_CONCURRENCY)
+    parser.add_argument("--rpm", type=float, default=120, help="Requests per minute allowed")
+    parser.add_argument("--tpm", type=float, default=config.LLM_TOKENS_PER_MINUTE, help="Tokens per minute allowed")
+    parser.add_argument("--token-delay", type=float, default=0.01, help="Seconds per streamed fake token")
+    parser.add_argument("--backoff-base", type=float, default=0.1)
+    parser.add_argument("--cohort", action="store_true",
+                        help="Every session sends the same prompts at the same time, like a class reaching one challenge")
+    parser.add_argument("--no-coalescing", action="store_true", help="Send identical in-flight prompts separately")
+    args = parser.parse_args(argv)
+
+    llm = FakeStreamingLLM(token_delay_seconds=args.token_delay, error_rate=args.error_rate)
+    dispatcher = LLMDispatcher(
+        max_concurrency=args.concurrency,
+        requests_per_minute=args.rpm,
+        tokens_per_minute=args.tpm,
+        backoff_base_seconds=args.backoff_base,
+    )
+    coalescer = SingleFlight()
+    lock = threading.Lock()
+    latencies, errors = [], []
+    answers: Dict[str, set] = defaultdict(set)
+    queued, overtaken = [0], [0]
+
+    def session(session_id: int) -> None:
+        for call in range(args.calls):
+            asker = "The cohort" if args.cohort else f"Session {session_id}"
+            prompt = f"{asker} question {call}: how do I report a phishing email?"
+            open_stream = lambda: dispatcher.stream(lambda: llm.stream(prompt), cost_tokens=300)
+            positions = []
+            started = time.perf_counter()
+            try:
+                with queue_listener(positions.append):
+                    stream = open_stream() if args.no_coalescing else coalescer.join(prompt, open_stream)[0]
+                    answer = "".join(stream)
+                with lock:
+                    latencies.append(time.perf_counter() - started)
+                    answers[prompt].add(answer)
+            except LLMDispatchError as exc:
+                with lock:
+                    errors.append(str(exc))
+            waiting = [p for p in positions if p]
+            with lock:
+                queued[0] += bool(waiting)
+                # In a FIFO queue a waiting call's position only ever goes down
+                overtaken[0] += any(later > earlier for earlier, later in zip(waiting, waiting[1:]))
+
+    threads = [threading.Thread(target=session, args=(i,)) for i in range(args.sessions)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    stats = dispatcher.stats()
+    total = args.sessions * args.calls
+    print(f"{total} calls from {args.sessions} sessions in {elapsed:.1f}s, concurrency {args.concurrency}, "
+          f"{args.rpm:.0f} rpm, {args.error_rate:.0%} injected 429s")
+    print(f"succeeded {len(latencies)}, failed {len(errors)}, retries {stats['retries']}, "
+          f"queue timeouts {stats['queue_timeouts']}, peak queue depth {stats['max_queue_depth']}")
+    print(f"requests sent {stats['calls'] + stats['retries']} ({(stats['calls'] + stats['retries']) / elapsed * 60:.0f}/min), "
+          f"held by rate limiter {stats['rate_limited']}")
+    if latencies:
+        latencies_ms = np.array(latencies) * 1000
+        print(f"latency p50/p95/max {np.percentile(latencies_ms, 50):.0f}/{np.percentile(latencies_ms, 95):.0f}/"
+              f"{latencies_ms.max():.0f} ms; {queued[0]} calls queued, {overtaken[0]} overtaken by a later arrival")
+    coalesce_stats = coalescer.stats()
+    print(f"coalesced {coalesce_stats['coalesced']} calls onto {coalesce_stats['calls']} requests; "
+          f"prompts with differing answers {sum(len(texts) > 1 for texts in answers.values())}")
+    return 0 if not errors else 1
+
+if __name__ == "__main__":
+    raise SystemExit(main())
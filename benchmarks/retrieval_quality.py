@@ -0,0 +1,166 @@
+"""Offline retrieval quality and cost, with the training Q&A as ground truth.
+
+Loads (or builds) the index exactly as the app does, then runs every question
+in the training CSV through the retriever, dense-only and hybrid. A question's
+relevant chunk is its own Q&A chunk; ``answer_hit@k`` additionally counts any
+retrieved chunk that contains most of the answer's terms, which credits
+policy passages that say the same thing. Also reported: index build and load
+time, cold and warm query latency percentiles, peak RSS and index size on disk.
+No LLM is involved, so no OpenAI key is needed. Run from the repository root::
+
+    python -m benchmarks.retrieval_quality [--rebuild] [--output results.json]
+
+Each run writes a JSON file (by default under benchmarks/results/) so runs
+with different chunking, embedding or k settings can be compared.
+"""
+import argparse
+import json
+import os
+import resource
+import shutil
+import tempfile
+import time
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+import config
+from lexical_index import tokenize
+from rag_index import META_FILE, artifact_dir_for, chunk_id, load_lexical_index, load_or_build_vector_store, read_json
+from retrieval import CachedRetriever
+
+DEFAULT_OUTPUT_DIR = os.path.join(os.path.dirname(__file__), "results")
+HIT_KS = (1, 3, 5, 10)
+# Share of the answer's terms a chunk must contain to count as answering it
+ANSWER_TERM_COVERAGE = 0.6
+
+
+def load_questions(training_path: str) -> List[Dict[str, str]]:
+    """Training rows with both a question and an answer, and the id of the chunk built from each"""
+    frame = pd.read_csv(training_path)
+    rows = []
+    for _, row in frame.iterrows():
+        if pd.isna(row["Question"]) or pd.isna(row["Answer"]):
+            continue
+        rows.append({
+            "question": str(row["Question"]),
+            "answer": str(row["Answer"]),
+            # Same text as rag_index.iter_training_chunks
+            "chunk_id": chunk_id(f"Question: {row['Question']} Answer: {row['Answer']}"),
+        })
+    return rows
+
+def answers_question(text: str, answer_terms: set) -> bool:
+    return bool(answer_terms) and len(answer_terms & set(tokenize(text))) / len(answer_terms) >= ANSWER_TERM_COVERAGE
+
+def percentiles(seconds: Sequence[float]) -> Dict[str, float]:
+    latencies_ms = np.array(seconds) * 1000
+    return {f"p{p}_ms": float(np.percentile(latencies_ms, p)) for p in (50, 95, 99)}
+
+def directory_bytes(path: str) -> Dict[str, int]:
+    return {name: os.path.getsize(os.path.join(path, name)) for name in sorted(os.listdir(path)) if os.path.isfile(os.path.join(path, name))}
+
+
+def evaluate(retriever: CachedRetriever, rows: List[Dict[str, str]], k: int) -> dict:
+    """Rank metrics from a cold pass, then latency of a warm pass over the same questions"""
+    hits = {n: 0 for n in HIT_KS if n <= k}
+    answer_hits = {n: 0 for n in HIT_KS if n <= k}
+    reciprocal_ranks, cold_seconds, warm_seconds = [], [], []
+    for row in rows:
+        started = time.perf_counter()
+        docs = retriever.get_relevant_documents(row["question"], k=k)
+        cold_seconds.append(time.perf_counter() - started)
+
+        ids = [chunk_id(doc.page_content) for doc in docs]
+        rank = ids.index(row["chunk_id"]) + 1 if row["chunk_id"] in ids else None
+        reciprocal_ranks.append(1.0 / rank if rank else 0.0)
+        answer_terms = set(tokenize(row["answer"]))
+        first_answering = next((i + 1 for i, doc in enumerate(docs) if answers_question(doc.page_content, answer_terms)), None)
+        for n in hits:
+            hits[n] += rank is not None and rank <= n
+            answer_hits[n] += first_answering is not None and first_answering <= n
+
+    for row in rows:
+        started = time.perf_counter()
+        retriever.get_relevant_documents(row["question"], k=k)
+        warm_seconds.append(time.perf_counter() - started)
+
+    total = len(rows)
+    return {
+        **{f"hit@{n}": count / total for n, count in hits.items()},
+        f"mrr@{k}": float(np.mean(reciprocal_ranks)),
+        **{f"answer_hit@{n}": count / total for n, count in answer_hits.items()},
+        "latency_cold": percentiles(cold_seconds),
+        "latency_warm": percentiles(warm_seconds),
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark retrieval quality and cost against the training Q&A.")
+    parser.add_argument("--k", type=int, default=max(HIT_KS), help="Chunks retrieved per question")
+    parser.add_argument("--rebuild", action="store_true", help="Build the index from scratch in a temporary directory to time the build")
+    parser.add_argument("--output", help="JSON results file (default: benchmarks/results/retrieval_<timestamp>.json)")
+    args = parser.parse_args(argv)
+
+    cache_dir = tempfile.mkdtemp(prefix="uetcl-bench-") if args.rebuild else config.INDEX_CACHE_DIR
+    try:
+        started = time.perf_counter()
+        vector_store, index_key = load_or_build_vector_store(cache_dir=cache_dir)
+        load_seconds = time.perf_counter() - started
+        artifact_dir = artifact_dir_for(cache_dir)
+        meta = read_json(os.path.join(artifact_dir, META_FILE)) or {}
+        lexical_index = load_lexical_index(artifact_dir)
+        files = directory_bytes(artifact_dir)
+
+        rows = load_questions(config.TRAINING_DATA_PATH)
+        modes = {}
+        for mode, lexical in (("dense", None), ("hybrid", lexical_index)):
+            modes[mode] = evaluate(CachedRetriever(vector_store, index_key, lexical_index=lexical), rows, args.k)
+    finally:
+        if args.rebuild:
+            shutil.rmtree(cache_dir, ignore_errors=True)
+
+    results = {
+        "run_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "settings": {
+            "embedding_model": config.EMBEDDING_MODEL_NAME,
+            "chunk_size": config.CHUNK_SIZE,
+            "chunk_overlap": config.CHUNK_OVERLAP,
+            "index_factory": meta.get("index_factory", "Flat"),
+            "k": args.k,
+        },
+        "index": {
+            "index_key": index_key,
+            "num_chunks": len(vector_store.index_to_docstore_id),
+            "build_seconds": meta.get("build_seconds"),
+            "chunks_embedded": meta.get("chunks_embedded"),
+            "load_seconds": load_seconds,
+            "size_bytes": sum(files.values()),
+            "files_bytes": files,
+        },
+        "questions": len(rows),
+        "modes": modes,
+        # ru_maxrss is in KiB on Linux
+        "peak_rss_bytes": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,
+    }
+
+    print(f"{results['questions']} questions over {results['index']['num_chunks']} chunks, k={args.k}")
+    print(f"index build {meta.get('build_seconds')}s ({meta.get('chunks_embedded')} embedded), load {load_seconds:.2f}s, "
+          f"{results['index']['size_bytes'] / 1024:.0f} KiB on disk, peak RSS {results['peak_rss_bytes'] / 2**20:.0f} MiB")
+    for mode, metrics in modes.items():
+        ranks = "  ".join(f"{name} {value:.3f}" for name, value in metrics.items() if not name.startswith("latency"))
+        cold, warm = metrics["latency_cold"], metrics["latency_warm"]
+        print(f"{mode:<7} {ranks}")
+        print(f"{'':<7} cold p50/p95/p99 {cold['p50_ms']:.2f}/{cold['p95_ms']:.2f}/{cold['p99_ms']:.2f} ms, "
+              f"warm p50 {warm['p50_ms']:.3f} ms")
+
+    output = args.output or os.path.join(DEFAULT_OUTPUT_DIR, f"retrieval_{time.strftime('%Y%m%dT%H%M%SZ', time.gmtime())}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(output)
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,107 @@
+"""Retrieval throughput against the number of concurrent sessions, with and without micro-batching.
+
+Every simulated session asks the training questions in its own thread, each
+made unique so that neither the retriever's caches nor the persistent
+embedding cache answer it: every query pays for an encoder forward pass and a
+FAISS search, as a cold query does in the app. Unbatched, each thread embeds
+and searches on its own; batched, queries arriving within the wait window
+share one ``embed_documents`` call and one matrix search. Run from the
+repository root::
+
+    python -m benchmarks.retrieval_throughput [--sessions 1,2,4,8,16,32] [--wait-ms 5] [--json out.json]
+"""
+import argparse
+import json
+import threading
+import time
+import uuid
+from typing import List, Optional
+
+import numpy as np
+
+import config
+from benchmarks.retrieval_quality import load_questions
+from rag_index import artifact_dir_for, load_lexical_index, load_or_build_vector_store
+from retrieval import CachedRetriever
+
+
+def run_sessions(retriever: CachedRetriever, questions: List[str], sessions: int, queries_per_session: int) -> dict:
+    """Queries per second and per-query latency with `sessions` threads asking at once"""
+    nonce = uuid.uuid4().hex[:8]
+    latencies: List[float] = []
+    lock = threading.Lock()
+    start = threading.Barrier(sessions + 1)
+
+    def session(session_id: int) -> None:
+        own = []
+        start.wait()
+        for i in range(queries_per_session):
+            query = f"{questions[(session_id + i) % len(questions)]} {nonce}{session_id}x{i}"
+            started = time.perf_counter()
+            retriever.get_relevant_documents(query)
+            own.append(time.perf_counter() - started)
+        with lock:
+            latencies.extend(own)
+
+    threads = [threading.Thread(target=session, args=(i,)) for i in range(sessions)]
+    for thread in threads:
+        thread.start()
+    start.wait()
+    started = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    latencies_ms = np.array(latencies) * 1000
+    return {
+        "sessions": sessions,
+        "queries_per_second": len(latencies) / elapsed,
+        "p50_ms": float(np.percentile(latencies_ms, 50)),
+        "p95_ms": float(np.percentile(latencies_ms, 95)),
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark retrieval throughput against concurrent sessions, with and without micro-batching.")
+    parser.add_argument("--sessions", default="1,2,4,8,16,32", help="Comma-separated concurrent session counts")
+    parser.add_argument("--queries", type=int, default=20, help="Queries per session")
+    parser.add_argument("--batch-size", type=int, default=config.RETRIEVAL_BATCH_MAX_SIZE)
+    parser.add_argument("--wait-ms", type=float, default=config.RETRIEVAL_BATCH_WAIT_MS)
+    parser.add_argument("--workers", type=int, default=config.RETRIEVAL_BATCH_WORKERS)
+    parser.add_argument("--dense-only", action="store_true", help="Leave out the BM25 half of hybrid search")
+    parser.add_argument("--json", help="Also write the results to this file")
+    args = parser.parse_args(argv)
+
+    vector_store, index_key = load_or_build_vector_store()
+    # Time the encoder itself: the persistent embedding cache would otherwise absorb repeated runs
+    vector_store.embedding_function = getattr(vector_store.embedding_function, "base", vector_store.embedding_function)
+    lexical_index = None if args.dense_only else load_lexical_index(artifact_dir_for())
+    questions = [row["question"] for row in load_questions(config.TRAINING_DATA_PATH)]
+    session_counts = [int(n) for n in args.sessions.split(",")]
+
+    results = {}
+    for mode, batching in (("unbatched", False), ("batched", True)):
+        retriever = CachedRetriever(
+            vector_store, index_key, lexical_index=lexical_index, batching=batching,
+            batch_max_size=args.batch_size, batch_wait_ms=args.wait_ms, batch_workers=args.workers,
+        )
+        retriever.get_relevant_documents(questions[0])  # Warm up the encoder
+        results[mode] = [run_sessions(retriever, questions, sessions, args.queries) for sessions in session_counts]
+        results[mode + "_batches"] = retriever.batch_stats()
+
+    print(f"{len(vector_store.index_to_docstore_id)} chunks, {args.queries} queries per session, "
+          f"batches of up to {args.batch_size} within {args.wait_ms:g} ms on {args.workers} worker(s)")
+    print(f"{'sessions':>8}  {'unbatched q/s':>13} {'p50 ms':>8} {'p95 ms':>8}  {'batched q/s':>11} {'p50 ms':>8} {'p95 ms':>8}  speed-up")
+    for plain, batched in zip(results["unbatched"], results["batched"]):
+        print(f"{plain['sessions']:>8}  {plain['queries_per_second']:>13.1f} {plain['p50_ms']:>8.1f} {plain['p95_ms']:>8.1f}  "
+              f"{batched['queries_per_second']:>11.1f} {batched['p50_ms']:>8.1f} {batched['p95_ms']:>8.1f}  "
+              f"{batched['queries_per_second'] / plain['queries_per_second']:.2f}x")
+    for name, stats in results["batched_batches"].items():
+        print(f"{name} batches: {stats['batches']}, mean size {stats['mean_batch_size']:.1f}, largest {stats['largest_batch']}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"index_key": index_key, "settings": vars(args), "results": results}, f, indent=2)
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
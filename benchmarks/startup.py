@@ -0,0 +1,91 @@
+"""Time to first paint and time to ready of the Streamlit app in a fresh process.
+
+Each run starts a new Python process that drives main.py through Streamlit's
+AppTest, as the first visitor to a cold server would: time to first paint is
+from process launch until the sign-in form has rendered, and time to ready is
+until the chat input is enabled, i.e. the tutor has finished loading on its
+warmup thread (to within the --poll interval). The first run after the
+training materials or the embedding model change includes building the index;
+later runs load it from disk. Run from the repository root::
+
+    python -m benchmarks.startup [--runs 3] [--json out.json]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from typing import List, Optional
+
+import config
+from training_session import get_available_roles
+
+APP_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "main.py")
+
+
+def measure(launched_at: float, timeout: float, poll_seconds: float) -> dict:
+    """One cold start in this process: seconds from launched_at to the form, and to an enabled chat input"""
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(APP_PATH, default_timeout=timeout)
+    at.secrets["api_keys"] = {"openai": os.environ.get("OPENAI_API_KEY", "sk-startup-benchmark")}
+    at.run()
+    if at.exception or not at.text_input:
+        raise RuntimeError(f"The sign-in form did not render: {at.exception}")
+    first_paint = time.time() - launched_at
+
+    at.text_input[0].input("Benchmark")
+    at.selectbox[0].select(get_available_roles()[0])
+    at.button[0].click()
+    at.run()
+    deadline = time.monotonic() + timeout
+    while not at.exception and (not at.chat_input or at.chat_input[0].disabled):
+        if time.monotonic() > deadline:
+            raise RuntimeError(f"The tutor was not ready after {timeout:.0f}s")
+        time.sleep(poll_seconds)
+        at.run()
+    if at.exception:
+        raise RuntimeError(f"The app failed while loading: {at.exception}")
+    return {"first_paint_seconds": first_paint, "ready_seconds": time.time() - launched_at, "backend": config.LLM_BACKEND}
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Measure time to first paint and time to ready of the Streamlit app.")
+    parser.add_argument("--runs", type=int, default=3, help="Fresh processes to start, one after the other")
+    parser.add_argument("--timeout", type=float, default=600, help="Seconds to wait for the app to become ready")
+    # Every check reruns the whole script, which competes with the warmup thread for the GIL, so by default
+    # check as often as the app's own waiting page does
+    parser.add_argument("--poll", type=float, default=config.WARMUP_POLL_SECONDS, help="Seconds between checks for readiness")
+    parser.add_argument("--json", help="Also write the results to this file")
+    # Set by the parent on the processes it starts
+    parser.add_argument("--launched-at", type=float, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.launched_at is not None:
+        print(json.dumps(measure(args.launched_at, args.timeout, args.poll)))
+        return 0
+
+    results = []
+    for run in range(args.runs):
+        command = [sys.executable, "-m", "benchmarks.startup", "--timeout", str(args.timeout), "--poll", str(args.poll),
+                   "--launched-at", repr(time.time())]
+        child = subprocess.run(command, capture_output=True, text=True)
+        if child.returncode:
+            sys.stderr.write(child.stderr)
+            return 1
+        result = json.loads(child.stdout.strip().splitlines()[-1])
+        results.append(result)
+        print(f"run {run + 1}: first paint {result['first_paint_seconds']:.2f}s, ready {result['ready_seconds']:.2f}s")
+
+    if len(results) > 1:
+        print(f"median: first paint {statistics.median(r['first_paint_seconds'] for r in results):.2f}s, "
+              f"ready {statistics.median(r['ready_seconds'] for r in results):.2f}s")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"settings": vars(args), "results": results}, f, indent=2)
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
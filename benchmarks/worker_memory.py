@@ -0,0 +1,211 @@
+"""Memory each worker process spends on the index, with and without memory maps.
+
+Starts --workers processes per mode, as ``uvicorn --workers`` would, each
+loading the published index artifact and its topic partitions and running a
+few searches:
+
+    langchain   FAISS reads the index into the process and LangChain builds a
+                Document and an id-map entry per chunk (how an index that is
+                about to be updated is loaded)
+    in-memory   UETCL_INDEX_MMAP=0: the index, the compact chunk store and the
+                partition vectors are read into the process
+    mmap        they are memory-mapped read-only, one copy in the page cache
+                per host
+
+For every worker it reports what loading added to its resident set, split into
+private anonymous memory (RssAnon) and file pages (RssFile), and its PSS, which
+charges each shared page 1/n to each of the n processes mapping it; the sum of
+PSS over workers is what the host actually spends. The tutor's corpus is small,
+so --scale N also measures a copy of the artifact with N times the chunks
+(jittered vectors, suffixed texts) in a temporary directory. The embedding
+model stays per-process either way; --with-model loads it in every worker too.
+Linux only (/proc). Run from the repository root::
+
+    python -m benchmarks.worker_memory [--workers 4] [--scale 100] [--json out.json]
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+
+import config
+from chunk_store import write_chunk_store
+
+# Mode -> UETCL_INDEX_MMAP, and whether to load the index writable
+MODES = {"langchain": ("0", True), "in-memory": ("0", False), "mmap": ("1", False)}
+
+
+def process_memory_kb(fields=("VmRSS", "RssAnon", "RssFile")) -> Dict[str, int]:
+    values = {}
+    with open("/proc/self/status") as f:
+        for line in f:
+            name, _, value = line.partition(":")
+            if name in fields:
+                values[name] = int(value.split()[0])
+    return values
+
+def _pss_kb(pid: int) -> int:
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            if line.startswith("Pss:"):
+                return int(line.split()[1])
+    raise RuntimeError(f"No Pss in /proc/{pid}/smaps_rollup")
+
+
+# --- WORKER ---
+def run_worker(artifact_dir: str, queries: int, with_model: bool, writable: bool) -> None:
+    """Load the artifact the way the engine does, search, report memory, then wait for the parent"""
+    from rag_index import META_FILE, get_embedding_model, load_index_artifact, read_json
+    from topic_partitions import load_topic_partitions
+
+    embedding_model = get_embedding_model(config.EMBEDDING_MODEL_NAME) if with_model else None
+    before = process_memory_kb()
+    vector_store = load_index_artifact(artifact_dir, embedding_model, writable=writable)
+    if vector_store is None:
+        raise RuntimeError(f"Could not load {artifact_dir}")
+    partitions = load_topic_partitions(vector_store, read_json(os.path.join(artifact_dir, META_FILE))["index_key"], artifact_dir=artifact_dir)
+    rng = np.random.default_rng(os.getpid())
+    for _ in range(queries):
+        query = rng.standard_normal(vector_store.index.d).astype(np.float32)
+        vector_store.similarity_search_with_score_by_vector(query.tolist(), k=config.RETRIEVER_K)
+        for module_name in partitions.sizes():
+            partitions.search(module_name, query.tolist(), config.RETRIEVER_K)
+    after = process_memory_kb()
+    print(json.dumps({"before_kb": before, "after_kb": after}), flush=True)
+    sys.stdin.read()
+
+
+# --- SCALED ARTIFACT ---
+def build_scaled_artifact(source_dir: str, target_dir: str, scale: int, embedding_model) -> None:
+    """A copy of the artifact with scale times the chunks, as a flat index, plus its topic partitions"""
+    import faiss
+
+    from rag_index import INDEX_FILE, META_FILE, load_index_artifact
+    from topic_partitions import load_topic_partitions
+
+    source = load_index_artifact(source_dir, embedding_model, mapped=False)
+    vectors = source.index.reconstruct_n(0, source.index.ntotal)
+    ids = [source.index_to_docstore_id[position] for position in range(source.index.ntotal)]
+    docs = [source.docstore.search(doc_id) for doc_id in ids]
+    rng = np.random.default_rng(0)
+    noise = float(np.std(vectors)) * 0.05
+
+    index = faiss.IndexFlat(source.index.d, source.index.metric_type)
+    scaled_ids, scaled_docs = [], []
+    for copy in range(scale):
+        # Copy 0 keeps the real ids, so the training rows still land in their modules' partitions
+        batch = vectors if copy == 0 else vectors + rng.normal(0, noise, vectors.shape).astype(np.float32)
+        index.add(np.ascontiguousarray(batch, dtype=np.float32))
+        suffix = "" if copy == 0 else f"-{copy}"
+        scaled_ids.extend(doc_id + suffix for doc_id in ids)
+        scaled_docs.extend(
+            doc if copy == 0 else type(doc)(page_content=f"{doc.page_content} ({copy})", metadata=dict(doc.metadata))
+            for doc in docs
+        )
+    os.makedirs(target_dir, exist_ok=True)
+    faiss.write_index(index, os.path.join(target_dir, INDEX_FILE))
+    write_chunk_store(target_dir, scaled_ids, scaled_docs)
+    index_key = f"scaled-{scale}"
+    with open(os.path.join(target_dir, META_FILE), "w", encoding="utf-8") as f:
+        json.dump({"index_key": index_key, "index_factory": "Flat", "num_chunks": len(scaled_ids)}, f)
+    load_topic_partitions(load_index_artifact(target_dir, embedding_model, mapped=False), index_key, artifact_dir=target_dir)
+
+
+# --- MEASURE ---
+def measure(artifact_dir: str, workers: int, queries: int, with_model: bool) -> Dict[str, dict]:
+    """Per mode: each worker's memory, measured with all of them loaded at once"""
+    results = {}
+    for mode, (flag, writable) in MODES.items():
+        env = dict(os.environ, UETCL_INDEX_MMAP=flag)
+        command = [sys.executable, "-m", "benchmarks.worker_memory", "--worker", artifact_dir, "--queries", str(queries)]
+        if with_model:
+            command.append("--with-model")
+        if writable:
+            command.append("--writable")
+        children = [subprocess.Popen(command, env=env, stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True) for _ in range(workers)]
+        try:
+            reports = []
+            for child in children:
+                line = child.stdout.readline()
+                if not line:
+                    raise RuntimeError(f"A {mode} worker exited with {child.wait()}")
+                reports.append(json.loads(line))
+            # Every worker is loaded now, so PSS splits the shared pages between all of them
+            time.sleep(0.2)
+            pss = [_pss_kb(child.pid) for child in children]
+        finally:
+            for child in children:
+                child.stdin.close()
+                child.wait()
+        per_worker = [
+            {
+                "rss_added_mb": (r["after_kb"]["VmRSS"] - r["before_kb"]["VmRSS"]) / 1024,
+                "anon_added_mb": (r["after_kb"]["RssAnon"] - r["before_kb"]["RssAnon"]) / 1024,
+                "file_added_mb": (r["after_kb"]["RssFile"] - r["before_kb"]["RssFile"]) / 1024,
+                "rss_mb": r["after_kb"]["VmRSS"] / 1024,
+                "pss_mb": p / 1024,
+            }
+            for r, p in zip(reports, pss)
+        ]
+        results[mode] = {"workers": per_worker, "total_pss_mb": sum(w["pss_mb"] for w in per_worker)}
+    return results
+
+def _print(label: str, results: Dict[str, dict]) -> None:
+    print(f"{label}")
+    print(f"  {'mode':<10} {'RSS added':>10} {'anon added':>11} {'file added':>11} {'RSS':>8} {'PSS':>8} {'PSS, all workers':>17}")
+    for mode, result in results.items():
+        workers = result["workers"]
+        mean = {key: float(np.mean([w[key] for w in workers])) for key in workers[0]}
+        print(f"  {mode:<10} {mean['rss_added_mb']:>8.1f}MB {mean['anon_added_mb']:>9.1f}MB {mean['file_added_mb']:>9.1f}MB "
+              f"{mean['rss_mb']:>6.0f}MB {mean['pss_mb']:>6.0f}MB {result['total_pss_mb']:>15.0f}MB")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Measure per-worker memory of the index with and without memory maps.")
+    parser.add_argument("--workers", type=int, default=4, help="Worker processes per mode, all loaded at once")
+    parser.add_argument("--scale", type=int, default=0, help="Also measure an artifact with this many times the chunks")
+    parser.add_argument("--queries", type=int, default=20, help="Random searches each worker runs after loading")
+    parser.add_argument("--with-model", action="store_true", help="Load the embedding model in every worker too")
+    parser.add_argument("--json", help="Also write the results to this file")
+    # Set by the parent on the processes it starts
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    parser.add_argument("--writable", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.worker:
+        run_worker(args.worker, args.queries, args.with_model, args.writable)
+        return 0
+
+    from rag_index import artifact_dir_for, get_embedding_model, load_or_build_vector_store
+    from topic_partitions import load_topic_partitions
+
+    vector_store, index_key = load_or_build_vector_store()
+    artifact_dir = artifact_dir_for()
+    load_topic_partitions(vector_store, index_key, artifact_dir=artifact_dir)
+    results = {"corpus": {"chunks": vector_store.index.ntotal, "modes": measure(artifact_dir, args.workers, args.queries, args.with_model)}}
+    _print(f"corpus: {vector_store.index.ntotal} chunks, {args.workers} workers", results["corpus"]["modes"])
+
+    if args.scale > 1:
+        scaled_dir = tempfile.mkdtemp(prefix="worker-memory-")
+        try:
+            build_scaled_artifact(artifact_dir, scaled_dir, args.scale, get_embedding_model(config.EMBEDDING_MODEL_NAME))
+            chunks = vector_store.index.ntotal * args.scale
+            results["scaled"] = {"chunks": chunks, "scale": args.scale, "modes": measure(scaled_dir, args.workers, args.queries, args.with_model)}
+            _print(f"scaled x{args.scale}: {chunks} chunks, {args.workers} workers", results["scaled"]["modes"])
+        finally:
+            shutil.rmtree(scaled_dir, ignore_errors=True)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"settings": vars(args), "results": results}, f, indent=2)
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
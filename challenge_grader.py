@@ -0,0 +1,93 @@
+"""Local grading of challenge answers by embedding similarity.
+
+Every challenge in modules.py carries a few reference answers marked correct
+or incorrect. A trainee's answer is embedded with the same model as the index
+and compared (cosine) with both sets. When it is clearly closer to one side,
+that decides the grade in milliseconds with no LLM call; answers that land in
+the uncertain band between them are left to the LLM grader in TutorEngine
+(tutor_engine.py).
+
+Measure accuracy and latency against the labelled answers with::
+
+    python -m benchmarks.challenge_grading
+"""
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain.embeddings.base import Embeddings
+
+import config
+
+logger = logging.getLogger(__name__)
+
+CORRECT = "correct"
+INCORRECT = "incorrect"
+UNCERTAIN = "uncertain"
+
+
+@dataclass
+class Grade:
+    verdict: str
+    correct_similarity: float = 0.0
+    incorrect_similarity: float = 0.0
+    seconds: float = 0.0
+
+
+def _unit_rows(vectors) -> np.ndarray:
+    matrix = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.where(norms == 0, 1, norms)
+
+
+class ChallengeGrader:
+    """Grades an answer against a challenge's reference answers, or returns UNCERTAIN"""
+
+    def __init__(
+        self,
+        embedding_model: Embeddings,
+        min_similarity: float = config.CHALLENGE_GRADER_MIN_SIMILARITY,
+        margin: float = config.CHALLENGE_GRADER_MARGIN,
+    ):
+        self.embedding_model = embedding_model
+        self.min_similarity = min_similarity
+        self.margin = margin
+        self._lock = threading.Lock()
+        self._reference_vectors: Dict[Tuple[str, ...], np.ndarray] = {}
+
+    def _references(self, texts: Sequence[str]) -> Optional[np.ndarray]:
+        """Unit vectors for a reference set, embedded once per process"""
+        key = tuple(texts)
+        if not key:
+            return None
+        with self._lock:
+            vectors = self._reference_vectors.get(key)
+        if vectors is None:
+            vectors = _unit_rows(self.embedding_model.embed_documents(list(key)))
+            with self._lock:
+                self._reference_vectors[key] = vectors
+        return vectors
+
+    def grade(self, challenge: dict, answer: str) -> Grade:
+        started = time.perf_counter()
+        references = challenge.get("reference_answers") or {}
+        correct_vectors = self._references(references.get("correct", []))
+        if correct_vectors is None or not answer.strip():
+            return Grade(UNCERTAIN, seconds=time.perf_counter() - started)
+        incorrect_vectors = self._references(references.get("incorrect", []))
+
+        answer_vector = _unit_rows(self.embedding_model.embed_query(answer))[0]
+        correct_similarity = float(np.max(correct_vectors @ answer_vector))
+        incorrect_similarity = float(np.max(incorrect_vectors @ answer_vector)) if incorrect_vectors is not None else 0.0
+
+        verdict = UNCERTAIN
+        if correct_similarity >= self.min_similarity and correct_similarity - incorrect_similarity >= self.margin:
+            verdict = CORRECT
+        elif incorrect_similarity >= self.min_similarity and incorrect_similarity - correct_similarity >= self.margin:
+            verdict = INCORRECT
+        grade = Grade(verdict, correct_similarity, incorrect_similarity, time.perf_counter() - started)
+        logger.debug("Graded %r as %s (correct %.3f, incorrect %.3f)", answer, verdict, correct_similarity, incorrect_similarity)
+        return grade
@@ -0,0 +1,141 @@
+"""Chunk texts of an index artifact as one contiguous UTF-8 blob, memory-mapped and shared by every process on a host.
+
+LangChain's ``InMemoryDocstore`` keeps a ``Document`` object per chunk in
+every worker process, and ``index_to_docstore_id`` a dict entry per vector.
+The artifact instead stores, in FAISS position order::
+
+    chunk_store/text.bin       every chunk's UTF-8 text, back to back
+    chunk_store/offsets.npy    int64, chunk i is text.bin[offsets[i]:offsets[i + 1]]
+    chunk_store/ids.npy        fixed-width chunk ids (the docstore ids)
+    chunk_store/id_order.npy   positions sorted by id, to find a chunk by id with a binary search
+    chunk_store/sources.npy    uint8 code of each chunk's "source" metadata, naming an entry of
+    chunk_store/source_names.npy
+
+Even read into one process this is compact: a single bytes buffer and a few
+NumPy columns in place of a Python string, metadata dict and ``Document`` per
+chunk, and a ``Document`` is built only when a search returns that chunk.
+Opened read-only with mmap (the default), the operating system keeps one copy
+in its page cache however many workers load the artifact.
+"""
+import mmap
+import os
+from typing import Callable, Dict, Iterator, List, Mapping, Sequence, Tuple, Union
+
+import numpy as np
+from langchain.docstore.base import Docstore
+from langchain.docstore.document import Document
+from langchain.docstore.in_memory import InMemoryDocstore
+
+CHUNK_STORE_DIR = "chunk_store"
+
+
+def write_chunk_store(directory: str, ids: Sequence[str], documents: Sequence[Document]) -> None:
+    """Store documents (in FAISS position order, with their docstore ids) under directory/CHUNK_STORE_DIR"""
+    store_dir = os.path.join(directory, CHUNK_STORE_DIR)
+    os.makedirs(store_dir, exist_ok=True)
+    offsets = np.zeros(len(documents) + 1, dtype=np.int64)
+    source_names: List[str] = []
+    sources = np.zeros(len(documents), dtype=np.uint8)
+    with open(os.path.join(store_dir, "text.bin"), "wb") as f:
+        for i, doc in enumerate(documents):
+            encoded = doc.page_content.encode("utf-8")
+            f.write(encoded)
+            offsets[i + 1] = offsets[i] + len(encoded)
+            source = doc.metadata.get("source", "")
+            if source not in source_names:
+                source_names.append(source)
+            sources[i] = source_names.index(source)
+    encoded_ids = np.array([doc_id.encode("ascii") for doc_id in ids], dtype=bytes)
+    np.save(os.path.join(store_dir, "offsets.npy"), offsets)
+    np.save(os.path.join(store_dir, "ids.npy"), encoded_ids)
+    np.save(os.path.join(store_dir, "id_order.npy"), np.argsort(encoded_ids, kind="stable").astype(np.int64))
+    np.save(os.path.join(store_dir, "sources.npy"), sources)
+    np.save(os.path.join(store_dir, "source_names.npy"), np.array(source_names, dtype=str))
+
+
+class ChunkStore:
+    """Read-only chunk store, memory-mapped (nothing is copied into the process until it is read) or read into memory"""
+
+    def __init__(self, directory: str, mapped: bool = True):
+        store_dir = os.path.join(directory, CHUNK_STORE_DIR)
+        mmap_mode = "r" if mapped else None
+        with open(os.path.join(store_dir, "text.bin"), "rb") as f:
+            if not mapped:
+                self._text = f.read()
+            elif os.fstat(f.fileno()).st_size:
+                self._text = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            else:
+                self._text = b""  # mmap refuses empty files
+        self.offsets = np.load(os.path.join(store_dir, "offsets.npy"), mmap_mode=mmap_mode)
+        self.ids = np.load(os.path.join(store_dir, "ids.npy"), mmap_mode=mmap_mode)
+        self.id_order = np.load(os.path.join(store_dir, "id_order.npy"), mmap_mode=mmap_mode)
+        self.sources = np.load(os.path.join(store_dir, "sources.npy"), mmap_mode=mmap_mode)
+        self.source_names = np.load(os.path.join(store_dir, "source_names.npy")).tolist()
+        if len(self.ids) != len(self.offsets) - 1:
+            raise ValueError(f"Chunk store in {store_dir} is inconsistent: {len(self.ids)} ids, {len(self.offsets) - 1} texts")
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def id_at(self, position: int) -> str:
+        return self.ids[position].decode("ascii")
+
+    def position_of(self, doc_id: str) -> int:
+        """FAISS position of the chunk with this id, or -1"""
+        key = doc_id.encode("ascii")
+        found = int(np.searchsorted(self.ids, key, sorter=self.id_order))
+        if found < len(self.id_order) and self.ids[self.id_order[found]] == key:
+            return int(self.id_order[found])
+        return -1
+
+    def document(self, position: int) -> Document:
+        start, end = self.offsets[position], self.offsets[position + 1]
+        return Document(
+            page_content=self._text[start:end].decode("utf-8"),
+            metadata={"source": self.source_names[self.sources[position]]},
+        )
+
+    def materialize(self) -> Tuple[InMemoryDocstore, Dict[int, str]]:
+        """The per-process docstore and id map LangChain builds, for indexes that are going to be modified"""
+        ids = [self.id_at(position) for position in range(len(self))]
+        docstore = InMemoryDocstore({doc_id: self.document(position) for position, doc_id in enumerate(ids)})
+        return docstore, dict(enumerate(ids))
+
+
+class ChunkDocstore(Docstore):
+    """LangChain docstore over a ChunkStore"""
+
+    def __init__(self, store: ChunkStore):
+        self.store = store
+
+    def search(self, search: str) -> Union[str, Document]:
+        position = self.store.position_of(search)
+        if position < 0:
+            return f"ID {search} not found."
+        return self.store.document(position)
+
+
+class ChunkIndexToId(Mapping[int, str]):
+    """Read-only stand-in for FAISS.index_to_docstore_id over a ChunkStore"""
+
+    def __init__(self, store: ChunkStore):
+        self.store = store
+
+    def __getitem__(self, position: int) -> str:
+        if not 0 <= position < len(self.store):
+            raise KeyError(position)
+        return self.store.id_at(position)
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(range(len(self.store)))
+
+    def __len__(self) -> int:
+        return len(self.store)
+
+
+def position_lookup(index_to_docstore_id: Mapping[int, str]) -> Callable[[str], int]:
+    """Docstore id -> FAISS position (-1 if absent): a binary search over a chunk store, a dict otherwise"""
+    if isinstance(index_to_docstore_id, ChunkIndexToId):
+        return index_to_docstore_id.store.position_of
+    positions = {doc_id: position for position, doc_id in index_to_docstore_id.items()}
+    return lambda doc_id: positions.get(doc_id, -1)
@@ -0,0 +1,189 @@
+import os
+
+
+def _env_flag(name: str, default: bool = False) -> bool:
+    return os.environ.get(name, "1" if default else "0").strip().lower() in ("1", "true", "yes", "on")
+
+
+# --- FILE PATHS ---
+POLICY_MANUAL_PATH = os.environ.get("UETCL_POLICY_MANUAL_PATH", "./data/policies_and_procedure_manual_2022.pdf")
+TRAINING_DATA_PATH = os.environ.get("UETCL_TRAINING_DATA_PATH", "./data/UETCL_Training_Data_new.csv")
+ROLES_AND_DEPARTMENTS_PATH = "./data/UETCL_Roles_and_Departments.csv"
+
+# --- INDEX ARTIFACT ---
+# Prebuilt indexes live here, one sub-directory per content key (see rag_index.py)
+INDEX_CACHE_DIR = os.environ.get("UETCL_INDEX_CACHE_DIR", "./data/index")
+# Serve the FAISS index and chunk texts from read-only memory maps of the artifact, so every worker process on a
+# host shares one page-cache copy instead of holding its own (see chunk_store.py)
+INDEX_MMAP_ENABLED = _env_flag("UETCL_INDEX_MMAP", default=True)
+# Extracted text of each PDF page, keyed by page fingerprint (see pdf_extract.py)
+PAGE_CACHE_DIR = os.environ.get("UETCL_PAGE_CACHE_DIR", "./data/page_cache")
+
+# --- EMBEDDING CACHE ---
+# Shared by index builds and query embedding (see embedding_cache.py)
+EMBEDDING_CACHE_ENABLED = _env_flag("UETCL_EMBEDDING_CACHE", default=True)
+EMBEDDING_CACHE_DIR = os.environ.get("UETCL_EMBEDDING_CACHE_DIR", "./data/embedding_cache")
+EMBEDDING_CACHE_DTYPE = os.environ.get("UETCL_EMBEDDING_CACHE_DTYPE", "float16")
+EMBEDDING_CACHE_MAX_BYTES = int(os.environ.get("UETCL_EMBEDDING_CACHE_MAX_BYTES", 512 * 1024 * 1024))
+# Set on extra worker processes so only one process on a host writes to the cache
+EMBEDDING_CACHE_READ_ONLY = _env_flag("UETCL_EMBEDDING_CACHE_READ_ONLY")
+
+# --- PDF EXTRACTION ---
+PDF_EXTRACT_WORKERS = int(os.environ.get("UETCL_PDF_EXTRACT_WORKERS", os.cpu_count() or 1))
+PDF_PAGES_PER_TASK = 8
+
+# --- RAG SETTINGS ---
+EMBEDDING_MODEL_NAME = os.environ.get("UETCL_EMBEDDING_MODEL", "all-MiniLM-L6-v2")
+CHUNK_SIZE = 500
+CHUNK_OVERLAP = 100
+RETRIEVER_K = 5
+# Chunks embedded and added to the index per step; bounds peak memory during a build
+EMBEDDING_BATCH_SIZE = int(os.environ.get("UETCL_EMBEDDING_BATCH_SIZE", 64))
+# Policy chunks stored per module and challenge at build time (see module_contexts.py)
+MODULE_CONTEXT_K = 4
+# Module questions add this many chunks from a live search to the stored module context
+MODULE_LIVE_SEARCH_K = 2
+
+# --- FAISS INDEX TYPE ---
+# FAISS factory string for the saved index: Flat (exact), HNSW32, IVFauto,Flat, IVFauto,PQ48x4, ...
+# Compact mode is SQfp16 (float16 vectors) or SQ8 (int8); see index_factory.py
+# Compare recall and latency with: python -m benchmarks.index_types, and memory with: python -m benchmarks.compact_storage
+FAISS_INDEX_FACTORY = os.environ.get("UETCL_FAISS_INDEX", "Flat")
+# Lossy index types (SQ, PQ) re-rank this many times k candidates by their float32 vectors; 0 turns it off
+FAISS_RESCORE_FACTOR = int(os.environ.get("UETCL_FAISS_RESCORE_FACTOR", 4))
+# IVF lists scanned per query
+FAISS_NPROBE = int(os.environ.get("UETCL_FAISS_NPROBE", 8))
+# HNSW candidate list size per query
+FAISS_EF_SEARCH = int(os.environ.get("UETCL_FAISS_EF_SEARCH", 64))
+
+# --- HYBRID RETRIEVAL ---
+# Dense and BM25 results are merged by reciprocal-rank fusion (see retrieval.py and lexical_index.py)
+HYBRID_RETRIEVAL_ENABLED = _env_flag("UETCL_HYBRID_RETRIEVAL", default=True)
+# Candidates taken from each ranking before fusion
+HYBRID_CANDIDATES = 10
+RRF_K = 60
+# Queries of at most this many known terms and no filler words ("VPN", "ICT Helpdesk") skip the embedding model
+KEYWORD_QUERY_MAX_TERMS = 3
+
+# --- TOPIC PARTITIONS ---
+# Questions inside a module search that module's chunks first (see topic_partitions.py)
+TOPIC_PARTITIONS_ENABLED = _env_flag("UETCL_TOPIC_PARTITIONS", default=True)
+# A chunk joins its nearest module and up to MAX_TOPICS-1 others within MARGIN cosine similarity of it
+TOPIC_PARTITION_MAX_TOPICS = 2
+TOPIC_PARTITION_MARGIN = 0.05
+# Below this best-match similarity a module question falls back to the global index
+TOPIC_PARTITION_MIN_SIMILARITY = float(os.environ.get("UETCL_TOPIC_PARTITION_MIN_SIMILARITY", 0.35))
+
+# --- CONTEXT PACKING ---
+# Retrieved chunks are MMR-selected, overlap-merged and cut to a token budget (see context_packing.py)
+CONTEXT_PACKING_ENABLED = _env_flag("UETCL_CONTEXT_PACKING", default=True)
+# Chunks retrieved for a general question before MMR picks RETRIEVER_K of them
+CONTEXT_CANDIDATES = 8
+# 1.0 ranks by relevance only; lower values trade relevance for diversity
+CONTEXT_MMR_LAMBDA = 0.7
+# Context tokens allowed per handler's prompt
+CONTEXT_TOKEN_BUDGETS = {
+    "general_question": int(os.environ.get("UETCL_CONTEXT_TOKENS_GENERAL", 600)),
+    "module_question": int(os.environ.get("UETCL_CONTEXT_TOKENS_MODULE", 500)),
+    "module_qa_prompt": int(os.environ.get("UETCL_CONTEXT_TOKENS_MODULE", 500)),
+    "challenge_eval": int(os.environ.get("UETCL_CONTEXT_TOKENS_CHALLENGE", 350)),
+}
+
+# --- RETRIEVAL CACHE ---
+# Per-process caches in front of the retriever (see retrieval.py)
+RETRIEVAL_CACHE_SIZE = int(os.environ.get("UETCL_RETRIEVAL_CACHE_SIZE", 2048))
+RETRIEVAL_CACHE_TTL_SECONDS = float(os.environ.get("UETCL_RETRIEVAL_CACHE_TTL_SECONDS", 6 * 3600))
+# A differently worded query whose embedding is at least this cosine-similar to a cached one reuses its results
+RETRIEVAL_CACHE_SIMILARITY = float(os.environ.get("UETCL_RETRIEVAL_CACHE_SIMILARITY", 0.95))
+
+# --- RETRIEVAL BATCHING ---
+# Query embeddings and FAISS searches from concurrent sessions are batched (see micro_batching.py)
+RETRIEVAL_BATCHING_ENABLED = _env_flag("UETCL_RETRIEVAL_BATCHING", default=True)
+RETRIEVAL_BATCH_MAX_SIZE = int(os.environ.get("UETCL_RETRIEVAL_BATCH_MAX_SIZE", 32))
+# How long a batch waits for more queries after its first; a lone query pays at most this much
+RETRIEVAL_BATCH_WAIT_MS = float(os.environ.get("UETCL_RETRIEVAL_BATCH_WAIT_MS", 5))
+# Threads running batches, each for embedding and for search
+RETRIEVAL_BATCH_WORKERS = int(os.environ.get("UETCL_RETRIEVAL_BATCH_WORKERS", 1))
+
+# --- CHALLENGE GRADER ---
+# An answer is graded locally when its best cosine similarity to one side's reference answers is at least
+# MIN_SIMILARITY and beats the other side by MARGIN; otherwise the LLM grades it (see challenge_grader.py)
+CHALLENGE_GRADER_MIN_SIMILARITY = float(os.environ.get("UETCL_CHALLENGE_GRADER_MIN_SIMILARITY", 0.6))
+CHALLENGE_GRADER_MARGIN = float(os.environ.get("UETCL_CHALLENGE_GRADER_MARGIN", 0.1))
+
+# --- INTENT ROUTER ---
+# A message is routed to an intent when its nearest centroid is at least this similar and beats the next by MARGIN
+INTENT_ROUTER_MIN_SIMILARITY = float(os.environ.get("UETCL_INTENT_ROUTER_MIN_SIMILARITY", 0.55))
+INTENT_ROUTER_MARGIN = float(os.environ.get("UETCL_INTENT_ROUTER_MARGIN", 0.05))
+
+# --- ANSWER CACHE ---
+# Semantic cache of LLM answers (see answer_cache.py)
+ANSWER_CACHE_ENABLED = _env_flag("UETCL_ANSWER_CACHE", default=True)
+ANSWER_CACHE_PATH = os.environ.get("UETCL_ANSWER_CACHE_PATH", "./data/answer_cache.sqlite3")
+ANSWER_CACHE_SIMILARITY = float(os.environ.get("UETCL_ANSWER_CACHE_SIMILARITY", 0.92))
+# Grading hinges on small wording differences ("report it" vs "don't report it"), so it needs a near-exact match
+ANSWER_CACHE_EVAL_SIMILARITY = float(os.environ.get("UETCL_ANSWER_CACHE_EVAL_SIMILARITY", 0.98))
+ANSWER_CACHE_MAX_ENTRIES = int(os.environ.get("UETCL_ANSWER_CACHE_MAX_ENTRIES", 5000))
+ANSWER_CACHE_TTL_SECONDS = float(os.environ.get("UETCL_ANSWER_CACHE_TTL_SECONDS", 7 * 24 * 3600))
+
+# --- SESSION STORE ---
+# Where the HTTP service keeps conversation state between messages (see session_store.py):
+# "memory://", "sqlite:///path/to/file.sqlite3" or "redis://host:6379/0"; use Redis when running several hosts
+SESSION_STORE_URL = os.environ.get("UETCL_SESSION_STORE_URL", "sqlite:///./data/sessions.sqlite3")
+# Sessions untouched for this long are dropped
+SESSION_TTL_SECONDS = float(os.environ.get("UETCL_SESSION_TTL_SECONDS", 24 * 3600))
+
+# --- ADMIN ---
+# Shows cache statistics and maintenance controls in the sidebar
+ADMIN_PANEL_ENABLED = _env_flag("UETCL_ADMIN_PANEL")
+
+# --- STARTUP ---
+# The tutor loads on a background thread while the UI renders; pages waiting for it check this often
+WARMUP_POLL_SECONDS = 1.0
+
+# --- TRACING ---
+# Per-stage spans for every chat turn (see tracing.py); the admin panel shows recent p50/p95 per stage
+TRACING_ENABLED = _env_flag("UETCL_TRACING", default=True)
+TRACE_DIR = os.environ.get("UETCL_TRACE_DIR", "./data/traces")
+TRACE_FILE_MAX_BYTES = int(os.environ.get("UETCL_TRACE_FILE_MAX_BYTES", 10 * 1024 * 1024))
+TRACE_FILE_BACKUPS = 5
+# Spans per stage kept in memory for percentiles
+TRACE_RECENT_SPANS = 1000
+# How often the Prometheus text file is rewritten
+TRACE_EXPORT_INTERVAL_SECONDS = 10.0
+
+# --- LLM ---
+# "openai" (live), "record" (live, saving completions), "replay" (saved completions, offline) or "fake"
+# (offline canned answers); see llm_calls.py
+LLM_BACKEND = os.environ.get("UETCL_LLM_BACKEND", "openai")
+# Backends that call the OpenAI API and need a key
+LIVE_BACKENDS = ("openai", "record")
+FAKE_LLM_TOKEN_DELAY_SECONDS = float(os.environ.get("UETCL_FAKE_LLM_TOKEN_DELAY_SECONDS", 0.02))
+LLM_RECORDINGS_PATH = os.environ.get("UETCL_LLM_RECORDINGS_PATH", "./data/llm_recordings.jsonl")
+# 1.0 replays at the recorded speed, 0 instantly
+LLM_REPLAY_LATENCY_SCALE = float(os.environ.get("UETCL_LLM_REPLAY_LATENCY_SCALE", 1.0))
+# "fake" answers unrecorded prompts with the fake model; "error" raises
+LLM_REPLAY_ON_MISS = os.environ.get("UETCL_LLM_REPLAY_ON_MISS", "fake")
+# Share of fake completions that fail with an HTTP 429 before their first token, to exercise retries offline
+FAKE_LLM_ERROR_RATE = float(os.environ.get("UETCL_FAKE_LLM_ERROR_RATE", 0.0))
+
+# --- LLM DISPATCHER ---
+# Sessions sending the same rendered prompt at the same time share one call (see single_flight.py)
+LLM_COALESCING_ENABLED = _env_flag("UETCL_LLM_COALESCING", default=True)
+# Every LLM call from every session waits its turn here (see llm_dispatcher.py)
+LLM_MAX_CONCURRENCY = int(os.environ.get("UETCL_LLM_MAX_CONCURRENCY", 4))
+# Keep these under the OpenAI account's limits
+LLM_REQUESTS_PER_MINUTE = float(os.environ.get("UETCL_LLM_REQUESTS_PER_MINUTE", 180))
+LLM_TOKENS_PER_MINUTE = float(os.environ.get("UETCL_LLM_TOKENS_PER_MINUTE", 80000))
+# Providers enforce per-minute limits over shorter windows too, so at most this many seconds of allowance can burst
+LLM_RATE_BURST_SECONDS = 10.0
+# Completion tokens assumed per call when charging the token bucket (OpenAI's default max_tokens)
+LLM_EXPECTED_COMPLETION_TOKENS = 256
+# A call waiting longer than this for its turn fails
+LLM_QUEUE_TIMEOUT_SECONDS = float(os.environ.get("UETCL_LLM_QUEUE_TIMEOUT_SECONDS", 60))
+# Per-request timeout passed to the OpenAI client
+LLM_REQUEST_TIMEOUT_SECONDS = float(os.environ.get("UETCL_LLM_REQUEST_TIMEOUT_SECONDS", 30))
+# Retries of 429, 5xx, timeout and connection errors, with full-jitter exponential backoff
+LLM_MAX_RETRIES = int(os.environ.get("UETCL_LLM_MAX_RETRIES", 4))
+LLM_BACKOFF_BASE_SECONDS = 0.5
+LLM_BACKOFF_MAX_SECONDS = 8.0
@@ -0,0 +1,144 @@
+"""Assembles the policy context a prompt carries from the retrieved chunks.
+
+Retrieved chunks overlap (the splitter repeats up to ``CHUNK_OVERLAP``
+characters between neighbours) and often say the same thing, and joining all
+of them puts no bound on prompt size. Packing runs in three steps:
+
+1. MMR picks chunks that are relevant to the query but not to each other,
+2. chunks that continue one another are merged back into one span, with the
+   repeated overlap written once,
+3. spans are added in relevance order until the handler's token budget is spent.
+
+Token counts are estimated at four characters per token, which is close enough
+for English policy text to budget with.
+"""
+import logging
+import math
+from dataclasses import dataclass
+from typing import List, Optional, Sequence
+
+import numpy as np
+from langchain.schema import Document
+
+import config
+
+logger = logging.getLogger(__name__)
+
+CHARS_PER_TOKEN = 4
+# Shorter shared edges are coincidence, not splitter overlap
+MIN_MERGE_OVERLAP = 20
+
+
+def estimate_tokens(text: str) -> int:
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+@dataclass
+class PackedContext:
+    text: str
+    documents: List[Document]  # The chunks whose text made it into the context
+    tokens_before: int  # The chunks the handler sends with packing off, joined
+    tokens_after: int
+
+    @property
+    def tokens_saved(self) -> int:
+        return self.tokens_before - self.tokens_after
+
+
+def mmr_select(query_vector: np.ndarray, doc_vectors: np.ndarray, k: int, lambda_mult: float = config.CONTEXT_MMR_LAMBDA) -> List[int]:
+    """Indices of up to k documents by maximal marginal relevance, best first"""
+    if len(doc_vectors) == 0:
+        return []
+    doc_vectors = doc_vectors / np.maximum(np.linalg.norm(doc_vectors, axis=1, keepdims=True), 1e-12)
+    query_vector = query_vector / max(np.linalg.norm(query_vector), 1e-12)
+    relevance = doc_vectors @ query_vector
+    pairwise = doc_vectors @ doc_vectors.T
+    # Highest similarity of each candidate to anything selected so far
+    redundancy = np.full(len(doc_vectors), -np.inf, dtype=np.float32)
+    available = np.ones(len(doc_vectors), dtype=bool)
+    selected: List[int] = []
+    for _ in range(min(k, len(doc_vectors))):
+        scores = lambda_mult * relevance - (1 - lambda_mult) * np.maximum(redundancy, 0)
+        scores[~available] = -np.inf
+        best = int(np.argmax(scores))
+        selected.append(best)
+        available[best] = False
+        redundancy = np.maximum(redundancy, pairwise[best])
+    return selected
+
+
+def _overlap_length(head: str, tail: str, max_overlap: int) -> int:
+    """Length of the longest suffix of head that is also a prefix of tail"""
+    for size in range(min(len(head), len(tail), max_overlap), MIN_MERGE_OVERLAP - 1, -1):
+        if head.endswith(tail[:size]):
+            return size
+    return 0
+
+def merge_overlapping(texts: Sequence[str], max_overlap: int = 2 * config.CHUNK_OVERLAP) -> List[List[int]]:
+    """Group chunk positions into contiguous spans; each group lists its chunks in reading order.
+    Groups keep the order of their best-ranked chunk."""
+    spans: List[List[int]] = []
+    for i, text in enumerate(texts):
+        if any(text in texts[j] for span in spans for j in span):
+            continue  # Already covered verbatim by a longer chunk
+        spans.append([i])
+    merged = True
+    while merged:
+        merged = False
+        for a in range(len(spans)):
+            for b in range(len(spans)):
+                if a != b and _overlap_length(texts[spans[a][-1]], texts[spans[b][0]], max_overlap):
+                    spans[min(a, b)] = spans[a] + spans[b]
+                    del spans[max(a, b)]
+                    merged = True
+                    break
+            if merged:
+                break
+    return spans
+
+def _span_text(texts: Sequence[str], span: List[int], max_overlap: int) -> str:
+    text = texts[span[0]]
+    for position in span[1:]:
+        text += texts[position][_overlap_length(text, texts[position], max_overlap):]
+    return text
+
+
+def pack_context(
+    docs: Sequence[Document],
+    query_vector: Sequence[float],
+    doc_vectors: np.ndarray,
+    token_budget: int,
+    k: int = config.RETRIEVER_K,
+    separator: str = "\n\n",
+    unpacked_count: Optional[int] = None,
+) -> PackedContext:
+    """Select, merge and budget retrieved chunks into one context string.
+
+    unpacked_count is how many of docs (best first) the handler sends with packing off, when it
+    retrieves extra candidates for packing; savings are measured against those."""
+    texts = [doc.page_content for doc in docs]
+    tokens_before = estimate_tokens(separator.join(texts[:unpacked_count]))
+    order = mmr_select(np.asarray(query_vector, dtype=np.float32), np.asarray(doc_vectors, dtype=np.float32), k)
+    selected = [texts[i] for i in order]
+    max_overlap = 2 * config.CHUNK_OVERLAP
+
+    parts, used, packed_positions = [], 0, []
+    for span in merge_overlapping(selected, max_overlap):
+        text = _span_text(selected, span, max_overlap)
+        cost = estimate_tokens(text) + (estimate_tokens(separator) if parts else 0)
+        if used + cost > token_budget:
+            if parts:
+                continue  # A smaller, less relevant span may still fit
+            text = text[:token_budget * CHARS_PER_TOKEN]  # Never send an empty context
+            cost = estimate_tokens(text)
+        parts.append(text)
+        used += cost
+        packed_positions.extend(span)
+
+    text = separator.join(parts)
+    packed = PackedContext(text, [docs[order[p]] for p in sorted(packed_positions)], tokens_before, estimate_tokens(text))
+    logger.info(
+        "Packed %d of %d chunks into %d tokens (budget %d, %d saved)",
+        len(packed.documents), len(docs), packed.tokens_after, token_budget, packed.tokens_saved,
+    )
+    return packed
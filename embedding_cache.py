@@ -0,0 +1,265 @@
+"""Persistent embedding cache keyed by (model name, text hash).
+
+Vectors for each model live in one flat float16/float32 file that readers
+memory-map; a small SQLite table maps text hashes to rows in that file. Any
+number of processes on a host can read the cache at once (read-only workers
+open both files without write access), and writers serialise on a lock file.
+When the vector file grows past its size budget the least recently used rows
+are dropped by rewriting it under a new generation number, so readers holding
+the old map keep a consistent view until their next lookup. Lookups don't
+write: hit times are batched in memory and flushed every TOUCH_FLUSH_SECONDS
+and before each write, so eviction order lags reads by at most that long.
+"""
+import contextlib
+import fcntl
+import hashlib
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Mapping, Optional, Sequence
+
+import numpy as np
+from langchain.embeddings.base import Embeddings
+
+import config
+
+logger = logging.getLogger(__name__)
+
+SQLITE_MAX_PARAMS = 500
+# After eviction the cache is trimmed to this fraction of its budget, so it doesn't evict on every write
+EVICTION_TARGET = 0.8
+# Hits record their last_used time in memory and write them at most this often, or before this process writes
+TOUCH_FLUSH_SECONDS = 30.0
+
+
+def text_key(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:32]
+
+
+class EmbeddingCache:
+    """Memory-mapped vector file plus a SQLite offsets index for one embedding model"""
+
+    def __init__(
+        self,
+        cache_dir: str,
+        model_name: str,
+        dtype: str = config.EMBEDDING_CACHE_DTYPE,
+        max_bytes: int = config.EMBEDDING_CACHE_MAX_BYTES,
+        read_only: bool = config.EMBEDDING_CACHE_READ_ONLY,
+    ):
+        self.dtype = np.dtype(dtype)
+        self.directory = os.path.join(cache_dir, re.sub(r"[^A-Za-z0-9_.-]+", "_", model_name), self.dtype.name)
+        self.max_bytes = max_bytes
+        self.read_only = read_only
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._vectors: Optional[np.ndarray] = None
+        self._vectors_generation: Optional[int] = None
+        self._pending_touches: Dict[str, float] = {}
+        self._touches_flushed_at = time.monotonic()
+        if not read_only:
+            os.makedirs(self.directory, exist_ok=True)
+        self._db = self._connect()
+
+    # --- STORAGE ---
+    def _connect(self) -> Optional[sqlite3.Connection]:
+        db_path = os.path.join(self.directory, "index.sqlite")
+        if self.read_only:
+            if not os.path.exists(db_path):
+                return None
+            return sqlite3.connect(f"file:{db_path}?mode=ro", uri=True, check_same_thread=False, isolation_level=None)
+        db = sqlite3.connect(db_path, check_same_thread=False, timeout=30, isolation_level=None)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, row INTEGER NOT NULL, last_used REAL NOT NULL)")
+        db.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        return db
+
+    @contextlib.contextmanager
+    def _write_lock(self):
+        """Serialise writers across processes; readers never take this lock"""
+        with open(os.path.join(self.directory, "write.lock"), "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _meta(self) -> Dict[str, str]:
+        return dict(self._db.execute("SELECT name, value FROM meta").fetchall())
+
+    def _vectors_path(self, generation: int) -> str:
+        return os.path.join(self.directory, f"vectors.{generation}.{self.dtype.name}")
+
+    def _matrix(self, generation: int, dim: int, rows_needed: int) -> np.ndarray:
+        """Memory-map the vector file, remapping after it grows or is rewritten by eviction"""
+        if self._vectors is None or self._vectors_generation != generation or len(self._vectors) < rows_needed:
+            path = self._vectors_path(generation)
+            rows = os.path.getsize(path) // (dim * self.dtype.itemsize)
+            self._vectors = np.memmap(path, dtype=self.dtype, mode="r", shape=(rows, dim)) if rows else np.empty((0, dim), self.dtype)
+            self._vectors_generation = generation
+        return self._vectors
+
+    def _select_rows(self, keys: Sequence[str], columns: str = "key, row") -> List[tuple]:
+        rows = []
+        for start in range(0, len(keys), SQLITE_MAX_PARAMS):
+            part = list(keys[start:start + SQLITE_MAX_PARAMS])
+            placeholders = ",".join("?" * len(part))
+            rows.extend(self._db.execute(f"SELECT {columns} FROM entries WHERE key IN ({placeholders})", part).fetchall())
+        return rows
+
+    def _flush_touches(self) -> None:
+        """Write the batched hit times; MAX keeps a newer time another process already wrote"""
+        if self._pending_touches:
+            self._db.execute("BEGIN")
+            self._db.executemany(
+                "UPDATE entries SET last_used = MAX(last_used, ?) WHERE key = ?",
+                [(last_used, key) for key, last_used in self._pending_touches.items()],
+            )
+            self._db.execute("COMMIT")
+            self._pending_touches.clear()
+        self._touches_flushed_at = time.monotonic()
+
+    # --- PUBLIC API ---
+    def get_many(self, keys: Sequence[str]) -> Dict[str, np.ndarray]:
+        """Cached float32 vectors for whichever keys are present"""
+        with self._lock:
+            if self._db is None:
+                self._db = self._connect()
+            if self._db is None:
+                self.misses += len(keys)
+                return {}
+            # One read transaction, so meta and rows come from the same snapshot even if a writer evicts meanwhile
+            self._db.execute("BEGIN")
+            try:
+                meta = self._meta()
+                found = self._select_rows(keys) if "dim" in meta else []
+            finally:
+                self._db.execute("COMMIT")
+            if not found:
+                self.misses += len(keys)
+                return {}
+            try:
+                matrix = self._matrix(int(meta["generation"]), int(meta["dim"]), max(row for _, row in found) + 1)
+            except FileNotFoundError:
+                # Evicted and removed between our snapshot and the remap; treat as a miss this time
+                self.misses += len(keys)
+                return {}
+            result = {key: np.asarray(matrix[row], dtype=np.float32) for key, row in found}
+            if not self.read_only:
+                self._pending_touches.update(dict.fromkeys(result, time.time()))
+                if time.monotonic() - self._touches_flushed_at >= TOUCH_FLUSH_SECONDS:
+                    self._flush_touches()
+            self.hits += len(result)
+            self.misses += len(keys) - len(result)
+            return result
+
+    def put_many(self, vectors_by_key: Mapping[str, Sequence[float]]) -> None:
+        """Append new vectors; a no-op for read-only caches"""
+        if self.read_only or not vectors_by_key:
+            return
+        with self._lock, self._write_lock():
+            # So an eviction below ranks rows by this process's recent hits too
+            self._flush_touches()
+            already_cached = {key for (key,) in self._select_rows(list(vectors_by_key), columns="key")}
+            keys = [key for key in vectors_by_key if key not in already_cached]
+            if not keys:
+                return
+            vectors = np.asarray([vectors_by_key[key] for key in keys], dtype=self.dtype)
+            meta = self._meta()
+            if "dim" not in meta:
+                meta = {"dim": str(vectors.shape[1]), "generation": "0"}
+                self._db.executemany("INSERT INTO meta (name, value) VALUES (?, ?)", list(meta.items()))
+            dim, generation = int(meta["dim"]), int(meta["generation"])
+            if vectors.shape[1] != dim:
+                raise ValueError(f"Embedding cache at {self.directory} holds {dim}-d vectors, got {vectors.shape[1]}-d")
+
+            row_bytes = dim * self.dtype.itemsize
+            path = self._vectors_path(generation)
+            first_row = os.path.getsize(path) // row_bytes if os.path.exists(path) else 0
+            with open(path, "ab") as f:
+                f.write(vectors.tobytes())
+            # Rows only become visible once the bytes they point at are on disk
+            now = time.time()
+            self._db.execute("BEGIN")
+            self._db.executemany(
+                "INSERT INTO entries (key, row, last_used) VALUES (?, ?, ?)",
+                [(key, first_row + i, now) for i, key in enumerate(keys)],
+            )
+            self._db.execute("COMMIT")
+            if (first_row + len(keys)) * row_bytes > self.max_bytes:
+                self._evict(dim, generation)
+
+    def _evict(self, dim: int, generation: int) -> None:
+        """Rewrite the vector file keeping only the most recently used rows that fit the target size"""
+        row_bytes = dim * self.dtype.itemsize
+        keep = max(int(self.max_bytes * EVICTION_TARGET) // row_bytes, 0)
+        survivors = self._db.execute(
+            "SELECT key, row, last_used FROM entries ORDER BY last_used DESC LIMIT ?", (keep,)
+        ).fetchall()
+        survivors.sort(key=lambda entry: entry[1])  # sequential reads from the old file
+        old_path = self._vectors_path(generation)
+        old_rows = os.path.getsize(old_path) // row_bytes
+        old_matrix = np.memmap(old_path, dtype=self.dtype, mode="r", shape=(old_rows, dim))
+        new_path = self._vectors_path(generation + 1)
+        with open(new_path, "wb") as f:
+            for start in range(0, len(survivors), 4096):
+                rows = [row for _, row, _ in survivors[start:start + 4096]]
+                f.write(np.ascontiguousarray(old_matrix[rows]).tobytes())
+        del old_matrix
+
+        self._db.execute("BEGIN")
+        self._db.execute("DELETE FROM entries")
+        self._db.executemany(
+            "INSERT INTO entries (key, row, last_used) VALUES (?, ?, ?)",
+            [(key, new_row, last_used) for new_row, (key, _, last_used) in enumerate(survivors)],
+        )
+        self._db.execute("UPDATE meta SET value = ? WHERE name = 'generation'", (str(generation + 1),))
+        self._db.execute("COMMIT")
+        # Readers that still map the old file keep its inode alive until they remap
+        os.remove(old_path)
+        logger.info("Evicted %d embeddings from %s, kept %d", old_rows - len(survivors), self.directory, len(survivors))
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            entries = 0
+            if self._db is not None:
+                (entries,) = self._db.execute("SELECT COUNT(*) FROM entries").fetchone()
+            lookups = self.hits + self.misses
+            return {
+                "entries": entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+class CachedEmbeddings(Embeddings):
+    """Embeddings wrapper that only runs the underlying model on texts the cache hasn't seen.
+
+    Queries and documents share cache entries: for sentence-transformers models
+    like all-MiniLM-L6-v2, embed_query is embed_documents on a single text.
+    """
+
+    def __init__(self, base: Embeddings, cache: EmbeddingCache):
+        self.base = base
+        self.cache = cache
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys = [text_key(text) for text in texts]
+        vectors = self.cache.get_many(list(dict.fromkeys(keys)))
+        missing = {key: text for key, text in zip(keys, texts) if key not in vectors}
+        if missing:
+            computed = self.base.embed_documents(list(missing.values()))
+            # Round through the cache dtype so a vector is identical whether it was just computed or read back
+            computed = np.asarray(computed, dtype=self.cache.dtype)
+            new_vectors = dict(zip(missing, computed))
+            self.cache.put_many(new_vectors)
+            vectors.update({key: vector.astype(np.float32) for key, vector in new_vectors.items()})
+        return [vectors[key].tolist() for key in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
@@ -0,0 +1,126 @@
+"""Configurable FAISS index types for the policy index.
+
+The vector store is always built (and updated incrementally) as an exact flat
+index, because only that can have vectors added and deleted by id freely.
+When ``config.FAISS_INDEX_FACTORY`` names something else, the flat vectors are
+copied into that index type just before the artifact is saved. Factory strings
+are FAISS's own (``Flat``, ``HNSW32``, ``IVF64,Flat``, ``IVF64,PQ48x4``), plus
+``IVFauto``, which picks a list count suited to the corpus size.
+
+Search-time knobs (``nprobe`` for IVF, ``efSearch`` for HNSW) are not part of
+the saved index, so they are recorded in the artifact's meta file and applied
+every time the index is loaded.
+
+Compact mode is a lossy code: ``SQfp16`` (float16, half the memory of float32)
+or ``SQ8`` (int8, a quarter), alone or under IVF/HNSW. For those the artifact
+also keeps the float32 vectors, memory-mapped rather than loaded, and
+``RescoredIndex`` re-ranks the index's top ``k * FAISS_RESCORE_FACTOR``
+candidates by their exact distance, so only those rows are ever read.
+"""
+import math
+import re
+from typing import Optional, Tuple
+
+import faiss
+import numpy as np
+
+FLAT = "Flat"
+
+# Factory string components that store vectors as lossy codes
+LOSSY_CODES = re.compile(r"\b(?:SQ|PQ|OPQ|RQ|LSH)")
+
+# FAISS warns below this many training points per IVF list
+MIN_POINTS_PER_LIST = 39
+
+
+def is_flat(factory: str) -> bool:
+    return factory.strip() == FLAT
+
+def is_lossy(factory: str) -> bool:
+    """The index type stores approximations of the vectors, so its distances are approximate too"""
+    return bool(LOSSY_CODES.search(factory))
+
+def resolve_factory_string(factory: str, num_vectors: int) -> str:
+    """Replace IVFauto with IVF<n>, about 4*sqrt(n) lists but never fewer than 39 points per list"""
+    nlist = max(1, min(int(4 * math.sqrt(num_vectors)), num_vectors // MIN_POINTS_PER_LIST))
+    return re.sub(r"\bIVFauto\b", f"IVF{nlist}", factory.strip())
+
+def build_index(vectors: np.ndarray, factory: str) -> faiss.Index:
+    """Train (when the type needs it) and fill an L2 index of the given type"""
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    index = faiss.index_factory(vectors.shape[1], resolve_factory_string(factory, len(vectors)), faiss.METRIC_L2)
+    if not index.is_trained:
+        index.train(vectors)
+    index.add(vectors)
+    return index
+
+def convert_index(index: faiss.Index, factory: str) -> faiss.Index:
+    """Copy every vector of a flat index into a new index of another type, keeping their order"""
+    if is_flat(factory):
+        return index
+    converted = build_index(index.reconstruct_n(0, index.ntotal), factory)
+    try:
+        faiss.extract_index_ivf(converted).make_direct_map()  # Lets IVF vectors be read back by position
+    except RuntimeError:
+        pass  # Not an IVF index
+    return converted
+
+def apply_search_params(index: faiss.Index, nprobe: Optional[int] = None, ef_search: Optional[int] = None) -> None:
+    """Set nprobe/efSearch on the index types that have them; other types ignore them"""
+    if isinstance(index, RescoredIndex):
+        index = index.index
+    params = faiss.ParameterSpace()
+    for name, value in (("nprobe", nprobe), ("efSearch", ef_search)):
+        if value is None:
+            continue
+        try:
+            params.set_index_parameter(index, name, value)
+        except RuntimeError:
+            pass  # Not a parameter of this index type
+
+def index_memory_bytes(index: faiss.Index) -> int:
+    """Size of the serialized index, a close proxy for its resident size (without mapped rescoring vectors)"""
+    if isinstance(index, RescoredIndex):
+        index = index.index
+    return int(faiss.serialize_index(index).size)
+
+
+class RescoredIndex:
+    """A lossy index whose top candidates are re-ranked by their exact float32 vectors.
+
+    Stands in for the faiss index inside LangChain's FAISS store: search,
+    reconstruct and reconstruct_n use the float32 vectors (typically a read-only
+    memmap), everything else goes to the wrapped index."""
+
+    def __init__(self, index: faiss.Index, vectors: np.ndarray, factor: int):
+        if len(vectors) != index.ntotal:
+            raise ValueError(f"{len(vectors)} rescoring vectors for {index.ntotal} indexed")
+        self.index = index
+        self.vectors = vectors
+        self.factor = max(1, factor)
+
+    def __getattr__(self, name: str):
+        return getattr(self.index, name)
+
+    def search(self, x: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        x = np.ascontiguousarray(x, dtype=np.float32)
+        _, candidates = self.index.search(x, k * self.factor)
+        inner_product = self.index.metric_type == faiss.METRIC_INNER_PRODUCT
+        distances = np.full((len(x), k), -np.inf if inner_product else np.inf, dtype=np.float32)
+        labels = np.full((len(x), k), -1, dtype=np.int64)
+        for row, (query, found) in enumerate(zip(x, candidates)):
+            found = np.sort(found[found >= 0])  # In file order, for sequential reads of the mapped vectors
+            if not len(found):
+                continue
+            vectors = np.asarray(self.vectors[found], dtype=np.float32)
+            scores = -(vectors @ query) if inner_product else ((vectors - query) ** 2).sum(axis=1)
+            best = np.argsort(scores, kind="stable")[:k]
+            distances[row, :len(best)] = -scores[best] if inner_product else scores[best]
+            labels[row, :len(best)] = found[best]
+        return distances, labels
+
+    def reconstruct(self, key: int) -> np.ndarray:
+        return np.array(self.vectors[key], dtype=np.float32)
+
+    def reconstruct_n(self, i0: int, ni: int) -> np.ndarray:
+        return np.array(self.vectors[i0:i0 + ni], dtype=np.float32)
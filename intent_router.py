@@ -0,0 +1,102 @@
+"""Nearest-centroid intent classifier over labelled example utterances.
+
+Each intent's examples are embedded once with the index's embedding model and
+averaged into a unit centroid. Routing a message is then one matrix-vector
+product against the centroids. A message only gets an intent when its best
+centroid is similar enough and clearly ahead of the runner-up; otherwise the
+caller falls back to its own rules.
+"""
+import threading
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+from langchain.embeddings.base import Embeddings
+
+import config
+
+INTENT_EXAMPLES: Dict[str, List[str]] = {
+    "greeting": [
+        "hi", "hello", "hey there", "good morning", "good afternoon", "hello, how are you?", "hi tutor",
+    ],
+    "thanks": [
+        "thanks", "thank you", "thanks a lot", "ok thanks", "great, thank you", "cheers", "appreciate it",
+    ],
+    "progress": [
+        "how am I doing?", "what's my progress", "how many modules have I completed", "which modules have I finished",
+        "am I done with my training", "show my progress", "how many mandatory modules are left",
+    ],
+    "navigation": [
+        "which module next?", "what module should I do next", "where do I start", "what modules are there",
+        "which modules are mandatory for me", "what should I study next", "go back to the module list",
+    ],
+    "help": [
+        "help", "I'm stuck", "I'm confused", "how does this work", "what can you do", "what can I ask you",
+    ],
+    "continue": [
+        "continue", "next", "go on", "proceed", "next step", "let's move on", "keep going", "I'm ready",
+    ],
+    # Competes with the intents above so policy questions aren't pulled into them; never routed locally
+    "question": [
+        "What is phishing?", "How do I report a security incident?", "How long must my password be?",
+        "What is the policy on USB drives?", "Can I use public Wi-Fi for work?", "Explain the data classification levels",
+        "Who should I contact if my laptop is stolen?", "What is ransomware?",
+    ],
+}
+
+
+@dataclass
+class IntentPrediction:
+    intent: str
+    similarity: float
+    margin: float
+
+
+class IntentRouter:
+    """Maps a message embedding to the nearest intent centroid, or to nothing when unsure"""
+
+    def __init__(
+        self,
+        embedding_model: Embeddings,
+        examples: Dict[str, List[str]] = INTENT_EXAMPLES,
+        min_similarity: float = config.INTENT_ROUTER_MIN_SIMILARITY,
+        margin: float = config.INTENT_ROUTER_MARGIN,
+    ):
+        self.embedding_model = embedding_model
+        self.examples = examples
+        self.min_similarity = min_similarity
+        self.margin = margin
+        self.routed = {intent: 0 for intent in examples}
+        self._lock = threading.Lock()
+        self._intents: List[str] = []
+        self._centroids: Optional[np.ndarray] = None
+
+    def _load_centroids(self) -> np.ndarray:
+        """Embed every example in one batch, the first time a message is routed"""
+        with self._lock:
+            if self._centroids is None:
+                intents = list(self.examples)
+                texts = [text for intent in intents for text in self.examples[intent]]
+                vectors = np.asarray(self.embedding_model.embed_documents(texts), dtype=np.float32)
+                vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+                centroids, start = [], 0
+                for intent in intents:
+                    end = start + len(self.examples[intent])
+                    centroid = vectors[start:end].mean(axis=0)
+                    centroids.append(centroid / max(np.linalg.norm(centroid), 1e-12))
+                    start = end
+                self._intents, self._centroids = intents, np.vstack(centroids)
+            return self._centroids
+
+    def classify(self, message_embedding: Sequence[float]) -> Optional[IntentPrediction]:
+        centroids = self._load_centroids()
+        vector = np.asarray(message_embedding, dtype=np.float32)
+        similarities = centroids @ (vector / max(np.linalg.norm(vector), 1e-12))
+        best, runner_up = np.argsort(similarities)[::-1][:2]
+        margin = float(similarities[best] - similarities[runner_up])
+        if similarities[best] < self.min_similarity or margin < self.margin:
+            return None
+        intent = self._intents[best]
+        with self._lock:
+            self.routed[intent] += 1
+        return IntentPrediction(intent, float(similarities[best]), margin)
@@ -0,0 +1,120 @@
+"""BM25 inverted index over the same chunks as the FAISS index.
+
+Dense search blurs exact policy terms ("42 days", "ICT Helpdesk", "VPN",
+clause numbers), so the retriever fuses it with this lexical index. Postings
+are stored as flat numpy arrays with each posting's BM25 weight precomputed,
+so a query is a few array slices and adds rather than a scoring loop.
+"""
+import math
+import os
+import re
+from collections import Counter
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+# Terms too common to say anything about a policy question
+STOPWORDS = frozenset(
+    "a an and are as at be by can do does for from how i if in is it me my of on or should the this to "
+    "was we what when where which who why will with you your".split()
+)
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[.\-][a-z0-9]+)*")
+
+
+def tokenize(text: str, drop_stopwords: bool = True) -> List[str]:
+    """Lowercased terms, keeping clause numbers like 4.2.1 and words like wi-fi intact"""
+    tokens = _TOKEN_PATTERN.findall(text.lower())
+    return [token for token in tokens if token not in STOPWORDS] if drop_stopwords else tokens
+
+
+class BM25Index:
+    """Immutable BM25 index mapping query terms to scored chunk ids"""
+
+    def __init__(self, chunk_ids: np.ndarray, terms: np.ndarray, term_offsets: np.ndarray,
+                 postings_doc: np.ndarray, postings_weight: np.ndarray):
+        self.chunk_ids = chunk_ids
+        self.terms = terms
+        self.term_offsets = term_offsets
+        self.postings_doc = postings_doc
+        self.postings_weight = postings_weight
+        self._term_ids: Dict[str, int] = {term: i for i, term in enumerate(terms.tolist())}
+
+    @classmethod
+    def build(cls, chunk_ids: Sequence[str], texts: Sequence[str]) -> "BM25Index":
+        term_counts = [Counter(tokenize(text)) for text in texts]
+        doc_lengths = np.array([sum(counts.values()) for counts in term_counts], dtype=np.float32)
+        avg_length = float(doc_lengths.mean()) if len(doc_lengths) else 0.0
+
+        postings: Dict[str, List[Tuple[int, int]]] = {}
+        for doc, counts in enumerate(term_counts):
+            for term, tf in counts.items():
+                postings.setdefault(term, []).append((doc, tf))
+
+        terms = sorted(postings)
+        offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        docs, weights = [], []
+        num_docs = len(texts)
+        for i, term in enumerate(terms):
+            entries = postings[term]
+            idf = math.log(1 + (num_docs - len(entries) + 0.5) / (len(entries) + 0.5))
+            term_docs = np.array([doc for doc, _ in entries], dtype=np.int32)
+            tf = np.array([tf for _, tf in entries], dtype=np.float32)
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * doc_lengths[term_docs] / (avg_length or 1.0))
+            docs.append(term_docs)
+            weights.append(idf * tf * (BM25_K1 + 1) / (tf + norm))
+            offsets[i + 1] = offsets[i] + len(entries)
+        return cls(
+            np.array(chunk_ids, dtype=str),
+            np.array(terms, dtype=str),
+            offsets,
+            np.concatenate(docs) if docs else np.empty(0, np.int32),
+            np.concatenate(weights).astype(np.float32) if weights else np.empty(0, np.float32),
+        )
+
+    def __len__(self) -> int:
+        return len(self.chunk_ids)
+
+    def has_term(self, term: str) -> bool:
+        return term in self._term_ids
+
+    def search(self, query: str, k: int) -> List[Tuple[str, float]]:
+        """Top-k (chunk id, BM25 score) pairs; chunks sharing no term with the query are never returned"""
+        scores = np.zeros(len(self.chunk_ids), dtype=np.float32)
+        for term in set(tokenize(query)):
+            term_id = self._term_ids.get(term)
+            if term_id is None:
+                continue
+            start, end = self.term_offsets[term_id], self.term_offsets[term_id + 1]
+            scores[self.postings_doc[start:end]] += self.postings_weight[start:end]
+        matched = np.flatnonzero(scores)
+        if len(matched) > k:
+            matched = matched[np.argpartition(scores[matched], -k)[-k:]]
+        matched = matched[np.argsort(-scores[matched], kind="stable")]
+        return [(str(self.chunk_ids[doc]), float(scores[doc])) for doc in matched]
+
+    def save(self, path: str) -> None:
+        tmp_path = f"{path}.{os.getpid()}.tmp.npz"
+        np.savez(
+            tmp_path,
+            chunk_ids=self.chunk_ids,
+            terms=self.terms,
+            term_offsets=self.term_offsets,
+            postings_doc=self.postings_doc,
+            postings_weight=self.postings_weight,
+        )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "BM25Index":
+        with np.load(path, allow_pickle=False) as arrays:
+            return cls(
+                arrays["chunk_ids"],
+                arrays["terms"],
+                arrays["term_offsets"],
+                arrays["postings_doc"],
+                arrays["postings_weight"],
+            )
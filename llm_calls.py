@@ -0,0 +1,292 @@
+"""Every LLM completion the tutor makes goes through this module.
+
+Handlers format a prompt template and either wait for the whole answer
+(run_prompt) or consume it token by token as the model produces it
+(stream_prompt). The backend is chosen with UETCL_LLM_BACKEND:
+
+* "openai": the live model,
+* "record": the live model, with every completion and its timing appended to
+  ``config.LLM_RECORDINGS_PATH`` under the prompt's hash,
+* "replay": recorded completions served without a key, streamed with the
+  recorded latency (scaled by UETCL_LLM_REPLAY_LATENCY_SCALE); prompts never
+  recorded get the fake answer, or an error with UETCL_LLM_REPLAY_ON_MISS=error,
+* "fake": an offline model that streams canned answers.
+
+Replay and fake make load tests and benchmarks reproducible offline.
+
+Concurrent calls with the same rendered prompt share one request
+(single_flight.py). Requests go through the process-wide dispatcher
+(llm_dispatcher.py), which queues, rate-limits and retries them. Calls are
+traced as "llm" spans with estimated prompt and completion token counts;
+streams also record the time to their first token.
+"""
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from langchain.llms import OpenAI
+from langchain.llms.base import LLM
+from langchain.prompts import PromptTemplate
+from langchain.schema.output import GenerationChunk
+
+import config
+from context_packing import estimate_tokens
+from llm_dispatcher import LLMDispatcher
+from single_flight import SingleFlight
+from tracing import span, tracer
+
+
+class FakeRateLimitError(RuntimeError):
+    """What the fake model raises in place of OpenAI's HTTP 429"""
+    status_code = 429
+
+
+class FakeStreamingLLM(LLM):
+    """Offline stand-in for OpenAI that streams a deterministic answer word by word"""
+    token_delay_seconds: float = config.FAKE_LLM_TOKEN_DELAY_SECONDS
+    # Share of calls that fail with a 429 before producing anything
+    error_rate: float = config.FAKE_LLM_ERROR_RATE
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-streaming"
+
+    @staticmethod
+    def _answer(prompt: str) -> str:
+        if "CORRECT_UNDERSTANDING" in prompt:
+            return "CORRECT_UNDERSTANDING The response reflects the key concept of the challenge."
+        digest = hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:8]
+        return (
+            f"This is an offline answer ({digest}). Based on the UETCL policy context, follow the documented "
+            "procedure, protect your credentials and report anything suspicious to the IT Security team."
+        )
+
+    def _maybe_fail(self) -> None:
+        if self.error_rate and random.random() < self.error_rate:
+            raise FakeRateLimitError("Rate limit reached (injected by the fake LLM)")
+
+    def _call(self, prompt: str, stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> str:
+        self._maybe_fail()
+        return self._answer(prompt)
+
+    def _stream(self, prompt: str, stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> Iterator[GenerationChunk]:
+        self._maybe_fail()
+        for token in re.findall(r"\S+\s*", self._answer(prompt)):
+            time.sleep(self.token_delay_seconds)
+            chunk = GenerationChunk(text=token)
+            if run_manager:
+                run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
+
+
+def prompt_key(prompt: str) -> str:
+    return hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+
+
+class LLMRecordings:
+    """Append-only JSONL store of completions keyed by prompt hash; the last recording of a prompt wins"""
+
+    def __init__(self, path: str = config.LLM_RECORDINGS_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._entries: Dict[str, dict] = {}
+        try:
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self._entries[entry["key"]] = entry
+        except FileNotFoundError:
+            pass
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, prompt: str) -> Optional[dict]:
+        return self._entries.get(prompt_key(prompt))
+
+    def put(self, prompt: str, completion: str, first_token_seconds: float, total_seconds: float) -> None:
+        entry = {
+            "key": prompt_key(prompt),
+            "completion": completion,
+            "first_token_seconds": round(first_token_seconds, 4),
+            "total_seconds": round(total_seconds, 4),
+            "recorded_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        }
+        with self._lock:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            self._entries[entry["key"]] = entry
+
+
+class RecordingLLM(LLM):
+    """Passes prompts to a live model and records each completion with its timing"""
+    llm: LLM
+    recordings: LLMRecordings
+
+    @property
+    def _llm_type(self) -> str:
+        return f"recording-{self.llm._llm_type}"
+
+    def _call(self, prompt: str, stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> str:
+        started = time.perf_counter()
+        completion = self.llm.invoke(prompt, stop=stop)
+        elapsed = time.perf_counter() - started
+        self.recordings.put(prompt, completion, elapsed, elapsed)
+        return completion
+
+    def _stream(self, prompt: str, stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> Iterator[GenerationChunk]:
+        started = time.perf_counter()
+        first_token_seconds, tokens = None, []
+        for token in self.llm.stream(prompt, stop=stop):
+            if first_token_seconds is None:
+                first_token_seconds = time.perf_counter() - started
+            tokens.append(token)
+            chunk = GenerationChunk(text=token)
+            if run_manager:
+                run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
+        total_seconds = time.perf_counter() - started
+        self.recordings.put(prompt, "".join(tokens), first_token_seconds or total_seconds, total_seconds)
+
+
+class ReplayLLM(LLM):
+    """Serves recorded completions offline, paced like the original call; unseen prompts go to the fallback"""
+    recordings: LLMRecordings
+    latency_scale: float = config.LLM_REPLAY_LATENCY_SCALE
+    fallback: Optional[LLM] = None
+
+    @property
+    def _llm_type(self) -> str:
+        return "replay"
+
+    def _recording(self, prompt: str) -> Optional[dict]:
+        entry = self.recordings.get(prompt)
+        if entry is None and self.fallback is None:
+            raise KeyError(f"No recorded completion for prompt {prompt_key(prompt)[:12]} in {self.recordings.path}")
+        return entry
+
+    def _call(self, prompt: str, stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> str:
+        entry = self._recording(prompt)
+        if entry is None:
+            return self.fallback.invoke(prompt, stop=stop)
+        time.sleep(entry["total_seconds"] * self.latency_scale)
+        return entry["completion"]
+
+    def _stream(self, prompt: str, stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> Iterator[GenerationChunk]:
+        entry = self._recording(prompt)
+        if entry is None:
+            yield from (GenerationChunk(text=token) for token in self.fallback.stream(prompt, stop=stop))
+            return
+        tokens = re.findall(r"\S+\s*|\s+", entry["completion"])
+        time.sleep(entry["first_token_seconds"] * self.latency_scale)
+        # Spread the rest of the recorded duration evenly over the remaining tokens
+        token_delay = max(entry["total_seconds"] - entry["first_token_seconds"], 0.0) / max(len(tokens) - 1, 1) * self.latency_scale
+        for i, token in enumerate(tokens):
+            if i:
+                time.sleep(token_delay)
+            chunk = GenerationChunk(text=token)
+            if run_manager:
+                run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
+
+
+def _openai() -> OpenAI:
+    # The dispatcher retries with backoff across all sessions, so the client itself must not
+    return OpenAI(temperature=0, request_timeout=config.LLM_REQUEST_TIMEOUT_SECONDS, max_retries=0)
+
+def create_llm(backend: str = config.LLM_BACKEND) -> LLM:
+    if backend == "fake":
+        return FakeStreamingLLM()
+    if backend == "openai":
+        return _openai()
+    if backend == "record":
+        return RecordingLLM(llm=_openai(), recordings=LLMRecordings())
+    if backend == "replay":
+        fallback = FakeStreamingLLM() if config.LLM_REPLAY_ON_MISS == "fake" else None
+        return ReplayLLM(recordings=LLMRecordings(), fallback=fallback)
+    raise ValueError(f"Unknown LLM backend {backend!r}; expected 'openai', 'record', 'replay' or 'fake'")
+
+
+# Shared by every session in the process
+dispatcher = LLMDispatcher()
+tracer.register_gauge("uetcl_llm_queue_depth", "LLM calls waiting for their turn", lambda: dispatcher.stats()["queue_depth"])
+tracer.register_gauge("uetcl_llm_active_calls", "LLM calls in progress", lambda: dispatcher.stats()["active"])
+# Identical prompts in flight at the same time share one call
+coalescer = SingleFlight()
+tracer.register_gauge("uetcl_llm_coalesced_calls_total", "LLM calls answered by another session's identical in-flight call",
+                      lambda: coalescer.stats()["coalesced"], kind="counter")
+
+def _cost_tokens(prompt_tokens: int) -> int:
+    return prompt_tokens + config.LLM_EXPECTED_COMPLETION_TOKENS
+
+
+def _once(call: Callable[[], str]) -> Iterator[str]:
+    yield call()
+
+
+def run_prompt(llm: LLM, prompt_template: PromptTemplate, inputs: Dict[str, str]) -> str:
+    """Complete a prompt and return the whole answer"""
+    prompt = prompt_template.format(**inputs)
+    prompt_tokens = estimate_tokens(prompt)
+    with span("llm", streamed=False) as llm_span:
+        call = lambda: dispatcher.call(lambda: llm.invoke(prompt), _cost_tokens(prompt_tokens))
+        if config.LLM_COALESCING_ENABLED:
+            chunks, coalesced = coalescer.join((id(llm), prompt_key(prompt)), lambda: _once(call))
+            answer = "".join(chunks)
+        else:
+            answer, coalesced = call(), False
+        # Coalesced calls cost the provider nothing, so they carry no token counts
+        llm_span.set(coalesced=coalesced, **({} if coalesced else {
+            "prompt_tokens": prompt_tokens, "completion_tokens": estimate_tokens(answer),
+        }))
+    return answer
+
+
+def stream_prompt(llm: LLM, prompt_template: PromptTemplate, inputs: Dict[str, str]) -> Iterator[str]:
+    """Yield the answer in chunks as the model produces them; models without streaming yield it once.
+
+    The call waits for its dispatcher slot and first chunk before returning, so the caller's stage (not whoever
+    renders the stream) is charged for the queue and the time to first token."""
+    stream = _stream_prompt(llm, prompt_template, inputs)
+    try:
+        first = next(stream)
+    except StopIteration:
+        return iter(())
+    return _resume(first, stream)
+
+def _resume(first: str, stream: Iterator[str]) -> Iterator[str]:
+    try:
+        yield first
+        yield from stream
+    finally:
+        stream.close()
+
+def _stream_prompt(llm: LLM, prompt_template: PromptTemplate, inputs: Dict[str, str]) -> Iterator[str]:
+    prompt = prompt_template.format(**inputs)
+    prompt_tokens = estimate_tokens(prompt)
+    with span("llm", streamed=True) as llm_span:
+        started = time.perf_counter()
+        open_stream = lambda: dispatcher.stream(lambda: llm.stream(prompt), _cost_tokens(prompt_tokens))
+        if config.LLM_COALESCING_ENABLED:
+            stream, coalesced = coalescer.join((id(llm), prompt_key(prompt)), open_stream)
+        else:
+            stream, coalesced = open_stream(), False
+        llm_span.set(coalesced=coalesced, **({} if coalesced else {"prompt_tokens": prompt_tokens}))
+        chunks = []
+        try:
+            for chunk in stream:
+                if not chunks:
+                    llm_span.set(first_token_ms=round((time.perf_counter() - started) * 1000, 3))
+                chunks.append(chunk)
+                yield chunk
+        finally:
+            stream.close()  # Lets the coalescer know this reader is gone
+        if not coalesced:
+            llm_span.set(completion_tokens=estimate_tokens("".join(chunks)))
@@ -0,0 +1,227 @@
+"""Process-wide governor for outbound LLM calls.
+
+Every Streamlit session calls the model from its own script thread. The
+dispatcher makes them take turns:
+
+* at most ``max_concurrency`` calls run at once,
+* token buckets keep requests and tokens per minute under the provider limits,
+* waiting calls are served strictly first come, first served across sessions,
+* a call that waits longer than ``queue_timeout_seconds`` gives up,
+* rate-limit (429), server (5xx), timeout and connection errors are retried
+  with full-jitter exponential backoff. A stream is only retried before its
+  first token, since after that the trainee has already seen part of it.
+
+While a call waits, the listener set with ``queue_listener`` is told its
+position in the queue, so the UI can show "in queue, position N".
+"""
+import random
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Deque, Dict, Iterator, Optional, TypeVar
+
+import config
+from tracing import span
+
+T = TypeVar("T")
+
+RETRYABLE_ERROR_NAMES = frozenset({
+    "RateLimitError", "APITimeoutError", "APIConnectionError", "InternalServerError", "ServiceUnavailableError", "Timeout",
+})
+
+# Called with the caller's 1-based queue position while it waits, and with 0 once its call starts
+QueueListener = Callable[[int], None]
+_queue_listener: ContextVar[Optional[QueueListener]] = ContextVar("uetcl_llm_queue_listener", default=None)
+
+# Shown to the trainee instead of an answer when a call fails with LLMDispatchError
+BUSY_MESSAGE = "The tutor is handling too many requests right now. Please send your message again in a minute."
+
+
+class LLMDispatchError(RuntimeError):
+    """The model could not be reached: the queue timed out or every retry failed"""
+
+class LLMQueueTimeout(LLMDispatchError):
+    pass
+
+
+def is_retryable(exc: BaseException) -> bool:
+    status = getattr(exc, "status_code", None) or getattr(getattr(exc, "response", None), "status_code", None)
+    if isinstance(status, int):
+        return status == 429 or status >= 500
+    return isinstance(exc, (TimeoutError, ConnectionError)) or type(exc).__name__ in RETRYABLE_ERROR_NAMES
+
+@contextmanager
+def queue_listener(listener: QueueListener) -> Iterator[None]:
+    """Report queue positions of LLM calls made in this context (one chat turn) to listener"""
+    previous = _queue_listener.get()
+    _queue_listener.set(listener)
+    try:
+        yield
+    finally:
+        _queue_listener.set(previous)
+
+
+class TokenBucket:
+    """Allowance refilled continuously at per_minute, of which at most burst_seconds' worth can be saved up"""
+
+    def __init__(self, per_minute: float, burst_seconds: float = config.LLM_RATE_BURST_SECONDS):
+        self.rate = per_minute / 60.0
+        self.capacity = self.rate * burst_seconds
+        self.available = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.available = min(self.capacity, self.available + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_seconds(self, amount: float) -> float:
+        """0 when amount can be taken now, otherwise how long until it can"""
+        self._refill()
+        amount = min(amount, self.capacity)  # A request bigger than the bucket waits for a full one
+        return 0.0 if self.available >= amount else (amount - self.available) / self.rate
+
+    def take(self, amount: float) -> None:
+        """May go negative (a retry charged after the fact); later callers then wait longer"""
+        self._refill()
+        self.available -= min(amount, self.capacity)
+
+
+class LLMDispatcher:
+    """Bounded, rate-limited, FIFO-fair execution of LLM calls with retries"""
+
+    def __init__(
+        self,
+        max_concurrency: int = config.LLM_MAX_CONCURRENCY,
+        requests_per_minute: float = config.LLM_REQUESTS_PER_MINUTE,
+        tokens_per_minute: float = config.LLM_TOKENS_PER_MINUTE,
+        queue_timeout_seconds: float = config.LLM_QUEUE_TIMEOUT_SECONDS,
+        max_retries: int = config.LLM_MAX_RETRIES,
+        backoff_base_seconds: float = config.LLM_BACKOFF_BASE_SECONDS,
+        backoff_max_seconds: float = config.LLM_BACKOFF_MAX_SECONDS,
+    ):
+        self.max_concurrency = max_concurrency
+        self.queue_timeout_seconds = queue_timeout_seconds
+        self.max_retries = max_retries
+        self.backoff_base_seconds = backoff_base_seconds
+        self.backoff_max_seconds = backoff_max_seconds
+        self._requests = TokenBucket(requests_per_minute)
+        self._tokens = TokenBucket(tokens_per_minute)
+        self._condition = threading.Condition()
+        self._queue: Deque[object] = deque()
+        self._active = 0
+        self._counters: Dict[str, int] = {
+            "calls": 0, "retries": 0, "failures": 0, "queue_timeouts": 0, "rate_limited": 0, "max_queue_depth": 0,
+        }
+
+    # --- Admission ---
+    def _acquire(self, cost_tokens: int) -> None:
+        """Wait for this caller's turn, a free slot and enough rate budget, in arrival order"""
+        ticket = object()
+        listener = _queue_listener.get()
+        deadline = time.monotonic() + self.queue_timeout_seconds
+        with span("llm.queue") as queue_span, self._condition:
+            self._queue.append(ticket)
+            self._counters["max_queue_depth"] = max(self._counters["max_queue_depth"], len(self._queue))
+            reported, throttled = None, False
+            try:
+                while True:
+                    position = self._queue.index(ticket) + 1
+                    wait = None
+                    if position == 1 and self._active < self.max_concurrency:
+                        wait = max(self._requests.wait_seconds(1), self._tokens.wait_seconds(cost_tokens))
+                        if wait == 0:
+                            break
+                        throttled = True
+                    if listener is not None and position != reported:
+                        # A slow listener (a UI or WebSocket queue) must not hold up every other caller's admission
+                        self._condition.release()
+                        try:
+                            listener(position)
+                        finally:
+                            self._condition.acquire()
+                        reported = position
+                        continue  # The queue may have moved meanwhile
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._counters["queue_timeouts"] += 1
+                        raise LLMQueueTimeout(f"Waited {self.queue_timeout_seconds:.0f}s for the LLM at queue position {position}")
+                    self._condition.wait(min(remaining, wait if wait is not None else remaining))
+            except BaseException:
+                self._queue.remove(ticket)
+                self._condition.notify_all()
+                raise
+            self._queue.popleft()
+            self._active += 1
+            self._requests.take(1)
+            self._tokens.take(cost_tokens)
+            self._counters["calls"] += 1
+            self._counters["rate_limited"] += throttled
+            queue_span.set(position=reported or 1, throttled=throttled)
+            self._condition.notify_all()
+        if listener is not None:
+            listener(0)
+
+    def _release(self) -> None:
+        with self._condition:
+            self._active -= 1
+            self._condition.notify_all()
+
+    def _backoff(self, attempt: int, cost_tokens: int) -> None:
+        time.sleep(random.uniform(0, min(self.backoff_max_seconds, self.backoff_base_seconds * 2 ** attempt)))
+        with self._condition:
+            self._counters["retries"] += 1
+            # The retry is another request to the provider; charging it makes later callers wait instead
+            self._requests.take(1)
+            self._tokens.take(cost_tokens)
+
+    def _failed(self, exc: BaseException) -> LLMDispatchError:
+        with self._condition:
+            self._counters["failures"] += 1
+        return LLMDispatchError(f"LLM call failed after {self.max_retries + 1} attempts: {exc}")
+
+    # --- Calls ---
+    def call(self, fn: Callable[[], T], cost_tokens: int = 0) -> T:
+        """Run fn in a slot, retrying transient errors"""
+        self._acquire(cost_tokens)
+        try:
+            for attempt in range(self.max_retries + 1):
+                try:
+                    return fn()
+                except Exception as exc:
+                    if not is_retryable(exc):
+                        raise
+                    if attempt == self.max_retries:
+                        raise self._failed(exc) from exc
+                    self._backoff(attempt, cost_tokens)
+        finally:
+            self._release()
+
+    def stream(self, open_stream: Callable[[], Iterator[T]], cost_tokens: int = 0) -> Iterator[T]:
+        """Yield from a stream in a slot held until it is exhausted, retrying only until the first chunk arrives"""
+        self._acquire(cost_tokens)
+        try:
+            for attempt in range(self.max_retries + 1):
+                stream = open_stream()
+                try:
+                    first = next(stream)
+                except StopIteration:
+                    return
+                except Exception as exc:
+                    if not is_retryable(exc):
+                        raise
+                    if attempt == self.max_retries:
+                        raise self._failed(exc) from exc
+                    self._backoff(attempt, cost_tokens)
+                    continue
+                yield first
+                yield from stream
+                return
+        finally:
+            self._release()
+
+    def stats(self) -> Dict[str, int]:
+        with self._condition:
+            return {"queue_depth": len(self._queue), "active": self._active, **self._counters}
@@ -0,0 +1,112 @@
+"""Micro-batching of small requests from concurrent sessions.
+
+A ``MicroBatcher`` gathers the items that callers submit within a short
+window, runs one batch function over all of them and hands each caller its own
+result. The retriever uses it so that queries arriving together from several
+Streamlit sessions share one encoder forward pass and one matrix FAISS search
+instead of competing for the cores one row at a time (see retrieval.py).
+
+Each worker thread waits for a first item, keeps collecting until the batch is
+full or ``max_wait_seconds`` has passed since that item arrived, then runs the
+batch. A failing batch raises its exception in every caller of that batch.
+``close`` stops the workers once the batches already submitted have run.
+"""
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Dict, Generic, List, Optional, Sequence, Tuple, TypeVar
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+_STOP = object()  # Queued once per worker by close()
+
+
+class MicroBatcher(Generic[T, R]):
+    """Runs run_batch over items submitted by concurrent callers within a short window"""
+
+    def __init__(
+        self,
+        run_batch: Callable[[List[T]], Sequence[R]],
+        max_batch_size: int,
+        max_wait_seconds: float,
+        workers: int = 1,
+        name: str = "micro-batcher",
+    ):
+        self.run_batch = run_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait_seconds = max_wait_seconds
+        self._queue: "queue.Queue[Tuple[T, Future]]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._batches = 0
+        self._items = 0
+        self._largest = 0
+        self._closed = False
+        self._workers = [threading.Thread(target=self._work, name=f"{name}-{i}", daemon=True) for i in range(workers)]
+        for worker in self._workers:
+            worker.start()
+
+    def submit(self, item: T) -> R:
+        """Wait for item's result from the next batch"""
+        future: Future = Future()
+        # Under the lock, so every item is queued ahead of close()'s stop markers
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("MicroBatcher is closed")
+            self._queue.put((item, future))
+        return future.result()
+
+    def close(self, timeout: Optional[float] = None) -> None:
+        """Stop the worker threads after the items already submitted; later submits raise RuntimeError"""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            for _ in self._workers:
+                self._queue.put(_STOP)
+        for worker in self._workers:
+            if worker is not threading.current_thread():
+                worker.join(timeout)
+
+    def _collect(self) -> Optional[List[Tuple[T, Future]]]:
+        first = self._queue.get()
+        if first is _STOP:
+            return None
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait_seconds
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is _STOP:
+                self._queue.put(_STOP)  # Another worker's, or this one's after the batch
+                break
+            batch.append(item)
+        return batch
+
+    def _work(self) -> None:
+        while (batch := self._collect()) is not None:
+            try:
+                results = self.run_batch([item for item, _ in batch])
+            except BaseException as exc:
+                for _, future in batch:
+                    future.set_exception(exc)
+                continue
+            for (_, future), result in zip(batch, results):
+                future.set_result(result)
+            with self._lock:
+                self._batches += 1
+                self._items += len(batch)
+                self._largest = max(self._largest, len(batch))
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            return {
+                "batches": self._batches,
+                "items": self._items,
+                "mean_batch_size": self._items / self._batches if self._batches else 0.0,
+                "largest_batch": self._largest,
+            }
@@ -0,0 +1,150 @@
+"""Policy context for each training module and challenge, retrieved once per index.
+
+The topic of every module and the wording of every challenge (including the
+role-specific scenarios) are fixed in modules.py, so the policy chunks they
+need don't depend on what the trainee types. Those chunks are looked up once
+per index build, before the artifact is published, and their ids are stored
+next to the index as module_contexts.json. At runtime, challenge grading reads its context from
+there without searching, and module questions merge the stored module context
+with a small live search.
+
+Recompute the stored contexts with::
+
+    python module_contexts.py
+"""
+import argparse
+import hashlib
+import json
+import logging
+import os
+from typing import Dict, Iterable, List, Optional
+
+from langchain.docstore.document import Document
+from langchain.vectorstores import FAISS
+
+import config
+from modules import ALL_MODULES, ROLE_SPECIFIC_SCENARIOS
+from rag_index import artifact_dir_for, chunk_id, load_or_build_vector_store, read_json
+
+logger = logging.getLogger(__name__)
+
+CONTEXTS_FILE = "module_contexts.json"
+
+
+def module_context_key(module_name: str) -> str:
+    return f"module:{module_name}"
+
+def challenge_context_key(challenge_prompt: str) -> str:
+    return "challenge:" + hashlib.sha256(challenge_prompt.encode("utf-8")).hexdigest()[:16]
+
+
+def context_queries() -> Dict[str, str]:
+    """Search text for every module (its instructions) and every challenge prompt"""
+    queries = {}
+    for module_name, steps in ALL_MODULES.items():
+        instructions = [step["content"] for step in steps if step["type"] == "instruction"]
+        queries[module_context_key(module_name)] = "\n".join(instructions)
+        for step in steps:
+            if step["type"] == "challenge":
+                queries[challenge_context_key(step["content"]["prompt"])] = step["content"]["prompt"]
+    for scenarios_by_role in ROLE_SPECIFIC_SCENARIOS.values():
+        for scenario in scenarios_by_role.values():
+            queries[challenge_context_key(scenario["scenario"])] = scenario["scenario"]
+    return queries
+
+def _queries_key(queries: Dict[str, str], k: int) -> str:
+    return hashlib.sha256(json.dumps([k, sorted(queries.items())]).encode("utf-8")).hexdigest()[:16]
+
+
+def compute_contexts(vector_store: FAISS, queries: Dict[str, str], k: int) -> Dict[str, List[str]]:
+    """Top-k chunk ids for each query, embedding all queries in one batch"""
+    keys = list(queries)
+    embeddings = vector_store.embeddings.embed_documents([queries[key] for key in keys])
+    return {
+        key: [chunk_id(doc.page_content) for doc in vector_store.similarity_search_by_vector(embedding, k=k)]
+        for key, embedding in zip(keys, embeddings)
+    }
+
+
+class ModuleContexts:
+    """Precomputed policy chunks for modules and challenges, resolved against the index's docstore"""
+
+    def __init__(self, vector_store: FAISS, chunk_ids_by_key: Dict[str, List[str]]):
+        self.vector_store = vector_store
+        self.chunk_ids_by_key = chunk_ids_by_key
+
+    def _documents(self, key: str) -> Optional[List[Document]]:
+        chunk_ids = self.chunk_ids_by_key.get(key)
+        if chunk_ids is None:
+            return None
+        docs = [self.vector_store.docstore.search(cid) for cid in chunk_ids]
+        return [doc for doc in docs if isinstance(doc, Document)]
+
+    def for_module(self, module_name: Optional[str]) -> List[Document]:
+        return (self._documents(module_context_key(module_name)) or []) if module_name else []
+
+    def for_challenge(self, challenge_prompt: str) -> Optional[List[Document]]:
+        """None for a challenge that wasn't known at build time, so callers can fall back to a search"""
+        return self._documents(challenge_context_key(challenge_prompt))
+
+
+def merge_documents(*document_lists: Iterable[Document]) -> List[Document]:
+    """Concatenate document lists in order, dropping repeated chunks"""
+    seen, merged = set(), []
+    for documents in document_lists:
+        for doc in documents:
+            cid = chunk_id(doc.page_content)
+            if cid not in seen:
+                seen.add(cid)
+                merged.append(doc)
+    return merged
+
+
+def load_module_contexts(
+    vector_store: FAISS,
+    index_key: str,
+    artifact_dir: Optional[str] = None,
+    k: int = config.MODULE_CONTEXT_K,
+    recompute: bool = False,
+    write: bool = True,
+) -> ModuleContexts:
+    """Read the stored contexts for this index, recomputing them when the index or module texts changed.
+
+    write=False keeps recomputed contexts in memory, for workers serving a published, read-only artifact."""
+    artifact_dir = artifact_dir or artifact_dir_for()
+    path = os.path.join(artifact_dir, CONTEXTS_FILE)
+    queries = context_queries()
+    queries_key = _queries_key(queries, k)
+
+    stored = None if recompute else read_json(path)
+    if stored and stored.get("index_key") == index_key and stored.get("queries_key") == queries_key:
+        return ModuleContexts(vector_store, stored["contexts"])
+
+    contexts = compute_contexts(vector_store, queries, k)
+    if not write:
+        logger.warning("Policy contexts in %s are missing or stale; computed them for this process only", path)
+        return ModuleContexts(vector_store, contexts)
+    os.makedirs(artifact_dir, exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"index_key": index_key, "queries_key": queries_key, "k": k, "contexts": contexts}, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+    logger.info("Stored policy contexts for %d modules and challenges in %s", len(contexts), path)
+    return ModuleContexts(vector_store, contexts)
+
+
+# --- CLI ---
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Precompute policy contexts for every training module and challenge.")
+    parser.add_argument("--k", type=int, default=config.MODULE_CONTEXT_K, help="Chunks stored per module or challenge")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    vector_store, index_key = load_or_build_vector_store()
+    contexts = load_module_contexts(vector_store, index_key, k=args.k, recompute=True)
+    for key, chunk_ids in sorted(contexts.chunk_ids_by_key.items()):
+        print(f"{key:<60} {len(chunk_ids)} chunks")
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -7,7 +7,21 @@ module_1_content = [
     {"type": "qa_prompt", "content": "What questions do you have about phishing? **When ready to continue, type 'continue'.**"},
     {"type": "challenge", "content": {
         "prompt": "An email arrives with the subject **'URGENT: Your Email Account Storage is Full'** from **'UETCL IT Support <IT.Helpdesk@uetcl-logins.com>'**. It demands you click a link within one hour. What is the correct action?",
-        "correct_answer_keyword": "report"
+        "correct_answer_keyword": "report",
+        "reference_answers": {
+            "correct": [
+                "Report it to the ICT Helpdesk as phishing and don't click the link.",
+                "Don't click anything; the sender domain uetcl-logins.com is fake, so forward the email to IT security.",
+                "It is a phishing attempt, so I should report it and then delete it.",
+                "Verify with IT Support through a known phone number and report the suspicious email.",
+            ],
+            "incorrect": [
+                "Click the link quickly so my mailbox keeps working.",
+                "Reply with my username and password so IT can increase my storage.",
+                "Just ignore it and carry on working.",
+                "Forward it to my colleagues so they can free up their storage too.",
+            ],
+        }
     }},
     {"type": "final", "content": "Congratulations, you have completed the Phishing & Social Engineering Awareness module!"}
 ]
@@ -19,7 +33,19 @@ module_2_content = [
     {"type": "qa_prompt", "content": "What questions do you have about these rules? **When you are ready to continue, type 'continue'.**"},
     {"type": "challenge", "content": {
         "prompt": "Let's test your knowledge. A colleague tells you they use the password **'UetclRocks!23'**. Does this password comply with UETCL policy?",
-        "correct_answer_keyword": "yes"
+        "correct_answer_keyword": "yes",
+        "reference_answers": {
+            "correct": [
+                "Yes, it is 13 characters long and mixes uppercase, lowercase, numbers and special characters.",
+                "Yes, it complies with the policy.",
+                "It meets the rules: at least 12 characters and more than three character types.",
+            ],
+            "incorrect": [
+                "No, it is too short.",
+                "No, it does not use enough types of characters.",
+                "No, passwords must be at least 16 characters.",
+            ],
+        }
     }},
     {"type": "final", "content": "Excellent work! You have completed the Password & Access Control module."}
 ]
@@ -30,7 +56,20 @@ module_3_content = [
     {"type": "qa_prompt", "content": "Do you have any questions about what to report or how? **When you are ready to continue, just type 'continue'.**"},
     {"type": "challenge", "content": {
         "prompt": "You find a USB flash drive labeled 'Q3 Finances' in the parking lot. What is the correct action to take according to the incident response policy?",
-        "correct_answer_keyword": "report"
+        "correct_answer_keyword": "report",
+        "reference_answers": {
+            "correct": [
+                "Don't plug it in; hand it to the ICT Helpdesk and report it.",
+                "Report it immediately to the ICT Helpdesk without opening it.",
+                "Treat it as a possible security incident and give it to IT to deal with.",
+            ],
+            "incorrect": [
+                "Plug it into my computer to find out who owns it.",
+                "Open the files to see what is on it.",
+                "Keep it, a free USB drive is useful.",
+                "Throw it away in the bin.",
+            ],
+        }
     }},
     {"type": "final", "content": "You have successfully completed the Incident Reporting & Response module. Remember, fast reporting is key to security!"}
 ]
@@ -41,7 +80,19 @@ module_4_content = [
     {"type": "qa_prompt", "content": "Ask me any questions you have about the data classification levels. **When you are ready to continue, type 'continue'.**"},
     {"type": "challenge", "content": {
         "prompt": "A colleague from another department asks you to email them a customer list, which is classified as 'Restricted'. What is the first thing you should verify before sending it?",
-        "correct_answer_keyword": "authorized"
+        "correct_answer_keyword": "authorized",
+        "reference_answers": {
+            "correct": [
+                "Check that they are authorized to access restricted data.",
+                "Verify the colleague has authorization and a business need before sending it.",
+                "Confirm with the data owner that they are allowed to see the customer list.",
+            ],
+            "incorrect": [
+                "Just send it since they work at UETCL.",
+                "Put it on the shared drive so everyone can see it.",
+                "Email it straight away, it is only restricted and not confidential.",
+            ],
+        }
     }},
     {"type": "final", "content": "Great work! You've completed the Data Handling module. Proper classification protects us all."}
 ]
@@ -52,7 +103,19 @@ module_5_content = [
     {"type": "qa_prompt", "content": "What questions do you have about the acceptable use policy? **When ready, type 'continue'.**"},
     {"type": "challenge", "content": {
         "prompt": "You used the office internet to download a large movie file for personal viewing after work. Which part of the policy might this action violate?",
-        "correct_answer_keyword": "personal use"
+        "correct_answer_keyword": "personal use",
+        "reference_answers": {
+            "correct": [
+                "It violates the acceptable use policy on personal use of company internet.",
+                "It goes beyond the incidental personal use that the policy permits.",
+                "The personal use rules: company internet is for official business, not large personal downloads.",
+            ],
+            "incorrect": [
+                "No policy is violated because it was after working hours.",
+                "It is fine because personal use is allowed.",
+                "It breaks the password policy.",
+            ],
+        }
     }},
     {"type": "final", "content": "You have completed the Safe Internet & Email Use module. Thank you for using our resources responsibly."}
 ]
@@ -63,7 +126,19 @@ module_6_content = [
     {"type": "qa_prompt", "content": "Feel free to ask any questions about physical security. **To continue, type 'continue'.**"},
     {"type": "challenge", "content": {
         "prompt": "You are leaving your desk for a 30-minute meeting. There is a printed document marked 'Confidential' on your desk. What should you do with it?",
-        "correct_answer_keyword": "lock"
+        "correct_answer_keyword": "lock",
+        "reference_answers": {
+            "correct": [
+                "Lock it in a drawer or cabinet before leaving.",
+                "Secure it in a locked drawer according to the clean desk policy.",
+                "Put it away and lock it up while I am in the meeting.",
+            ],
+            "incorrect": [
+                "Leave it on the desk, I will be back soon.",
+                "Turn it face down on the desk.",
+                "Leave it out and ask a colleague to keep an eye on my desk.",
+            ],
+        }
     }},
     {"type": "final", "content": "Module complete! A secure building starts with all of us."}
 ]
@@ -74,7 +149,19 @@ module_7_content = [
     {"type": "qa_prompt", "content": "Ask away with any remote access questions. **When you're ready, type 'continue'.**"},
     {"type": "challenge", "content": {
         "prompt": "You are working from a coffee shop using their password-protected Wi-Fi. To access your files on the UETCL server, is connecting to the Wi-Fi enough?",
-        "correct_answer_keyword": "no"
+        "correct_answer_keyword": "no",
+        "reference_answers": {
+            "correct": [
+                "No, I must connect through the company VPN.",
+                "No, the coffee shop Wi-Fi isn't enough; I need to use the UETCL VPN.",
+                "No, a password on public Wi-Fi does not make it secure for accessing the internal network.",
+            ],
+            "incorrect": [
+                "Yes, the Wi-Fi has a password so it is secure.",
+                "Yes, that is enough.",
+                "Yes, I can log in to the server directly over that connection.",
+            ],
+        }
     }},
     {"type": "final", "content": "You've completed the Secure Remote Access module. Stay safe out there!"}
 ]
@@ -85,7 +172,19 @@ module_8_content = [
     {"type": "qa_prompt", "content": "I'm here for any questions on mobile security. **Type 'continue' to proceed.**"},
     {"type": "challenge", "content": {
         "prompt": "You realize you left your company-issued tablet in a taxi. You think it will probably be turned in, so you decide to wait a day before reporting it. Is this the correct procedure?",
-        "correct_answer_keyword": "no"
+        "correct_answer_keyword": "no",
+        "reference_answers": {
+            "correct": [
+                "No, it must be reported to the ICT Helpdesk immediately.",
+                "No, I should report the lost tablet right away.",
+                "No, waiting is wrong because a lost device is a security incident that must be reported at once.",
+            ],
+            "incorrect": [
+                "Yes, waiting a day is fine.",
+                "Yes, it will probably be returned by the taxi driver.",
+                "Yes, I only need to report it if nobody hands it in.",
+            ],
+        }
     }},
     {"type": "final", "content": "You have completed the Mobile & Personal Device Security module!"}
 ]
@@ -96,7 +195,19 @@ module_9_content = [
     {"type": "qa_prompt", "content": "Any questions about software policy? **Type 'continue' to proceed.**"},
     {"type": "challenge", "content": {
         "prompt": "You find a free, open-source note-taking app that you love. Can you install it on your work laptop yourself?",
-        "correct_answer_keyword": "no"
+        "correct_answer_keyword": "no",
+        "reference_answers": {
+            "correct": [
+                "No, the ICT department has to approve and install it.",
+                "No, I should request it through the ICT department.",
+                "No, installing software myself is prohibited even if it is free.",
+            ],
+            "incorrect": [
+                "Yes, it is free and open source so it's fine.",
+                "Yes, I can install any app that helps me work.",
+                "Yes, as long as my antivirus says it is safe.",
+            ],
+        }
     }},
     {"type": "final", "content": "Module complete. Thank you for helping UETCL maintain a secure and compliant software environment."}
 ]
@@ -107,7 +218,89 @@ module_10_content = [
     {"type": "qa_prompt", "content": "Ask me anything about the social media policy. **Type 'continue' to finish.**"},
     {"type": "challenge", "content": {
         "prompt": "You have a disagreement with a UETCL business partner and post a frustrated comment about them on your private LinkedIn page. Could this violate company policy?",
-        "correct_answer_keyword": "yes"
+        "correct_answer_keyword": "yes",
+        "reference_answers": {
+            "correct": [
+                "Yes, it could damage UETCL's relationships and break the social media policy.",
+                "Yes, I must stay professional when discussing work matters online.",
+                "Yes, even on a private page comments about work partners can be seen as representing the company.",
+            ],
+            "incorrect": [
+                "No, my page is private so it is fine.",
+                "No, personal accounts are not covered by company policy.",
+                "No, I can post whatever I like on my own profile.",
+            ],
+        }
     }},
     {"type": "final", "content": "Congratulations, you have completed the entire cybersecurity training curriculum! Your dedication to security is appreciated."}
-]
\ No newline at end of file
+]
+
+ALL_MODULES = {
+    "Module 1: Phishing & Social Engineering": module_1_content,
+    "Module 2: Password & Access Control": module_2_content,
+    "Module 3: Incident Reporting & Response": module_3_content,
+    "Module 4: Data Handling & Classification": module_4_content,
+    "Module 5: Safe Internet & Email Use": module_5_content,
+    "Module 6: Physical & Environmental Security": module_6_content,
+    "Module 7: Secure Remote Access": module_7_content,
+    "Module 8: Mobile & Personal Device Security": module_8_content,
+    "Module 9: Software Management & Licensing": module_9_content,
+    "Module 10: Social Media & Public Representation": module_10_content,
+}
+
+# --- ROLE-SPECIFIC SCENARIOS ---
+ROLE_SPECIFIC_SCENARIOS = {
+    "Module 1": {
+        "IT Technician": {
+            "scenario": "You receive an email claiming to be from Microsoft Security, requesting immediate verification of server credentials due to 'SQL injection attempts detected'. The email includes technical jargon and a link to verify. What technical indicators should you check first?",
+            "focus": "Email headers, domain verification, technical authenticity",
+            "hint": "Look for technical inconsistencies and verify through official Microsoft channels",
+            "reference_answers": {
+                "correct": [
+                    "Check the email headers and sender domain, don't click the link, and verify through official Microsoft channels.",
+                    "Inspect the headers, SPF and DKIM results and the link's real domain, then report it to security.",
+                    "Verify the domain and headers; Microsoft never asks for server credentials by email, so report it.",
+                ],
+                "incorrect": [
+                    "Click the link and enter the server credentials before the attack spreads.",
+                    "Reply to the email with the credentials they asked for.",
+                    "Follow the instructions in the email because the technical details look genuine.",
+                ],
+            }
+        },
+        "Financial Accountant": {
+            "scenario": "An email appears to be from your CEO requesting an urgent wire transfer of $50,000 to a 'confidential acquisition target'. The email mentions a tight deadline. What financial controls should you follow?",
+            "focus": "Business email compromise, financial verification procedures",
+            "hint": "Always verify financial requests through established dual-authorization channels",
+            "reference_answers": {
+                "correct": [
+                    "Verify the request with the CEO through a separate known channel and follow dual authorization before any transfer.",
+                    "Don't transfer anything; report it as possible business email compromise.",
+                    "Call the CEO directly and follow the dual-authorization controls.",
+                ],
+                "incorrect": [
+                    "Send the wire transfer quickly to meet the deadline.",
+                    "Transfer the money because the CEO asked for it.",
+                    "Reply to the email asking for the account details.",
+                ],
+            }
+        },
+        "Administration Officer": {
+            "scenario": "An email claims your employee benefits account will be suspended unless you click a link to 'verify your information within 24 hours'. The email looks official but urgent. What should you do?",
+            "focus": "Basic phishing recognition, reporting procedures",
+            "hint": "Legitimate systems rarely require urgent action via email links",
+            "reference_answers": {
+                "correct": [
+                    "Don't click the link; report the email to IT.",
+                    "Go to the benefits system directly instead of using the link, and report the email.",
+                    "Treat it as phishing and report it to the ICT Helpdesk.",
+                ],
+                "incorrect": [
+                    "Click the link and verify my information.",
+                    "Fill in my details before the 24 hour deadline.",
+                    "Forward it to colleagues so they can verify their accounts too.",
+                ],
+            }
+        }
+    }
+}
@@ -0,0 +1,198 @@
+"""Parallel, cached page-level text extraction for the policy manual.
+
+Pages are fingerprinted from their content streams and fonts, and the text of
+each page is cached on disk under that fingerprint. Only pages missing from the
+cache are extracted, fanned out across a process pool in contiguous ranges,
+and pages are yielded in order as soon as they are available.
+
+Print per-page timings for a manual with::
+
+    python pdf_extract.py ./data/policies_and_procedure_manual_2022.pdf
+"""
+import argparse
+import itertools
+import hashlib
+import logging
+import multiprocessing
+import os
+import tempfile
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import pypdf
+from pypdf import PdfReader
+
+import config
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ExtractionReport:
+    """What one extraction run did, page by page"""
+    num_pages: int = 0
+    cached_pages: int = 0
+    extracted_pages: int = 0
+    total_seconds: float = 0.0
+    page_seconds: Dict[int, float] = field(default_factory=dict)
+
+    def slowest_pages(self, n: int = 5) -> List[Tuple[int, float]]:
+        return sorted(self.page_seconds.items(), key=lambda item: item[1], reverse=True)[:n]
+
+
+# --- PAGE FINGERPRINTS ---
+def page_fingerprint(page) -> str:
+    """Hash of everything extract_text depends on, so an unchanged page keeps its key across manual revisions"""
+    digest = hashlib.sha256(pypdf.__version__.encode("utf-8"))
+    contents = page.get_contents()
+    digest.update(contents.get_data() if contents is not None else b"")
+    fonts = page.get("/Resources", {}).get("/Font", {})
+    for name in sorted(fonts):
+        digest.update(f"{name}={fonts[name].get_object().get('/BaseFont', '')}".encode("utf-8"))
+    return digest.hexdigest()
+
+
+# --- PAGE TEXT CACHE ---
+def _cache_path(cache_dir: str, fingerprint: str) -> str:
+    return os.path.join(cache_dir, fingerprint[:2], f"{fingerprint}.txt")
+
+def read_cached_page(cache_dir: str, fingerprint: str) -> Optional[str]:
+    try:
+        with open(_cache_path(cache_dir, fingerprint), encoding="utf-8") as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+def write_cached_page(cache_dir: str, fingerprint: str, text: str) -> None:
+    path = _cache_path(cache_dir, fingerprint)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+# --- EXTRACTION ---
+def _extract_page_range(pdf_path: str, page_numbers: List[int]) -> List[Tuple[int, str, float]]:
+    """Worker: extract a run of pages, timing each one"""
+    reader = PdfReader(pdf_path)
+    results = []
+    for page_number in page_numbers:
+        started = time.perf_counter()
+        text = reader.pages[page_number].extract_text() or ""
+        results.append((page_number, text, time.perf_counter() - started))
+    return results
+
+def _contiguous_ranges(page_numbers: List[int], max_len: int) -> List[List[int]]:
+    """Group sorted page numbers into contiguous runs of at most max_len pages"""
+    ranges: List[List[int]] = []
+    for page_number in page_numbers:
+        if ranges and ranges[-1][-1] == page_number - 1 and len(ranges[-1]) < max_len:
+            ranges[-1].append(page_number)
+        else:
+            ranges.append([page_number])
+    return ranges
+
+def _iter_extracted_ranges(pdf_path: str, ranges: List[List[int]], max_workers: int) -> Iterator[List[Tuple[int, str, float]]]:
+    """Yield extracted ranges in page order, keeping only a small window of ranges in flight"""
+    if len(ranges) <= 1 or max_workers <= 1:
+        for page_range in ranges:
+            yield _extract_page_range(pdf_path, page_range)
+        return
+    # spawn, not fork: the Streamlit server is multi-threaded and may already hold torch/FAISS locks
+    with ProcessPoolExecutor(max_workers=min(max_workers, len(ranges)), mp_context=multiprocessing.get_context("spawn")) as pool:
+        in_flight = deque()
+        pending = iter(ranges)
+        for page_range in itertools.islice(pending, max_workers * 2):
+            in_flight.append(pool.submit(_extract_page_range, pdf_path, page_range))
+        while in_flight:
+            batch = in_flight.popleft().result()
+            for page_range in itertools.islice(pending, 1):
+                in_flight.append(pool.submit(_extract_page_range, pdf_path, page_range))
+            yield batch
+
+def iter_pdf_pages(
+    pdf_path: str,
+    cache_dir: str = config.PAGE_CACHE_DIR,
+    max_workers: int = config.PDF_EXTRACT_WORKERS,
+    pages_per_task: int = config.PDF_PAGES_PER_TASK,
+    report: Optional[ExtractionReport] = None,
+) -> Iterator[str]:
+    """Yield the text of every page in order, extracting only pages not already cached"""
+    report = report if report is not None else ExtractionReport()
+    started = time.perf_counter()
+    reader = PdfReader(pdf_path)
+    fingerprints = [page_fingerprint(page) for page in reader.pages]
+    del reader
+    report.num_pages = len(fingerprints)
+
+    cache_paths = [_cache_path(cache_dir, fp) for fp in fingerprints]
+    missing = [i for i, path in enumerate(cache_paths) if not os.path.exists(path)]
+    report.cached_pages = report.num_pages - len(missing)
+    scheduled = set(missing)
+
+    extracted_batches = _iter_extracted_ranges(pdf_path, _contiguous_ranges(missing, pages_per_task), max_workers)
+    extracted: Dict[int, str] = {}
+
+    def record(batch: List[Tuple[int, str, float]]) -> None:
+        for extracted_number, extracted_text, seconds in batch:
+            report.page_seconds[extracted_number] = seconds
+            report.extracted_pages += 1
+            write_cached_page(cache_dir, fingerprints[extracted_number], extracted_text)
+            extracted[extracted_number] = extracted_text
+
+    for page_number, fingerprint in enumerate(fingerprints):
+        text = extracted.pop(page_number, None)
+        if text is None:
+            text = read_cached_page(cache_dir, fingerprint)
+        while text is None:
+            # The page is still being extracted; pull ranges until it arrives. A page that was cached when we
+            # checked but has gone since (evicted, cache cleared) is in none of them, so extract it here.
+            batch = next(extracted_batches, None) if page_number in scheduled else None
+            if batch is None:
+                report.cached_pages -= page_number not in scheduled
+                batch = _extract_page_range(pdf_path, [page_number])
+            record(batch)
+            text = extracted.pop(page_number, None)
+        yield text
+    report.total_seconds = time.perf_counter() - started
+
+    logger.info(
+        "Extracted %d/%d pages of %s in %.2fs (%d from cache)",
+        report.extracted_pages, report.num_pages, pdf_path, report.total_seconds, report.cached_pages,
+    )
+    for page_number, seconds in report.slowest_pages():
+        logger.info("  page %d took %.3fs", page_number + 1, seconds)
+
+def extract_pdf_pages(pdf_path: str, **kwargs) -> List[str]:
+    """Return the text of every page in order; see iter_pdf_pages for the options"""
+    return list(iter_pdf_pages(pdf_path, **kwargs))
+
+
+# --- CLI ---
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Extract a PDF's text page by page and report per-page timings.")
+    parser.add_argument("pdf", nargs="?", default=config.POLICY_MANUAL_PATH, help="PDF to extract")
+    parser.add_argument("--cache-dir", default=config.PAGE_CACHE_DIR, help="Per-page text cache directory")
+    parser.add_argument("--workers", type=int, default=config.PDF_EXTRACT_WORKERS, help="Extraction processes")
+    parser.add_argument("--no-cache", action="store_true", help="Ignore cached pages and extract everything")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    cache_dir = args.cache_dir
+    if args.no_cache:
+        cache_dir = tempfile.mkdtemp(prefix="page-cache-")
+    report = ExtractionReport()
+    extract_pdf_pages(args.pdf, cache_dir=cache_dir, max_workers=args.workers, report=report)
+
+    print(f"{'page':>6} {'seconds':>9}")
+    for page_number, seconds in sorted(report.page_seconds.items()):
+        print(f"{page_number + 1:>6} {seconds:>9.3f}")
+    print(f"total {report.total_seconds:.2f}s, {report.extracted_pages} extracted, {report.cached_pages} cached")
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,537 @@
+"""Builds, persists and reloads the FAISS index behind the tutor's retriever.
+
+The index is saved as a versioned artifact under ``config.INDEX_CACHE_DIR``,
+one directory per splitter/embedding configuration. Its meta file records the
+content key (a hash of the source documents plus that configuration); a process
+whose key matches loads the artifact without re-reading the PDF or re-embedding
+anything.
+
+When the sources change, the artifact's chunk manifest is diffed against the
+new chunk set: vectors for removed chunks are deleted, only new chunks are
+embedded, and everything else is left alone. A BM25 index over the same
+chunks is rebuilt from the chunk list and stored next to the FAISS index.
+Approximate index types (see index_factory.py) are produced from the updated
+flat index just before it is saved.
+
+The FAISS index is written with faiss itself and the chunk texts as one blob
+with an offsets array and columnar metadata (see chunk_store.py); with
+``config.INDEX_MMAP_ENABLED`` both are served from read-only memory maps, so
+worker processes on one host share a single copy. Lossy (compact) index types
+also store the float32 vectors for re-ranking their top candidates.
+
+Prebuild the artifact ahead of a deployment with::
+
+    python rag_index.py
+"""
+import argparse
+import functools
+import hashlib
+import itertools
+import json
+import logging
+import os
+import re
+import shutil
+import tempfile
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+import faiss
+import numpy as np
+from langchain.vectorstores import FAISS
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from langchain.embeddings import HuggingFaceEmbeddings
+from langchain.embeddings.base import Embeddings
+
+import config
+from chunk_store import ChunkDocstore, ChunkIndexToId, ChunkStore, write_chunk_store
+from embedding_cache import CachedEmbeddings, EmbeddingCache
+from index_factory import FLAT, RescoredIndex, apply_search_params, convert_index, is_flat, is_lossy
+from lexical_index import BM25Index
+
+logger = logging.getLogger(__name__)
+
+# Bump whenever the artifact layout or chunking logic changes so old artifacts stop matching
+ARTIFACT_VERSION = 6
+INDEX_FILE = "index.faiss"
+# float32 vectors of a lossy index, in position order, for rescoring
+RESCORE_VECTORS_FILE = "vectors.npy"
+# IO_FLAG_MMAP only maps IVF lists; IO_FLAG_MMAP_IFC (faiss >= 1.10) maps the codes of every index type
+INDEX_MMAP_FLAGS = getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP) | faiss.IO_FLAG_READ_ONLY
+CHUNKS_FILE = "chunks.jsonl"
+LEXICAL_INDEX_FILE = "bm25.npz"
+MANIFEST_FILE = "manifest.json"
+META_FILE = "meta.json"
+# Staging and retired dirs are named .<prefix>-<pid>-<random>; prune leaves them alone while that process runs,
+# unless they are older than this (the PID was reused, or the build ran on another host)
+STAGING_MAX_AGE_SECONDS = 24 * 3600
+
+
+# --- CONTENT KEY ---
+def file_sha256(path: str) -> str:
+    """Hash a file in blocks so large manuals are never read into memory at once"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def chunk_id(text: str) -> str:
+    """Content hash of a chunk; also used as its docstore/vector id"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:32]
+
+def compute_family_key(chunk_size: int, chunk_overlap: int, model_name: str) -> str:
+    """Key shared by every index built with the same splitter and model, whose vectors are interchangeable"""
+    key_material = {
+        "artifact_version": ARTIFACT_VERSION,
+        "chunk_size": chunk_size,
+        "chunk_overlap": chunk_overlap,
+        "embedding_model": model_name,
+    }
+    return hashlib.sha256(json.dumps(key_material, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+def compute_index_key(
+    policy_path: str,
+    training_path: str,
+    chunk_size: int,
+    chunk_overlap: int,
+    model_name: str,
+    index_factory: str = config.FAISS_INDEX_FACTORY,
+) -> str:
+    """Key identifying an index: changes whenever any input to the build changes"""
+    key_material = {
+        "artifact_version": ARTIFACT_VERSION,
+        "index_factory": index_factory,
+        "policy_sha256": file_sha256(policy_path),
+        "training_sha256": file_sha256(training_path),
+        "chunk_size": chunk_size,
+        "chunk_overlap": chunk_overlap,
+        "embedding_model": model_name,
+    }
+    return hashlib.sha256(json.dumps(key_material, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+
+# --- STREAMING INGESTION ---
+class CorpusChunk(NamedTuple):
+    text: str
+    source: str  # "policy" or "training"
+
+@dataclass
+class BuildProgress:
+    """Running totals for an index build, passed to progress callbacks after every batch"""
+    pages_total: int = 0
+    pages_done: int = 0
+    chunks_seen: int = 0
+    chunks_embedded: int = 0
+    chunks_removed: int = 0
+
+ProgressCallback = Callable[[BuildProgress], None]
+
+def iter_policy_chunks(pages: Iterable[str], text_splitter: RecursiveCharacterTextSplitter) -> Iterator[str]:
+    """Split page text as it arrives, carrying the unfinished last chunk over into the next page"""
+    carry = ""
+    for page_text in pages:
+        chunks = text_splitter.split_text(carry + page_text)
+        if not chunks:
+            continue
+        yield from chunks[:-1]
+        carry = chunks[-1]
+    if carry:
+        yield carry
+
+def iter_training_chunks(training_path: str, rows_per_read: int = 1000) -> Iterator[str]:
+    """Yield one chunk per training Q&A row, reading the CSV in slices"""
+    # pandas and pypdf are only needed to (re)build an index, so a start that loads one from disk skips them
+    import pandas as pd
+
+    for frame in pd.read_csv(training_path, chunksize=rows_per_read):
+        for _, row in frame.iterrows():
+            yield f"Question: {row['Question']} Answer: {row['Answer']}"
+
+def iter_corpus_chunks(
+    policy_path: str,
+    training_path: str,
+    chunk_size: int,
+    chunk_overlap: int,
+    progress: Optional[BuildProgress] = None,
+) -> Iterator[CorpusChunk]:
+    """Policy manual chunks followed by training Q&A chunks, produced lazily page by page"""
+    from pdf_extract import ExtractionReport, iter_pdf_pages
+
+    progress = progress if progress is not None else BuildProgress()
+    report = ExtractionReport()
+    text_splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+
+    def counted_pages() -> Iterator[str]:
+        for page_text in iter_pdf_pages(policy_path, report=report):
+            progress.pages_total = report.num_pages
+            progress.pages_done += 1
+            yield page_text
+
+    for text in iter_policy_chunks(counted_pages(), text_splitter):
+        yield CorpusChunk(text, "policy")
+    for text in iter_training_chunks(training_path):
+        yield CorpusChunk(text, "training")
+
+def load_corpus_chunks(policy_path: str, training_path: str, chunk_size: int, chunk_overlap: int) -> List[str]:
+    """Read the policy manual and training Q&A and split them into indexable chunks"""
+    return [chunk.text for chunk in iter_corpus_chunks(policy_path, training_path, chunk_size, chunk_overlap)]
+
+def iter_batches(items: Iterable, batch_size: int) -> Iterator[List]:
+    iterator = iter(items)
+    while batch := list(itertools.islice(iterator, batch_size)):
+        yield batch
+
+def get_embedding_model(model_name: str = config.EMBEDDING_MODEL_NAME) -> Embeddings:
+    """One embedding model instance per process, shared by every caller and fronted by the on-disk embedding cache"""
+    return _load_embedding_model(model_name)
+
+@functools.lru_cache(maxsize=None)
+def _load_embedding_model(model_name: str) -> Embeddings:
+    model = HuggingFaceEmbeddings(model_name=model_name)
+    if not config.EMBEDDING_CACHE_ENABLED:
+        return model
+    return CachedEmbeddings(model, EmbeddingCache(config.EMBEDDING_CACHE_DIR, model_name))
+
+
+def update_vector_store(
+    vector_store: Optional[FAISS],
+    manifest: Dict[str, str],
+    chunks: Iterable[CorpusChunk],
+    embedding_model: Embeddings,
+    batch_size: int = config.EMBEDDING_BATCH_SIZE,
+    progress: Optional[BuildProgress] = None,
+    on_progress: Optional[ProgressCallback] = None,
+) -> Tuple[FAISS, Dict[str, str]]:
+    """Bring an index in line with a new chunk set, embedding only chunks the manifest doesn't know.
+
+    The manifest maps each chunk's content hash (which is also its vector id) to
+    its source. Pass vector_store=None and an empty manifest for a full build.
+    Returns the updated store and the manifest for the new chunk set.
+    """
+    progress = progress if progress is not None else BuildProgress()
+    new_manifest: Dict[str, str] = {}
+
+    def unseen_chunks() -> Iterator[Tuple[str, CorpusChunk]]:
+        for chunk in chunks:
+            progress.chunks_seen += 1
+            cid = chunk_id(chunk.text)
+            if cid in new_manifest:
+                continue
+            new_manifest[cid] = chunk.source
+            if cid not in manifest:
+                yield cid, chunk
+
+    # Embed new chunks batch by batch, so only one batch is ever pending
+    for batch in iter_batches(unseen_chunks(), batch_size):
+        ids = [cid for cid, _ in batch]
+        texts = [chunk.text for _, chunk in batch]
+        metadatas = [{"source": chunk.source} for _, chunk in batch]
+        text_embeddings = list(zip(texts, embedding_model.embed_documents(texts)))
+        if vector_store is None:
+            vector_store = FAISS.from_embeddings(text_embeddings, embedding_model, metadatas=metadatas, ids=ids)
+        else:
+            vector_store.add_embeddings(text_embeddings, metadatas=metadatas, ids=ids)
+        progress.chunks_embedded += len(batch)
+        logger.info(
+            "Embedded %d new chunks (%d seen, %d/%d pages read)",
+            progress.chunks_embedded, progress.chunks_seen, progress.pages_done, progress.pages_total,
+        )
+        if on_progress is not None:
+            on_progress(progress)
+
+    if vector_store is None:
+        raise ValueError("No chunks to index: the policy manual and training data are both empty")
+    removed = [cid for cid in manifest if cid not in new_manifest]
+    if removed:
+        vector_store.delete(removed)
+    progress.chunks_removed = len(removed)
+    if on_progress is not None:
+        on_progress(progress)
+    return vector_store, new_manifest
+
+
+# --- ARTIFACT I/O ---
+def _record_chunks(chunks: Iterable[CorpusChunk], f) -> Iterator[CorpusChunk]:
+    """Pass chunks through while appending each one to the artifact's chunk list"""
+    for chunk in chunks:
+        f.write(json.dumps({"text": chunk.text, "source": chunk.source}, ensure_ascii=False) + "\n")
+        yield chunk
+
+def read_json(path: str) -> Optional[dict]:
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+def artifact_dir_for(
+    cache_dir: str = config.INDEX_CACHE_DIR,
+    chunk_size: int = config.CHUNK_SIZE,
+    chunk_overlap: int = config.CHUNK_OVERLAP,
+    model_name: str = config.EMBEDDING_MODEL_NAME,
+) -> str:
+    return os.path.join(cache_dir, compute_family_key(chunk_size, chunk_overlap, model_name))
+
+def build_lexical_index(artifact_dir: str, write: bool = True) -> BM25Index:
+    """Build the BM25 index from the artifact's chunk list and, unless write=False, save it alongside"""
+    texts_by_id: Dict[str, str] = {}
+    with open(os.path.join(artifact_dir, CHUNKS_FILE), encoding="utf-8") as f:
+        for line in f:
+            text = json.loads(line)["text"]
+            texts_by_id.setdefault(chunk_id(text), text)
+    lexical_index = BM25Index.build(list(texts_by_id), list(texts_by_id.values()))
+    if write:
+        lexical_index.save(os.path.join(artifact_dir, LEXICAL_INDEX_FILE))
+    return lexical_index
+
+def load_lexical_index(artifact_dir: str) -> BM25Index:
+    """The published BM25 index; a serving process never writes into the artifact, so a missing one is rebuilt in memory"""
+    try:
+        return BM25Index.load(os.path.join(artifact_dir, LEXICAL_INDEX_FILE))
+    except (FileNotFoundError, KeyError, ValueError):
+        logger.warning("No readable BM25 index in %s; built it from the chunk list for this process only", artifact_dir)
+        return build_lexical_index(artifact_dir, write=False)
+
+def publish_index_artifact(staging_dir: str, artifact_dir: str) -> str:
+    """Swap a finished staging dir into place so readers never see a partial index"""
+    retired_dir = None
+    if os.path.exists(artifact_dir):
+        retired_dir = tempfile.mkdtemp(prefix=f".retired-{os.getpid()}-", dir=os.path.dirname(artifact_dir))
+        os.rename(artifact_dir, os.path.join(retired_dir, "artifact"))
+    try:
+        os.rename(staging_dir, artifact_dir)
+    except OSError:
+        # Another process published a build of the same sources first; keep theirs
+        if not os.path.exists(os.path.join(artifact_dir, META_FILE)):
+            raise
+        shutil.rmtree(staging_dir, ignore_errors=True)
+    if retired_dir is not None:
+        shutil.rmtree(retired_dir, ignore_errors=True)
+    return artifact_dir
+
+def save_index_artifact(vector_store: FAISS, artifact_dir: str, rescore_vectors: Optional[np.ndarray] = None) -> None:
+    """Write the FAISS index, the chunk store (in FAISS position order) and, for a lossy index, its float32 vectors"""
+    faiss.write_index(vector_store.index, os.path.join(artifact_dir, INDEX_FILE))
+    if rescore_vectors is not None:
+        np.save(os.path.join(artifact_dir, RESCORE_VECTORS_FILE), np.ascontiguousarray(rescore_vectors, dtype=np.float32))
+    ids = [vector_store.index_to_docstore_id[position] for position in range(vector_store.index.ntotal)]
+    write_chunk_store(artifact_dir, ids, [vector_store.docstore.search(doc_id) for doc_id in ids])
+
+def load_index_artifact(
+    artifact_dir: str,
+    embedding_model: Embeddings,
+    mapped: bool = config.INDEX_MMAP_ENABLED,
+    writable: bool = False,
+    rescore_factor: int = config.FAISS_RESCORE_FACTOR,
+) -> Optional[FAISS]:
+    """Load a previously saved index, or None when the artifact is missing or unreadable.
+
+    A read-only load keeps the chunks in a compact ChunkStore, memory-mapped when mapped=True.
+    writable=True gives the in-memory index and LangChain docstore that an incremental update needs."""
+    if not os.path.exists(os.path.join(artifact_dir, META_FILE)):
+        return None
+    try:
+        mapped = mapped and not writable
+        index = faiss.read_index(os.path.join(artifact_dir, INDEX_FILE), INDEX_MMAP_FLAGS if mapped else 0)
+        store = ChunkStore(artifact_dir, mapped=mapped)
+        if len(store) != index.ntotal:
+            raise ValueError(f"{len(store)} chunks for {index.ntotal} vectors")
+        if writable:
+            docstore, index_to_docstore_id = store.materialize()
+        else:
+            docstore, index_to_docstore_id = ChunkDocstore(store), ChunkIndexToId(store)
+            rescore_path = os.path.join(artifact_dir, RESCORE_VECTORS_FILE)
+            if rescore_factor > 0 and os.path.exists(rescore_path):
+                # Mapped even without INDEX_MMAP_ENABLED: only the rows of each search's candidates are read
+                index = RescoredIndex(index, np.load(rescore_path, mmap_mode="r"), rescore_factor)
+        return FAISS(embedding_model, index, docstore, index_to_docstore_id)
+    except Exception:
+        logger.exception("Could not load index artifact at %s; rebuilding", artifact_dir)
+        return None
+
+def _process_running(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass  # Running as another user
+    return True
+
+def _staging_in_progress(name: str, path: str) -> bool:
+    """Whether a dot-named staging or retired dir may still belong to a running build"""
+    if time.time() - os.path.getmtime(path) > STAGING_MAX_AGE_SECONDS:
+        return False
+    match = re.search(r"-(\d+)-[^-]+$", name)
+    # Without a PID (named by an older version) only the age tells
+    return match is None or _process_running(int(match.group(1)))
+
+def prune_index_artifacts(cache_dir: str, keep_name: str) -> List[str]:
+    """Delete every artifact directory except keep_name and the staging dirs of builds still running"""
+    removed = []
+    if not os.path.isdir(cache_dir):
+        return removed
+    for name in os.listdir(cache_dir):
+        path = os.path.join(cache_dir, name)
+        if name == keep_name or not os.path.isdir(path):
+            continue
+        if name.startswith(".") and _staging_in_progress(name, path):
+            continue
+        shutil.rmtree(path, ignore_errors=True)
+        removed.append(name)
+    return removed
+
+
+# --- LOAD OR BUILD ---
+def load_or_build_vector_store(
+    policy_path: str = config.POLICY_MANUAL_PATH,
+    training_path: str = config.TRAINING_DATA_PATH,
+    chunk_size: int = config.CHUNK_SIZE,
+    chunk_overlap: int = config.CHUNK_OVERLAP,
+    model_name: str = config.EMBEDDING_MODEL_NAME,
+    cache_dir: str = config.INDEX_CACHE_DIR,
+    force_rebuild: bool = False,
+    batch_size: int = config.EMBEDDING_BATCH_SIZE,
+    on_progress: Optional[ProgressCallback] = None,
+    index_factory: str = config.FAISS_INDEX_FACTORY,
+    nprobe: Optional[int] = None,
+    ef_search: Optional[int] = None,
+) -> Tuple[FAISS, str]:
+    """Return the vector store and its index key.
+
+    A matching artifact is loaded as-is; a stale one is updated incrementally;
+    with no artifact (or force_rebuild) the index is built from scratch.
+    nprobe/ef_search default to the values stored in the artifact, or to
+    config for a new build.
+    """
+    index_key = compute_index_key(policy_path, training_path, chunk_size, chunk_overlap, model_name, index_factory)
+    artifact_dir = artifact_dir_for(cache_dir, chunk_size, chunk_overlap, model_name)
+    embedding_model = get_embedding_model(model_name)
+
+    vector_store, manifest = None, {}
+    meta = read_json(os.path.join(artifact_dir, META_FILE))
+    if meta is not None and not force_rebuild:
+        up_to_date = meta.get("index_key") == index_key
+        # A stale artifact is loaded writable, since updating it changes the index and docstore
+        vector_store = load_index_artifact(artifact_dir, embedding_model, writable=not up_to_date)
+        if vector_store is not None and up_to_date:
+            apply_search_params(
+                vector_store.index,
+                nprobe=nprobe if nprobe is not None else meta.get("nprobe"),
+                ef_search=ef_search if ef_search is not None else meta.get("ef_search"),
+            )
+            logger.info("Loaded %s index artifact %s", meta.get("index_factory", FLAT), artifact_dir)
+            return vector_store, index_key
+        if vector_store is not None and not is_flat(meta.get("index_factory", FLAT)):
+            # Approximate indexes can't delete by id; rebuild (the embedding cache keeps this cheap)
+            logger.info("Rebuilding %s index artifact %s from scratch", meta["index_factory"], artifact_dir)
+            vector_store = None
+        if vector_store is not None:
+            manifest = read_json(os.path.join(artifact_dir, MANIFEST_FILE)) or {}
+            if len(manifest) != len(vector_store.index_to_docstore_id):
+                logger.warning("Manifest for %s does not match its index; rebuilding from scratch", artifact_dir)
+                vector_store, manifest = None, {}
+
+    started = time.perf_counter()
+    os.makedirs(cache_dir, exist_ok=True)
+    staging_dir = tempfile.mkdtemp(prefix=f".{index_key}-{os.getpid()}-", dir=cache_dir)
+    try:
+        progress = BuildProgress()
+        with open(os.path.join(staging_dir, CHUNKS_FILE), "w", encoding="utf-8") as chunks_file:
+            chunks = iter_corpus_chunks(policy_path, training_path, chunk_size, chunk_overlap, progress=progress)
+            vector_store, manifest = update_vector_store(
+                vector_store,
+                manifest,
+                _record_chunks(chunks, chunks_file),
+                embedding_model,
+                batch_size=batch_size,
+                progress=progress,
+                on_progress=on_progress,
+            )
+        nprobe = nprobe if nprobe is not None else config.FAISS_NPROBE
+        ef_search = ef_search if ef_search is not None else config.FAISS_EF_SEARCH
+        flat_index = vector_store.index
+        vector_store.index = convert_index(flat_index, index_factory)
+        apply_search_params(vector_store.index, nprobe=nprobe, ef_search=ef_search)
+        rescore_vectors = flat_index.reconstruct_n(0, flat_index.ntotal) if is_lossy(index_factory) else None
+        save_index_artifact(vector_store, staging_dir, rescore_vectors=rescore_vectors)
+        del flat_index, rescore_vectors  # The float32 copies aren't needed once saved
+        build_lexical_index(staging_dir)
+        with open(os.path.join(staging_dir, MANIFEST_FILE), "w", encoding="utf-8") as f:
+            json.dump(manifest, f, sort_keys=True)
+        meta = {
+            "index_key": index_key,
+            "artifact_version": ARTIFACT_VERSION,
+            "embedding_model": model_name,
+            "chunk_size": chunk_size,
+            "chunk_overlap": chunk_overlap,
+            "index_factory": index_factory,
+            "nprobe": nprobe,
+            "ef_search": ef_search,
+            "num_chunks": len(manifest),
+            "chunks_embedded": progress.chunks_embedded,
+            "chunks_removed": progress.chunks_removed,
+            "build_seconds": round(time.perf_counter() - started, 3),
+            "built_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        }
+        # Ship the per-module contexts and partitions with the artifact, so serving workers only read them;
+        # imported here because both build on this module
+        from module_contexts import load_module_contexts
+        from topic_partitions import load_topic_partitions
+        load_module_contexts(vector_store, index_key, artifact_dir=staging_dir, recompute=True)
+        load_topic_partitions(vector_store, index_key, artifact_dir=staging_dir, recompute=True, training_path=training_path)
+        with open(os.path.join(staging_dir, META_FILE), "w", encoding="utf-8") as f:
+            json.dump(meta, f, indent=2, sort_keys=True)
+    except BaseException:
+        shutil.rmtree(staging_dir, ignore_errors=True)
+        raise
+    publish_index_artifact(staging_dir, artifact_dir)
+    logger.info(
+        "Updated index artifact %s in %.2fs: %d chunks, %d embedded, %d removed",
+        artifact_dir, meta["build_seconds"], meta["num_chunks"], meta["chunks_embedded"], meta["chunks_removed"],
+    )
+    # Serve the published files like every other process does (mapped or compact, with rescoring), rather than
+    # this process's build-time copy
+    published = load_index_artifact(artifact_dir, embedding_model)
+    if published is not None:
+        apply_search_params(published.index, nprobe=nprobe, ef_search=ef_search)
+        vector_store = published
+    return vector_store, index_key
+
+
+# --- CLI ---
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Prebuild the UETCL tutor's FAISS index artifact.")
+    parser.add_argument("--policy", default=config.POLICY_MANUAL_PATH, help="Path to the policy manual PDF")
+    parser.add_argument("--training", default=config.TRAINING_DATA_PATH, help="Path to the training Q&A CSV")
+    parser.add_argument("--cache-dir", default=config.INDEX_CACHE_DIR, help="Directory holding index artifacts")
+    parser.add_argument("--force", action="store_true", help="Rebuild from scratch instead of updating incrementally")
+    parser.add_argument("--batch-size", type=int, default=config.EMBEDDING_BATCH_SIZE, help="Chunks embedded per batch")
+    parser.add_argument("--index-factory", default=config.FAISS_INDEX_FACTORY, help="FAISS index type, e.g. Flat, HNSW32, IVFauto,PQ48x4")
+    parser.add_argument("--nprobe", type=int, default=config.FAISS_NPROBE, help="IVF lists scanned per query, stored in the artifact")
+    parser.add_argument("--ef-search", type=int, default=config.FAISS_EF_SEARCH, help="HNSW search depth, stored in the artifact")
+    parser.add_argument("--prune", action="store_true", help="Remove artifacts for other configurations after building")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    vector_store, index_key = load_or_build_vector_store(
+        policy_path=args.policy,
+        training_path=args.training,
+        cache_dir=args.cache_dir,
+        force_rebuild=args.force,
+        batch_size=args.batch_size,
+        index_factory=args.index_factory,
+        nprobe=args.nprobe,
+        ef_search=args.ef_search,
+    )
+    family_key = compute_family_key(config.CHUNK_SIZE, config.CHUNK_OVERLAP, config.EMBEDDING_MODEL_NAME)
+    if args.prune:
+        for name in prune_index_artifacts(args.cache_dir, family_key):
+            logger.info("Pruned stale artifact %s", name)
+    print(os.path.join(args.cache_dir, family_key))
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,395 @@
+"""Retriever used by every tutor handler, with process-wide query caches.
+
+Searches are hybrid: FAISS results and BM25 results over the same chunks are
+merged by reciprocal-rank fusion, and a query made only of a few exact terms
+("VPN", "ICT Helpdesk") is answered from BM25 alone without embedding it.
+
+Trainees ask the same few dozen questions over and over, so the retriever keeps
+bounded, thread-safe caches shared by all Streamlit sessions:
+
+* normalised query text -> query embedding (skips the encoder forward pass)
+* (normalised query, k, filter) -> chunk ids (skips both searches)
+* query embedding -> chunk ids, for rewordings of a cached query whose
+  embedding is at least RETRIEVAL_CACHE_SIMILARITY cosine-similar to it
+
+All are keyed by the index version, so a rebuilt index never serves old
+results.
+
+Questions asked inside a training module search that module's partition of
+the index first (see topic_partitions.py), falling back to the global search
+when nothing in the partition is a close match.
+
+Cache misses from concurrent sessions are micro-batched (see
+micro_batching.py): queries arriving within a few milliseconds of each other
+are embedded in one ``embed_documents`` call and searched with one matrix
+``index.search``.
+"""
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional, Sequence
+
+import numpy as np
+from langchain.schema import Document
+from langchain.vectorstores import FAISS
+
+import config
+from chunk_store import position_lookup
+from lexical_index import BM25Index, tokenize
+from micro_batching import MicroBatcher
+from rag_index import chunk_id
+from topic_partitions import TopicPartitions
+from tracing import span
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries also expire after ttl_seconds"""
+
+    def __init__(self, max_size: int, ttl_seconds: float):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+class SimilarQueryCache:
+    """Thread-safe LRU of (scope, query embedding) -> value, looked up by cosine similarity within a scope"""
+
+    def __init__(self, max_size: int, ttl_seconds: float, min_similarity: float):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.min_similarity = min_similarity
+        self.hits = 0
+        self.misses = 0
+        self._vectors: Optional[np.ndarray] = None  # Unit rows, one per slot
+        self._scopes: List[Optional[Hashable]] = [None] * max_size
+        self._values: List[Any] = [None] * max_size
+        self._expires = np.zeros(max_size)
+        self._last_used = np.zeros(max_size)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _unit(vector: Sequence[float]) -> np.ndarray:
+        vector = np.asarray(vector, dtype=np.float32)
+        return vector / max(float(np.linalg.norm(vector)), 1e-12)
+
+    def get(self, scope: Hashable, vector: Sequence[float]) -> Optional[Any]:
+        query = self._unit(vector)
+        now = time.monotonic()
+        with self._lock:
+            if self._vectors is not None:
+                similarities = self._vectors @ query
+                live = (self._expires >= now) & np.array([s == scope for s in self._scopes])
+                similarities[~live] = -np.inf
+                best = int(np.argmax(similarities))
+                if similarities[best] >= self.min_similarity:
+                    self._last_used[best] = now
+                    self.hits += 1
+                    return self._values[best]
+            self.misses += 1
+            return None
+
+    def put(self, scope: Hashable, vector: Sequence[float], value: Any) -> None:
+        query = self._unit(vector)
+        now = time.monotonic()
+        with self._lock:
+            if self._vectors is None:
+                self._vectors = np.zeros((self.max_size, len(query)), dtype=np.float32)
+            # An expired slot, else the least recently used one
+            slot = int(np.argmin(np.where(self._expires < now, -np.inf, self._last_used)))
+            self._vectors[slot] = query
+            self._scopes[slot] = scope
+            self._values[slot] = value
+            self._expires[slot] = now + self.ttl_seconds
+            self._last_used[slot] = now
+
+    def clear(self) -> None:
+        with self._lock:
+            self._expires[:] = 0
+            self._scopes = [None] * self.max_size
+            self._values = [None] * self.max_size
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": int((self._expires >= time.monotonic()).sum()),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+def normalize_query(query: str) -> str:
+    """Case, spacing and trailing punctuation don't change what a trainee is asking"""
+    return re.sub(r"\s+", " ", query).strip().rstrip("?!. ").lower()
+
+
+def reciprocal_rank_fusion(rankings: Sequence[List[Document]], k: int, rrf_k: int = config.RRF_K) -> List[Document]:
+    """Merge ranked lists by summing 1 / (rrf_k + rank) for each chunk across lists"""
+    scores: Dict[str, float] = {}
+    docs_by_id: Dict[str, Document] = {}
+    for ranking in rankings:
+        for rank, doc in enumerate(ranking, start=1):
+            cid = chunk_id(doc.page_content)
+            scores[cid] = scores.get(cid, 0.0) + 1.0 / (rrf_k + rank)
+            docs_by_id.setdefault(cid, doc)
+    fused = sorted(scores, key=scores.get, reverse=True)[:k]
+    return [docs_by_id[cid] for cid in fused]
+
+
+def _matches_filter(doc: Document, filter: Optional[dict]) -> bool:
+    """Same metadata filter semantics as FAISS: equality, or membership for list values"""
+    if not filter:
+        return True
+    return all(
+        doc.metadata.get(key) in value if isinstance(value, list) else doc.metadata.get(key) == value
+        for key, value in filter.items()
+    )
+
+
+class CachedRetriever:
+    """Drop-in for vector_store.as_retriever() that caches query embeddings and search results.
+    Without a lexical index it is a plain dense retriever."""
+
+    def __init__(
+        self,
+        vector_store: FAISS,
+        index_version: str,
+        k: int = config.RETRIEVER_K,
+        cache_size: int = config.RETRIEVAL_CACHE_SIZE,
+        ttl_seconds: float = config.RETRIEVAL_CACHE_TTL_SECONDS,
+        cache_similarity: float = config.RETRIEVAL_CACHE_SIMILARITY,
+        lexical_index: Optional[BM25Index] = None,
+        candidates: int = config.HYBRID_CANDIDATES,
+        partitions: Optional[TopicPartitions] = None,
+        partition_min_similarity: float = config.TOPIC_PARTITION_MIN_SIMILARITY,
+        batching: bool = config.RETRIEVAL_BATCHING_ENABLED,
+        batch_max_size: int = config.RETRIEVAL_BATCH_MAX_SIZE,
+        batch_wait_ms: float = config.RETRIEVAL_BATCH_WAIT_MS,
+        batch_workers: int = config.RETRIEVAL_BATCH_WORKERS,
+    ):
+        self.vector_store = vector_store
+        self.index_version = index_version
+        self.k = k
+        self.lexical_index = lexical_index
+        self.candidates = candidates
+        self.embedding_cache = TTLCache(cache_size, ttl_seconds)
+        self.result_cache = TTLCache(cache_size, ttl_seconds)
+        self.similar_result_cache = SimilarQueryCache(cache_size, ttl_seconds, cache_similarity)
+        self.partitions = partitions
+        self.partition_min_similarity = partition_min_similarity
+        self.keyword_only_queries = 0
+        self.partition_queries = 0
+        self.partition_fallbacks = 0
+        self._counter_lock = threading.Lock()  # Requests run on many threads, and in MicroBatcher workers
+        self._positions = None  # (index version, docstore id -> FAISS position lookup)
+        self._embed_batcher: Optional[MicroBatcher] = None
+        self._search_batcher: Optional[MicroBatcher] = None
+        if batching:
+            batch_settings = dict(max_batch_size=batch_max_size, max_wait_seconds=batch_wait_ms / 1000, workers=batch_workers)
+            self._embed_batcher = MicroBatcher(self._embed_batch, name="retrieval-embed", **batch_settings)
+            self._search_batcher = MicroBatcher(self._search_batch, name="retrieval-search", **batch_settings)
+
+    def close(self) -> None:
+        """Stop the batching threads, which otherwise keep this retriever (index, model) alive; later calls run unbatched"""
+        batchers = (self._embed_batcher, self._search_batcher)
+        self._embed_batcher = self._search_batcher = None
+        for batcher in batchers:
+            if batcher is not None:
+                batcher.close()
+
+    def _count(self, counter: str) -> None:
+        with self._counter_lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def embed_query(self, query: str) -> List[float]:
+        normalized = normalize_query(query)
+        key = (self.index_version, normalized)
+        embedding = self.embedding_cache.get(key)
+        if embedding is None:
+            with span("retrieval.embed_query", batched=self._embed_batcher is not None):
+                if self._embed_batcher is not None:
+                    embedding = self._embed_batcher.submit(normalized)
+                else:
+                    embedding = self.vector_store.embedding_function.embed_query(normalized)
+            self.embedding_cache.put(key, embedding)
+        return embedding
+
+    def _embed_batch(self, texts: List[str]) -> List[List[float]]:
+        # One forward pass for the batch; for the sentence-transformer models used here a query embeds like a document
+        return self.vector_store.embedding_function.embed_documents(texts)
+
+    def _search_batch(self, requests: List[tuple]) -> List[List[str]]:
+        """Docstore ids of the k nearest chunks for each (query vector, k), from one matrix search"""
+        vectors = np.asarray([vector for vector, _ in requests], dtype=np.float32)
+        _, positions = self.vector_store.index.search(vectors, max(k for _, k in requests))
+        index_to_id = self.vector_store.index_to_docstore_id
+        return [[index_to_id[p] for p in row[:k] if p != -1] for row, (_, k) in zip(positions, requests)]
+
+    def _dense_search(self, query_vector: List[float], k: int, filter: Optional[dict]) -> List[Document]:
+        if self._search_batcher is None or filter:
+            return self.vector_store.similarity_search_by_vector(query_vector, k=k, filter=filter)
+        return self._lookup(self._search_batcher.submit((query_vector, k)))
+
+    def is_keyword_query(self, query: str) -> bool:
+        """A few terms the lexical index knows, with no filler words: BM25 alone answers it well"""
+        if self.lexical_index is None:
+            return False
+        terms = tokenize(query)
+        return (
+            0 < len(terms) <= config.KEYWORD_QUERY_MAX_TERMS
+            and len(terms) == len(tokenize(query, drop_stopwords=False))
+            and all(self.lexical_index.has_term(term) for term in terms)
+        )
+
+    def _lookup(self, ids: List[str]) -> List[Document]:
+        docs = [self.vector_store.docstore.search(doc_id) for doc_id in ids]
+        return [doc for doc in docs if isinstance(doc, Document)]
+
+    def _search_indexes(self, query: str, query_vector: Optional[List[float]], k: int, filter: Optional[dict]) -> List[Document]:
+        """query_vector is None for a keyword query"""
+        with span("retrieval.search", k=k, hybrid=self.lexical_index is not None):
+            if self.lexical_index is None:
+                return self._dense_search(query_vector, k, filter)
+            candidates = max(k, self.candidates)
+            lexical_ids = [cid for cid, _ in self.lexical_index.search(query, candidates)]
+            lexical_docs = [doc for doc in self._lookup(lexical_ids) if _matches_filter(doc, filter)]
+            if lexical_docs and query_vector is None:
+                self._count("keyword_only_queries")
+                return lexical_docs[:k]
+        # Outside the search span: embedding is its own span
+        query_vector = query_vector or self.embed_query(query)
+        with span("retrieval.search", k=k, hybrid=True):
+            dense_docs = self._dense_search(query_vector, candidates, filter)
+            return reciprocal_rank_fusion([dense_docs, lexical_docs], k)
+
+    def get_relevant_documents(self, query: str, k: Optional[int] = None, filter: Optional[dict] = None) -> List[Document]:
+        k = k or self.k
+        normalized = normalize_query(query)
+        scope = (self.index_version, k, json.dumps(filter, sort_keys=True) if filter else None)
+        key = (self.index_version, normalized) + scope[1:]
+
+        with span("retrieval", k=k) as retrieval_span:
+            ids = self.result_cache.get(key)
+            if ids is not None:
+                docs = self._lookup(ids)
+                if len(docs) == len(ids):
+                    retrieval_span.set(cached=True)
+                    return docs
+            # A keyword query is answered without its embedding, so it has none to look up by
+            query_vector = None if self.is_keyword_query(normalized) else self.embed_query(normalized)
+            if query_vector is not None:
+                ids = self.similar_result_cache.get(scope, query_vector)
+                if ids is not None:
+                    docs = self._lookup(ids)
+                    if len(docs) == len(ids):
+                        retrieval_span.set(cached=True, similar=True)
+                        self.result_cache.put(key, ids)
+                        return docs
+            retrieval_span.set(cached=False)
+            docs = self._search_indexes(normalized, query_vector, k, filter)
+            ids = [chunk_id(doc.page_content) for doc in docs]
+            self.result_cache.put(key, ids)
+            if query_vector is not None:
+                self.similar_result_cache.put(scope, query_vector, ids)
+            return docs
+
+    def get_module_documents(self, query: str, module_name: Optional[str], k: Optional[int] = None) -> List[Document]:
+        """Search the module's partition; fall back to the global index when its best match scores low"""
+        k = k or self.k
+        if self.partitions is None or not module_name or module_name not in self.partitions:
+            return self.get_relevant_documents(query, k=k)
+        normalized = normalize_query(query)
+        scope = (self.index_version, k, f"module:{module_name}")
+        key = (self.index_version, normalized) + scope[1:]
+
+        ids = self.result_cache.get(key)
+        if ids is not None:
+            docs = self._lookup(ids)
+            if len(docs) == len(ids):
+                return docs
+        query_vector = self.embed_query(normalized)
+        ids = self.similar_result_cache.get(scope, query_vector)
+        if ids is not None:
+            docs = self._lookup(ids)
+            if len(docs) == len(ids):
+                self.result_cache.put(key, ids)
+                return docs
+        self._count("partition_queries")
+        results = self.partitions.search(module_name, query_vector, k)
+        if results and results[0][1] >= self.partition_min_similarity:
+            docs = [doc for doc, _ in results]
+        else:
+            self._count("partition_fallbacks")
+            docs = self.get_relevant_documents(normalized, k=k)
+        ids = [chunk_id(doc.page_content) for doc in docs]
+        self.result_cache.put(key, ids)
+        self.similar_result_cache.put(scope, query_vector, ids)
+        return docs
+
+    def document_vectors(self, docs: Sequence[Document]) -> np.ndarray:
+        """Stored vectors of indexed chunks, read back from the FAISS index rather than re-embedded"""
+        if not docs:
+            return np.empty((0, self.vector_store.index.d), dtype=np.float32)
+        if self._positions is None or self._positions[0] != self.index_version:
+            self._positions = (self.index_version, position_lookup(self.vector_store.index_to_docstore_id))
+        positions = [self._positions[1](chunk_id(doc.page_content)) for doc in docs]
+        try:
+            if min(positions) < 0:
+                raise KeyError("not indexed")
+            return np.vstack([self.vector_store.index.reconstruct(position) for position in positions])
+        except (KeyError, RuntimeError):
+            # Not in this index, or an index type that can't reconstruct vectors
+            return np.asarray(self.vector_store.embedding_function.embed_documents([doc.page_content for doc in docs]), dtype=np.float32)
+
+    def invoke(self, query: str) -> List[Document]:
+        return self.get_relevant_documents(query)
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        return {
+            "query_embeddings": self.embedding_cache.stats(),
+            "search_results": self.result_cache.stats(),
+            "similar_queries": self.similar_result_cache.stats(),
+        }
+
+    def batch_stats(self) -> Dict[str, Dict[str, float]]:
+        batchers = {"embedding": self._embed_batcher, "search": self._search_batcher}
+        return {name: batcher.stats() for name, batcher in batchers.items() if batcher is not None}
@@ -0,0 +1,113 @@
+"""Where the HTTP service keeps each trainee's TrainingSession between messages.
+
+Workers hold no conversation state of their own: every request loads the
+session from the store, runs the turn and saves it back, so any worker (or
+host) can serve any trainee. Pick the backend with a URL::
+
+    memory://                           one process only; lost on restart
+    sqlite:///./data/sessions.sqlite3   every worker on one host (default)
+    redis://localhost:6379/0            every worker on every host
+
+Sessions expire SESSION_TTL_SECONDS after they were last saved.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+import config
+from training_session import TrainingSession
+
+
+class InMemorySessionStore:
+    """Sessions in a dict, for a single worker process"""
+
+    def __init__(self, ttl_seconds: float = config.SESSION_TTL_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._sessions: Dict[str, Tuple[float, str]] = {}
+
+    def load(self, session_id: str) -> Optional[TrainingSession]:
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is None or entry[0] < time.time():
+                self._sessions.pop(session_id, None)
+                return None
+        return TrainingSession.from_dict(json.loads(entry[1]))
+
+    def save(self, session: TrainingSession) -> None:
+        data = json.dumps(session.to_dict())
+        with self._lock:
+            self._sessions[session.session_id] = (time.time() + self.ttl_seconds, data)
+
+    def delete(self, session_id: str) -> None:
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+
+class SQLiteSessionStore:
+    """Sessions in a SQLite file shared by the worker processes on one host"""
+
+    def __init__(self, path: str, ttl_seconds: float = config.SESSION_TTL_SECONDS):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=30, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS sessions (session_id TEXT PRIMARY KEY, expires_at REAL, data TEXT)")
+
+    def load(self, session_id: str) -> Optional[TrainingSession]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT data FROM sessions WHERE session_id = ? AND expires_at >= ?", (session_id, time.time())
+            ).fetchone()
+        return TrainingSession.from_dict(json.loads(row[0])) if row else None
+
+    def save(self, session: TrainingSession) -> None:
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO sessions (session_id, expires_at, data) VALUES (?, ?, ?)",
+                (session.session_id, now + self.ttl_seconds, json.dumps(session.to_dict())),
+            )
+            self._db.execute("DELETE FROM sessions WHERE expires_at < ?", (now,))
+
+    def delete(self, session_id: str) -> None:
+        with self._lock:
+            self._db.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+
+
+class RedisSessionStore:
+    """Sessions in Redis, shared by workers on any number of hosts; needs the redis package"""
+
+    def __init__(self, url: str, ttl_seconds: float = config.SESSION_TTL_SECONDS, prefix: str = "uetcl:session:"):
+        import redis
+
+        self.ttl_seconds = ttl_seconds
+        self.prefix = prefix
+        self._redis = redis.Redis.from_url(url)
+
+    def load(self, session_id: str) -> Optional[TrainingSession]:
+        data = self._redis.get(self.prefix + session_id)
+        return TrainingSession.from_dict(json.loads(data)) if data else None
+
+    def save(self, session: TrainingSession) -> None:
+        self._redis.set(self.prefix + session.session_id, json.dumps(session.to_dict()), ex=int(self.ttl_seconds))
+
+    def delete(self, session_id: str) -> None:
+        self._redis.delete(self.prefix + session_id)
+
+
+def create_session_store(url: str = config.SESSION_STORE_URL):
+    """The store for url, as described in the module docstring"""
+    if url.startswith("memory://"):
+        return InMemorySessionStore()
+    if url.startswith("sqlite:///"):
+        path = url[len("sqlite:///"):]
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        return SQLiteSessionStore(path)
+    if url.startswith(("redis://", "rediss://")):
+        return RedisSessionStore(url)
+    raise ValueError(f"Unsupported session store URL: {url}")
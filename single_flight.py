@@ -0,0 +1,110 @@
+"""Coalescing of identical in-flight LLM calls.
+
+When a cohort reaches the same challenge together, many sessions render the
+exact same prompt within seconds of each other. ``SingleFlight`` lets the
+first caller for a key start one upstream stream and every caller arriving
+while it is in flight read the same chunks, live, instead of sending its own
+request. Once the stream finishes the key is forgotten: this is not a cache,
+and a prompt sent after the answer arrived goes upstream again.
+
+No reader owns the upstream stream. Whichever reader has caught up pulls the
+next chunk, so a trainee who leaves mid-answer does not cut off the others;
+the stream is closed only when its last reader has gone.
+"""
+import threading
+from typing import Callable, Dict, Hashable, Iterator, List, Optional, Tuple
+
+
+class _Flight:
+    def __init__(self, upstream: Iterator[str]):
+        self.upstream = upstream
+        self.chunks: List[str] = []
+        self.readers = 0
+        self.pulling = False
+        self.done = False
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """Shares one upstream stream between concurrent callers with the same key"""
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._flights: Dict[Hashable, _Flight] = {}
+        self._counters: Dict[str, int] = {"calls": 0, "coalesced": 0, "abandoned": 0}
+
+    def join(self, key: Hashable, open_stream: Callable[[], Iterator[str]]) -> Tuple[Iterator[str], bool]:
+        """The chunks of the flight for key, starting one with open_stream if none is in flight, and whether
+        this caller joined an existing flight. The returned iterator must be consumed or closed."""
+        with self._condition:
+            flight = self._flights.get(key)
+            coalesced = flight is not None
+            if flight is None:
+                flight = self._flights[key] = _Flight(open_stream())
+                self._counters["calls"] += 1
+            else:
+                self._counters["coalesced"] += 1
+            flight.readers += 1
+        return self._read(key, flight), coalesced
+
+    def _read(self, key: Hashable, flight: _Flight) -> Iterator[str]:
+        position = 0
+        try:
+            while True:
+                with self._condition:
+                    while position == len(flight.chunks) and not flight.done and flight.pulling:
+                        self._condition.wait()
+                    if position < len(flight.chunks):
+                        chunk = flight.chunks[position]
+                    elif flight.done:
+                        if flight.error is not None:
+                            raise flight.error
+                        return
+                    else:
+                        flight.pulling = True
+                        chunk = None
+                if chunk is None:
+                    chunk = self._pull(key, flight)
+                    if chunk is None:
+                        continue
+                position += 1
+                yield chunk
+        finally:
+            with self._condition:
+                flight.readers -= 1
+                abandoned = flight.readers == 0 and not flight.done
+                if abandoned:
+                    flight.done = True
+                    self._forget(key, flight)
+                    self._counters["abandoned"] += 1
+            if abandoned:
+                flight.upstream.close()
+
+    def _pull(self, key: Hashable, flight: _Flight) -> Optional[str]:
+        """Next upstream chunk for all readers; None once the stream has ended"""
+        try:
+            chunk = next(flight.upstream)
+        except BaseException as exc:
+            with self._condition:
+                if not isinstance(exc, StopIteration):
+                    flight.error = exc
+                flight.done = True
+                flight.pulling = False
+                self._forget(key, flight)
+                self._condition.notify_all()
+            if isinstance(exc, StopIteration):
+                return None
+            raise
+        with self._condition:
+            flight.chunks.append(chunk)
+            flight.pulling = False
+            self._condition.notify_all()
+        return chunk
+
+    def _forget(self, key: Hashable, flight: _Flight) -> None:
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+
+    def stats(self) -> Dict[str, int]:
+        with self._condition:
+            return {"in_flight": len(self._flights), **self._counters}
@@ -0,0 +1,218 @@
+"""Per-module partitions of the policy index.
+
+Every chunk is assigned at build time to the training module(s) it is about:
+training Q&A rows through their ``Topic`` label, and every chunk through the
+cosine similarity of its vector to each module's topic text (title plus
+instructions). The chunk ids per module are stored next to the index as
+topic_partitions.json, and their normalised vectors, one block of rows per
+module, as topic_partitions.npy. A question asked inside a module gets an
+exact cosine search over its module's block only, a tenth of the corpus, and
+so chunks on that module's subject. With INDEX_MMAP_ENABLED the vectors are
+memory-mapped, one copy in the page cache for every worker on the host. The
+retriever falls back to the global index when the best partition match scores
+low.
+
+Recompute the stored partitions with::
+
+    python topic_partitions.py
+"""
+import argparse
+import hashlib
+import json
+import logging
+import os
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from langchain.docstore.document import Document
+from langchain.vectorstores import FAISS
+
+import config
+from chunk_store import position_lookup
+from modules import ALL_MODULES
+from rag_index import artifact_dir_for, chunk_id, file_sha256, iter_training_chunks, load_or_build_vector_store, read_json
+
+logger = logging.getLogger(__name__)
+
+PARTITIONS_FILE = "topic_partitions.json"
+PARTITION_VECTORS_FILE = "topic_partitions.npy"
+
+# Training CSV topics and the modules that teach them
+TRAINING_TOPIC_MODULES: Dict[str, List[str]] = {
+    "Email Policy": ["Module 1", "Module 5"],
+    "Password Policy": ["Module 2"],
+    "Access Control": ["Module 2"],
+    "Incident Response": ["Module 3"],
+    "Information Classification": ["Module 4"],
+}
+
+
+def module_topic_texts() -> Dict[str, str]:
+    """What each module is about: its title and instruction steps"""
+    return {
+        module_name: "\n".join([module_name.split(":", 1)[-1].strip()] + [step["content"] for step in steps if step["type"] == "instruction"])
+        for module_name, steps in ALL_MODULES.items()
+    }
+
+def _normalized(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    return vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+def _topics_key(topic_texts: Dict[str, str], max_topics: int, margin: float, training_path: str) -> str:
+    material = [max_topics, margin, sorted(topic_texts.items()), sorted(TRAINING_TOPIC_MODULES.items()), file_sha256(training_path)]
+    return hashlib.sha256(json.dumps(material).encode("utf-8")).hexdigest()[:16]
+
+
+def assign_partitions(
+    vector_store: FAISS,
+    training_path: str = config.TRAINING_DATA_PATH,
+    max_topics: int = config.TOPIC_PARTITION_MAX_TOPICS,
+    margin: float = config.TOPIC_PARTITION_MARGIN,
+) -> Dict[str, List[str]]:
+    """Chunk ids per module: each chunk joins its nearest module, and up to max_topics-1 more within margin of it"""
+    topic_texts = module_topic_texts()
+    module_names = list(topic_texts)
+    topic_vectors = _normalized(vector_store.embeddings.embed_documents([topic_texts[name] for name in module_names]))
+    index = vector_store.index
+    chunk_vectors = _normalized(index.reconstruct_n(0, index.ntotal))
+    similarities = chunk_vectors @ topic_vectors.T
+
+    partitions: Dict[str, List[str]] = {name: [] for name in module_names}
+    ranked = np.argsort(-similarities, axis=1)[:, :max_topics]
+    for position, doc_id in vector_store.index_to_docstore_id.items():
+        best = similarities[position, ranked[position, 0]]
+        for topic in ranked[position]:
+            if similarities[position, topic] >= best - margin:
+                partitions[module_names[topic]].append(doc_id)
+
+    # Labelled training rows always join the modules that teach their topic
+    modules_by_id = {name.split(":")[0]: name for name in module_names}
+    indexed = set(vector_store.index_to_docstore_id.values())
+    import pandas as pd
+
+    topics = pd.read_csv(training_path)["Topic"].tolist()
+    for text, topic in zip(iter_training_chunks(training_path), topics):
+        cid = chunk_id(text)
+        for module_id in TRAINING_TOPIC_MODULES.get(topic, []):
+            if cid in indexed and cid not in partitions[modules_by_id[module_id]]:
+                partitions[modules_by_id[module_id]].append(cid)
+    return partitions
+
+
+def partition_vectors(vector_store: FAISS, chunk_ids_by_module: Dict[str, List[str]]) -> np.ndarray:
+    """Normalised vectors of every partition's chunks, stacked in order of module name"""
+    position_of = position_lookup(vector_store.index_to_docstore_id)
+    positions = [position_of(cid) for module_name in sorted(chunk_ids_by_module) for cid in chunk_ids_by_module[module_name]]
+    if not positions:
+        return np.zeros((0, vector_store.index.d), dtype=np.float32)
+    if min(positions) < 0:
+        raise KeyError("A partition names a chunk that is not in the index")
+    return _normalized(np.vstack([vector_store.index.reconstruct(position) for position in positions]))
+
+
+class TopicPartitions:
+    """Exact cosine search over each module's chunks, a block of rows in one vector array"""
+
+    def __init__(self, vector_store: FAISS, chunk_ids_by_module: Dict[str, List[str]], vectors: Optional[np.ndarray] = None):
+        self.vector_store = vector_store
+        self.chunk_ids_by_module = chunk_ids_by_module
+        self.vectors = partition_vectors(vector_store, chunk_ids_by_module) if vectors is None else vectors
+        self._blocks: Dict[str, Tuple[int, int, List[str]]] = {}
+        start = 0
+        for module_name in sorted(chunk_ids_by_module):
+            chunk_ids = chunk_ids_by_module[module_name]
+            if chunk_ids:
+                self._blocks[module_name] = (start, start + len(chunk_ids), chunk_ids)
+            start += len(chunk_ids)
+        if start != len(self.vectors):
+            raise ValueError(f"{len(self.vectors)} partition vectors for {start} partitioned chunks")
+
+    def __contains__(self, module_name: str) -> bool:
+        return module_name in self._blocks
+
+    def search(self, module_name: str, query_vector: List[float], k: int) -> List[Tuple[Document, float]]:
+        """Top-k chunks of the module's partition with their cosine similarity to the query"""
+        start, end, chunk_ids = self._blocks[module_name]
+        scores = self.vectors[start:end] @ _normalized(np.asarray([query_vector]))[0]
+        k = min(k, len(chunk_ids))
+        found = np.argpartition(-scores, k - 1)[:k]
+        found = found[np.argsort(-scores[found], kind="stable")]
+        results = []
+        for position in found:
+            doc = self.vector_store.docstore.search(chunk_ids[position])
+            if isinstance(doc, Document):
+                results.append((doc, float(scores[position])))
+        return results
+
+    def sizes(self) -> Dict[str, int]:
+        return {module_name: len(chunk_ids) for module_name, (_, _, chunk_ids) in self._blocks.items()}
+
+
+def load_topic_partitions(
+    vector_store: FAISS,
+    index_key: str,
+    artifact_dir: Optional[str] = None,
+    recompute: bool = False,
+    write: bool = True,
+    training_path: Optional[str] = None,
+) -> TopicPartitions:
+    """Read the stored partitions for this index, recomputing them when the index or module texts changed.
+
+    training_path is the CSV the index was built from; by default the one the stored partitions name.
+    write=False keeps recomputed partitions in memory, for workers serving a published, read-only artifact."""
+    artifact_dir = artifact_dir or artifact_dir_for()
+    path = os.path.join(artifact_dir, PARTITIONS_FILE)
+    vectors_path = os.path.join(artifact_dir, PARTITION_VECTORS_FILE)
+
+    stored = None if recompute else read_json(path)
+    training_path = training_path or (stored or {}).get("training_path") or config.TRAINING_DATA_PATH
+    topics_key = _topics_key(module_topic_texts(), config.TOPIC_PARTITION_MAX_TOPICS, config.TOPIC_PARTITION_MARGIN, training_path)
+    if stored and stored.get("index_key") == index_key and stored.get("topics_key") == topics_key:
+        try:
+            vectors = np.load(vectors_path, mmap_mode="r" if config.INDEX_MMAP_ENABLED else None)
+            return TopicPartitions(vector_store, stored["partitions"], vectors)
+        except (OSError, ValueError) as exc:
+            logger.warning("Stored partition vectors in %s are unusable (%s); recomputing them", vectors_path, exc)
+            if not write:
+                return TopicPartitions(vector_store, stored["partitions"])
+            return _store_partitions(vector_store, stored["partitions"], stored, path, vectors_path)
+
+    partitions = assign_partitions(vector_store, training_path)
+    if not write:
+        logger.warning("Topic partitions in %s are missing or stale; computed them for this process only", path)
+        return TopicPartitions(vector_store, partitions)
+    return _store_partitions(vector_store, partitions, {"index_key": index_key, "topics_key": topics_key, "training_path": training_path, "partitions": partitions}, path, vectors_path)
+
+
+def _store_partitions(vector_store: FAISS, partitions: Dict[str, List[str]], record: dict, path: str, vectors_path: str) -> TopicPartitions:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Vectors first: the JSON is what marks the pair as current
+    tmp_path = f"{vectors_path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        np.save(f, partition_vectors(vector_store, partitions))
+    os.replace(tmp_path, vectors_path)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(record, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+    logger.info("Stored topic partitions for %d modules in %s", len(partitions), path)
+    vectors = np.load(vectors_path, mmap_mode="r" if config.INDEX_MMAP_ENABLED else None)
+    return TopicPartitions(vector_store, partitions, vectors)
+
+
+# --- CLI ---
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Assign index chunks to training modules and store the partitions.")
+    parser.add_argument("--training", default=config.TRAINING_DATA_PATH, help="Path to the training Q&A CSV the index is built from")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    vector_store, index_key = load_or_build_vector_store(training_path=args.training)
+    partitions = load_topic_partitions(vector_store, index_key, recompute=True, training_path=args.training)
+    total = len(vector_store.index_to_docstore_id)
+    for module_name, size in partitions.sizes().items():
+        print(f"{module_name:<50} {size:>5} chunks ({size / total:.0%})")
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,214 @@
+"""Lightweight span tracing for chat turns.
+
+Each stage of a turn (intent classification, query embedding, index search,
+the LLM call, rendering) runs inside ``span(name)``. Spans nest through a
+context variable, so every span carries its turn's trace id and its parent.
+Finished spans go to three places:
+
+* a rotating JSONL file (``config.TRACE_DIR/spans.jsonl``), one span per line,
+* a Prometheus text-format file (``metrics.prom``) with per-stage duration
+  summaries, LLM token counters and registered gauges (such as the LLM queue
+  depth), rewritten every few seconds and readable by node_exporter's textfile
+  collector,
+* an in-memory window of recent durations per stage for the admin panel.
+
+Tracing adds a few microseconds per span; UETCL_TRACING=0 turns it off.
+"""
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from logging.handlers import RotatingFileHandler
+from typing import Any, Callable, Deque, Dict, Iterator, Optional, Tuple
+
+import numpy as np
+
+import config
+
+SPANS_FILE = "spans.jsonl"
+METRICS_FILE = "metrics.prom"
+
+
+@dataclass
+class Span:
+    name: str
+    trace_id: str
+    span_id: str
+    parent_id: Optional[str]
+    started_at: float  # Unix time
+    attributes: Dict[str, Any] = field(default_factory=dict)
+    duration_seconds: float = 0.0
+    error: Optional[str] = None
+
+    def set(self, **attributes: Any) -> None:
+        self.attributes.update(attributes)
+
+class _NoopSpan:
+    def set(self, **attributes: Any) -> None:
+        pass
+
+_current_span: ContextVar[Optional[Span]] = ContextVar("uetcl_current_span", default=None)
+
+
+class Tracer:
+    """Records spans to a rotating JSONL file, a Prometheus text file and a recent-durations window"""
+
+    def __init__(
+        self,
+        trace_dir: str = config.TRACE_DIR,
+        enabled: bool = config.TRACING_ENABLED,
+        max_bytes: int = config.TRACE_FILE_MAX_BYTES,
+        backups: int = config.TRACE_FILE_BACKUPS,
+        recent: int = config.TRACE_RECENT_SPANS,
+        export_interval_seconds: float = config.TRACE_EXPORT_INTERVAL_SECONDS,
+    ):
+        self.trace_dir = trace_dir
+        self.enabled = enabled
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.export_interval_seconds = export_interval_seconds
+        self._recent: Dict[str, Deque[float]] = defaultdict(lambda: deque(maxlen=recent))
+        self._totals: Dict[str, list] = defaultdict(lambda: [0, 0.0, 0])  # count, seconds, errors
+        self._tokens: Dict[str, int] = defaultdict(int)
+        self._gauges: Dict[str, Tuple[str, str, Callable[[], float]]] = {}
+        self._lock = threading.Lock()
+        self._span_log: Optional[logging.Logger] = None
+        self._last_export = 0.0
+
+    @contextmanager
+    def span(self, name: str, **attributes: Any) -> Iterator[Span]:
+        """Time the enclosed block as one stage of the current trace (a new trace if there is none)"""
+        if not self.enabled:
+            yield _NoopSpan()
+            return
+        parent = _current_span.get()
+        current = Span(
+            name=name,
+            trace_id=parent.trace_id if parent else uuid.uuid4().hex[:16],
+            span_id=uuid.uuid4().hex[:16],
+            parent_id=parent.span_id if parent else None,
+            started_at=time.time(),
+            attributes=attributes,
+        )
+        # Set and restore by value rather than with reset tokens: streamed spans may close in another context
+        _current_span.set(current)
+        started = time.perf_counter()
+        try:
+            yield current
+        except GeneratorExit:
+            current.set(abandoned=True)  # A stream the consumer stopped reading
+            raise
+        except BaseException as exc:
+            current.error = type(exc).__name__
+            raise
+        finally:
+            current.duration_seconds = time.perf_counter() - started
+            _current_span.set(parent)
+            self.record(current)
+
+    def record(self, span: Span) -> None:
+        with self._lock:
+            self._recent[span.name].append(span.duration_seconds)
+            totals = self._totals[span.name]
+            totals[0] += 1
+            totals[1] += span.duration_seconds
+            totals[2] += span.error is not None
+            for kind in ("prompt", "completion"):
+                self._tokens[kind] += int(span.attributes.get(f"{kind}_tokens", 0))
+            export_due = time.monotonic() - self._last_export >= self.export_interval_seconds
+            if export_due:
+                self._last_export = time.monotonic()
+        try:
+            self._spans_logger().info(json.dumps({
+                "name": span.name,
+                "trace_id": span.trace_id,
+                "span_id": span.span_id,
+                "parent_id": span.parent_id,
+                "started_at": round(span.started_at, 6),
+                "duration_ms": round(span.duration_seconds * 1000, 3),
+                "error": span.error,
+                "attributes": span.attributes,
+            }, default=str))
+            if export_due:
+                self.export_prometheus()
+        except OSError:
+            pass  # Tracing must never break a turn
+
+    def _spans_logger(self) -> logging.Logger:
+        if self._span_log is None:
+            os.makedirs(self.trace_dir, exist_ok=True)
+            span_log = logging.getLogger(f"uetcl.spans.{id(self)}")
+            span_log.setLevel(logging.INFO)
+            span_log.propagate = False
+            handler = RotatingFileHandler(
+                os.path.join(self.trace_dir, SPANS_FILE), maxBytes=self.max_bytes, backupCount=self.backups, encoding="utf-8",
+            )
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            span_log.addHandler(handler)
+            self._span_log = span_log
+        return self._span_log
+
+    def register_gauge(self, name: str, help_text: str, read: Callable[[], float], kind: str = "gauge") -> None:
+        """Export read() with every metrics file; kind="counter" for values that only grow"""
+        with self._lock:
+            self._gauges[name] = (help_text, kind, read)
+
+    def stage_stats(self) -> Dict[str, Dict[str, float]]:
+        """p50/p95 over each stage's recent spans, plus lifetime counts"""
+        with self._lock:
+            stats = {}
+            for name, durations in sorted(self._recent.items()):
+                latencies_ms = np.array(durations) * 1000
+                count, seconds, errors = self._totals[name]
+                stats[name] = {
+                    "p50_ms": float(np.percentile(latencies_ms, 50)),
+                    "p95_ms": float(np.percentile(latencies_ms, 95)),
+                    "count": count,
+                    "errors": errors,
+                }
+            return stats
+
+    def token_counts(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._tokens)
+
+    def render_prometheus(self) -> str:
+        """Per-stage duration summaries and token counters in the Prometheus text exposition format"""
+        with self._lock:
+            lines = [
+                "# HELP uetcl_span_duration_seconds Duration of traced chat turn stages; quantiles over recent spans",
+                "# TYPE uetcl_span_duration_seconds summary",
+            ]
+            for name, durations in sorted(self._recent.items()):
+                for quantile in (0.5, 0.95, 0.99):
+                    lines.append(f'uetcl_span_duration_seconds{{stage="{name}",quantile="{quantile}"}} {np.quantile(durations, quantile):.6f}')
+                count, seconds, _ = self._totals[name]
+                lines.append(f'uetcl_span_duration_seconds_sum{{stage="{name}"}} {seconds:.6f}')
+                lines.append(f'uetcl_span_duration_seconds_count{{stage="{name}"}} {count}')
+            lines += ["# HELP uetcl_span_errors_total Spans that ended with an exception", "# TYPE uetcl_span_errors_total counter"]
+            lines += [f'uetcl_span_errors_total{{stage="{name}"}} {totals[2]}' for name, totals in sorted(self._totals.items())]
+            lines += ["# HELP uetcl_llm_tokens_total Estimated LLM tokens", "# TYPE uetcl_llm_tokens_total counter"]
+            lines += [f'uetcl_llm_tokens_total{{kind="{kind}"}} {count}' for kind, count in sorted(self._tokens.items())]
+            gauges = sorted(self._gauges.items())
+        for name, (help_text, kind, read) in gauges:
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}", f"{name} {read()}"]
+        return "\n".join(lines) + "\n"
+
+    def export_prometheus(self) -> str:
+        os.makedirs(self.trace_dir, exist_ok=True)
+        path = os.path.join(self.trace_dir, METRICS_FILE)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(self.render_prometheus())
+        os.replace(tmp_path, path)
+        return path
+
+
+tracer = Tracer()
+span = tracer.span
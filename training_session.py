@@ -0,0 +1,316 @@
+"""One trainee's conversation state, and the role profiles that personalise it.
+
+A ``TrainingSession`` holds everything the tutor remembers about one trainee:
+their profile, the chat so far, the module in progress and the modules
+completed. It is plain data that round-trips through ``to_dict`` and
+``from_dict``, so a session store can hand it to whichever worker serves the
+next message.
+
+Only the standard library and the module definitions are imported here, so
+the UI can show the sign-in form and the module list while the tutor itself
+(tutor_engine.py) is still loading.
+"""
+import uuid
+from dataclasses import asdict, dataclass, field, fields
+from enum import Enum
+from typing import Dict, List, Optional, Set
+
+from modules import ALL_MODULES, ROLE_SPECIFIC_SCENARIOS
+
+# --- ROLE-BASED ENHANCEMENTS ---
+class RiskLevel(Enum):
+    HIGH = "high"
+    MEDIUM = "medium"
+    STANDARD = "standard"
+
+class TechnicalLevel(Enum):
+    ADVANCED = "advanced"
+    INTERMEDIATE = "intermediate"
+    BASIC = "basic"
+
+@dataclass
+class RoleProfile:
+    role: str
+    department: str
+    risk_level: RiskLevel
+    technical_level: TechnicalLevel
+    mandatory_modules: List[str]
+    recommended_modules: List[str]
+    scenario_focus: List[str]
+    description: str
+
+# --- ROLE MAPPING ---
+ROLE_PROFILES = {
+    # IT Department - High Risk
+    "IT Technician": RoleProfile(
+        role="IT Technician",
+        department="Information and Communication Technology",
+        risk_level=RiskLevel.HIGH,
+        technical_level=TechnicalLevel.ADVANCED,
+        mandatory_modules=["Module 1", "Module 2", "Module 3", "Module 4", "Module 7", "Module 8", "Module 9"],
+        recommended_modules=["Module 5", "Module 6", "Module 10"],
+        scenario_focus=["network_security", "system_administration", "technical_controls"],
+        description="You manage critical IT infrastructure and have elevated system access."
+    ),
+    
+    "Manager IT": RoleProfile(
+        role="Manager IT",
+        department="Information and Communication Technology",
+        risk_level=RiskLevel.HIGH,
+        technical_level=TechnicalLevel.ADVANCED,
+        mandatory_modules=["Module 1", "Module 2", "Module 3", "Module 4", "Module 7", "Module 8", "Module 9", "Module 10"],
+        recommended_modules=["Module 5", "Module 6"],
+        scenario_focus=["leadership", "incident_management", "policy_enforcement"],
+        description="You lead the IT team and are responsible for organizational security policies."
+    ),
+    
+    "IT Support Officer": RoleProfile(
+        role="IT Support Officer",
+        department="Information and Communication Technology", 
+        risk_level=RiskLevel.HIGH,
+        technical_level=TechnicalLevel.INTERMEDIATE,
+        mandatory_modules=["Module 1", "Module 2", "Module 3", "Module 7", "Module 8", "Module 9"],
+        recommended_modules=["Module 4", "Module 5", "Module 6", "Module 10"],
+        scenario_focus=["user_support", "device_management", "basic_security"],
+        description="You provide technical support and have access to user systems."
+    ),
+    
+    # Finance Department - High Risk
+    "Financial Accountant": RoleProfile(
+        role="Financial Accountant",
+        department="Finance",
+        risk_level=RiskLevel.HIGH,
+        technical_level=TechnicalLevel.INTERMEDIATE,
+        mandatory_modules=["Module 1", "Module 2", "Module 3", "Module 4", "Module 5"],
+        recommended_modules=["Module 6", "Module 7", "Module 8", "Module 10"],
+        scenario_focus=["financial_data", "business_email_compromise", "regulatory_compliance"],
+        description="You handle sensitive financial data and payment processing."
+    ),
+    
+    # Operations - Medium Risk
+    "Control Engineer": RoleProfile(
+        role="Control Engineer",
+        department="Operations and Maintenance",
+        risk_level=RiskLevel.MEDIUM,
+        technical_level=TechnicalLevel.INTERMEDIATE,
+        mandatory_modules=["Module 1", "Module 2", "Module 3", "Module 6", "Module 7"],
+        recommended_modules=["Module 4", "Module 5", "Module 8"],
+        scenario_focus=["operational_systems", "field_security", "remote_operations"],
+        description="You operate critical power systems and control infrastructure."
+    ),
+    
+    # HR Department - Medium Risk
+    "Human Resource Officer": RoleProfile(
+        role="Human Resource Officer",
+        department="Human Resource and Administration",
+        risk_level=RiskLevel.MEDIUM,
+        technical_level=TechnicalLevel.BASIC,
+        mandatory_modules=["Module 1", "Module 2", "Module 3", "Module 4", "Module 10"],
+        recommended_modules=["Module 5", "Module 6", "Module 8"],
+        scenario_focus=["personal_data", "social_engineering", "hr_processes"],
+        description="You handle employee personal information and confidential HR data."
+    ),
+    
+    # Administration - Standard Risk
+    "Administration Officer": RoleProfile(
+        role="Administration Officer", 
+        department="Human Resource and Administration",
+        risk_level=RiskLevel.STANDARD,
+        technical_level=TechnicalLevel.BASIC,
+        mandatory_modules=["Module 1", "Module 2", "Module 3", "Module 5", "Module 10"],
+        recommended_modules=["Module 4", "Module 6"],
+        scenario_focus=["office_security", "basic_awareness", "policy_compliance"],
+        description="You handle general administrative tasks and office coordination."
+    )
+}
+
+# --- ROLE-BASED HELPER FUNCTIONS ---
+def get_available_roles() -> List[str]:
+    """Get list of available roles for dropdown"""
+    return sorted(list(ROLE_PROFILES.keys())) + ["Other (Please specify)"]
+
+def get_user_profile(role: str, custom_role: str = None) -> Optional[RoleProfile]:
+    """Get role profile or create default for custom roles"""
+    if role == "Other (Please specify)" and custom_role:
+        return create_custom_profile(custom_role)
+    return ROLE_PROFILES.get(role)
+
+def create_custom_profile(custom_role: str) -> RoleProfile:
+    """Create profile for custom role based on keywords"""
+    role_lower = custom_role.lower()
+    
+    if any(keyword in role_lower for keyword in ['it', 'technical', 'engineer', 'system']):
+        risk_level = RiskLevel.HIGH
+        technical_level = TechnicalLevel.ADVANCED
+        mandatory_modules = ["Module 1", "Module 2", "Module 3", "Module 4", "Module 7", "Module 8", "Module 9"]
+    elif any(keyword in role_lower for keyword in ['finance', 'accounting', 'commercial']):
+        risk_level = RiskLevel.HIGH
+        technical_level = TechnicalLevel.INTERMEDIATE
+        mandatory_modules = ["Module 1", "Module 2", "Module 3", "Module 4", "Module 5"]
+    elif any(keyword in role_lower for keyword in ['manager', 'director', 'head', 'senior']):
+        risk_level = RiskLevel.MEDIUM
+        technical_level = TechnicalLevel.INTERMEDIATE
+        mandatory_modules = ["Module 1", "Module 2", "Module 3", "Module 4", "Module 10"]
+    else:
+        risk_level = RiskLevel.STANDARD
+        technical_level = TechnicalLevel.BASIC
+        mandatory_modules = ["Module 1", "Module 2", "Module 3", "Module 5"]
+    
+    return RoleProfile(
+        role=custom_role,
+        department="Custom/Other",
+        risk_level=risk_level,
+        technical_level=technical_level,
+        mandatory_modules=mandatory_modules,
+        recommended_modules=["Module 6", "Module 10"],
+        scenario_focus=["general_awareness"],
+        description=f"Custom role: {custom_role}"
+    )
+
+def customize_module_content(base_content: List, module_id: str, profile: RoleProfile = None) -> List:
+    """Customize module content based on user's role"""
+    customized = []
+    
+    for item in base_content:
+        if item["type"] == "instruction":
+            # Add role-specific context to instructions
+            enhanced_instruction = add_role_context(item["content"], profile)
+            customized.append({
+                "type": "instruction",
+                "content": enhanced_instruction
+            })
+            
+        elif item["type"] == "challenge":
+            # Use role-specific scenario if available
+            if module_id in ROLE_SPECIFIC_SCENARIOS and profile.role in ROLE_SPECIFIC_SCENARIOS[module_id]:
+                role_scenario = ROLE_SPECIFIC_SCENARIOS[module_id][profile.role]
+                customized.append({
+                    "type": "challenge",
+                    "content": {
+                        "prompt": role_scenario["scenario"],
+                        "correct_answer_keyword": item["content"]["correct_answer_keyword"],
+                        "focus": role_scenario["focus"],
+                        "hint": role_scenario["hint"],
+                        "reference_answers": role_scenario.get("reference_answers", {})
+                    }
+                })
+            else:
+                customized.append(item)
+        else:
+            customized.append(item)
+    
+    return customized
+
+def add_role_context(instruction: str, profile: RoleProfile = None) -> str:
+    """Add role-specific context to instruction text"""
+    if not profile:
+        return instruction
+    
+    role_intro = f"\n\n**👤 For {profile.role}s in {profile.department}:**\n"
+    role_intro = f"\n\n**👤 For {profile.role}s in {profile.department}:**\n"
+    role_intro += f"*{profile.description}*\n\n"
+    
+    if profile.technical_level == TechnicalLevel.ADVANCED:
+        technical_note = "This module includes advanced technical concepts relevant to your technical responsibilities."
+    elif profile.technical_level == TechnicalLevel.INTERMEDIATE:
+        technical_note = "This module focuses on practical security measures for your daily work."
+    else:
+        technical_note = "This module covers essential security basics for your role."
+    
+    risk_context = ""
+    if profile.risk_level == RiskLevel.HIGH:
+        risk_context = "\n\n⚠️ **High Risk Role**: Your position involves access to sensitive systems or data."
+    elif profile.risk_level == RiskLevel.MEDIUM:
+        risk_context = "\n\n⚡ **Medium Risk Role**: Your role involves some sensitive information access."
+    
+    return instruction + role_intro + technical_note + risk_context
+
+def get_personalized_modules(profile: RoleProfile = None) -> List[str]:
+    """Get personalized module list based on role"""
+    all_modules = profile.mandatory_modules + profile.recommended_modules
+    module_list = []
+    
+    for module_id in all_modules:
+        for full_module_name in ALL_MODULES.keys():
+            if full_module_name.startswith(module_id):
+                priority = "🔴 MANDATORY" if module_id in profile.mandatory_modules else "🟡 Recommended"
+                module_list.append(f"{priority} - {full_module_name}")
+                break
+    
+    return module_list
+
+# --- TRAINING SESSION ---
+@dataclass
+class TrainingSession:
+    """One trainee's conversation state; plain data, so any worker can load it from the session store"""
+    session_id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    user_name: str = ""
+    user_role: str = ""
+    custom_role: str = ""
+    messages: List[Dict[str, str]] = field(default_factory=list)
+    selected_module: Optional[str] = None
+    module_step: int = 0
+    current_module_content: List[dict] = field(default_factory=list)
+    completed_modules: Set[str] = field(default_factory=set)
+    llm_calls_avoided: int = 0
+    context_tokens_saved: int = 0
+
+    @property
+    def user_profile(self) -> Optional[RoleProfile]:
+        return get_user_profile(self.user_role, self.custom_role) if self.user_role else None
+
+    def start(self, name: str, role: str, custom_role: str = "") -> str:
+        """Record the trainee's details and open the chat with a personalised welcome"""
+        self.user_name = name
+        self.user_role = role
+        self.custom_role = custom_role
+
+        # Create personalized welcome message
+        profile = self.user_profile
+        if profile:
+            welcome_msg = f"Hello {name}! As a {profile.role} in {profile.department}, you play a key role in our security. "
+            welcome_msg += f"Your training is customized for your {profile.risk_level.value} risk level role. "
+            welcome_msg += "Check the sidebar for your personalized training modules!"
+        else:
+            welcome_msg = f"Hello {name}! I'm here to help with your cybersecurity training. You can start by selecting a training module from the sidebar."
+
+        self.messages = [{"role": "assistant", "content": welcome_msg}]
+        return welcome_msg
+
+    def select_module(self, module_name: str) -> str:
+        """Start a module, customised for the trainee's role, and return its first message"""
+        self.selected_module = module_name
+        self.module_step = 0
+        self.messages = []
+        base_content = ALL_MODULES[module_name]
+        profile = self.user_profile
+        if profile:
+            module_id = module_name.split(":")[0].strip()
+            self.current_module_content = customize_module_content(base_content, module_id, profile)
+        else:
+            self.current_module_content = base_content
+        first_message = self.current_module_content[0]["content"]
+
+        enhanced_message = first_message + "\n\n💬 **You can ask questions anytime during this module, or type 'continue' to proceed.**"
+        self.messages.append({"role": "assistant", "content": enhanced_message})
+        return enhanced_message
+
+    def leave_module(self) -> None:
+        """Back to the module list"""
+        self.selected_module = None
+        self.messages = [{"role": "assistant", "content": f"Welcome back, {self.user_name}! Select a new module to begin or ask a general question."}]
+
+    def add_message(self, role: str, content: str) -> None:
+        self.messages.append({"role": role, "content": content})
+
+    def to_dict(self) -> dict:
+        data = asdict(self)
+        data["completed_modules"] = sorted(self.completed_modules)
+        return data
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "TrainingSession":
+        known = {f.name for f in fields(cls)}
+        values = {name: value for name, value in data.items() if name in known}
+        values["completed_modules"] = set(values.get("completed_modules", []))
+        return cls(**values)
@@ -0,0 +1,232 @@
+"""HTTP and WebSocket service for the tutor, for deployments beyond one Streamlit process.
+
+Every worker loads its own TutorEngine on a background thread, so it answers
+health checks and session requests at once; chat requests get a 503 with
+Retry-After until ``/readyz`` reports the engine ready. Workers keep no
+conversation state: each request loads the trainee's TrainingSession from the
+session store (see session_store.py), runs the turn and saves the session
+back, so a load balancer can send any request to any worker. Scale out with
+more workers or hosts sharing one store::
+
+    UETCL_SESSION_STORE_URL=redis://cache:6379/0 uvicorn tutor_api:app --host 0.0.0.0 --port 8000 --workers 4
+    python tutor_api.py [--port 8000] [--workers 4]
+
+Endpoints:
+
+    POST   /sessions                   {"name", "role", "custom_role"} -> session
+    GET    /sessions/{id}              -> session
+    POST   /sessions/{id}/module       {"module"} -> session, starting that module
+    DELETE /sessions/{id}/module       -> session, back to the module list
+    POST   /sessions/{id}/messages     {"text"} -> {"reply", "session"}; 500 when the turn fails
+    WS     /sessions/{id}/chat         send {"text"}; receive {"type": "queue", "position"} while waiting for
+                                       the LLM (0 once admitted), {"type": "token", "text"} as the reply streams,
+                                       then {"type": "done", "reply"}; {"type": "error", "detail"} on bad
+                                       input, while the engine is still loading, or when the turn fails
+    GET    /healthz, GET /readyz       liveness; readiness (503 while the engine is still loading)
+    GET    /metrics                    Prometheus metrics
+
+Send one message at a time per session: concurrent turns on the same session
+each save their own copy, and the last one saved wins.
+"""
+import argparse
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import List, Optional
+
+from fastapi import FastAPI, HTTPException, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import PlainTextResponse
+from pydantic import BaseModel
+
+import config
+from llm_dispatcher import queue_listener
+from modules import ALL_MODULES
+from session_store import create_session_store
+from tracing import tracer
+from training_session import TrainingSession, get_available_roles
+from warmup import BackgroundLoader
+
+logger = logging.getLogger(__name__)
+
+
+class StartSession(BaseModel):
+    name: str
+    role: str
+    custom_role: str = ""
+
+
+class SelectModule(BaseModel):
+    module: str
+
+
+class ChatMessage(BaseModel):
+    text: str
+
+
+def _load_engine(on_progress):
+    from tutor_engine import create_tutor_engine
+
+    return create_tutor_engine(on_progress=on_progress)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    app.state.tutor = BackgroundLoader(_load_engine, name="tutor-engine-warmup").start()
+    app.state.store = create_session_store()
+    yield
+    app.state.tutor.close()
+
+
+app = FastAPI(title="UETCL AI Cybersecurity Tutor", lifespan=lifespan)
+
+
+def _load(request_app: FastAPI, session_id: str) -> TrainingSession:
+    session = request_app.state.store.load(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired session")
+    return session
+
+
+def _engine(request_app: FastAPI):
+    tutor: BackgroundLoader = request_app.state.tutor
+    if not tutor.ready:
+        detail = f"The tutor could not start: {tutor.error}" if tutor.failed else "The tutor is still loading"
+        raise HTTPException(status_code=503, detail=detail, headers={"Retry-After": str(int(config.WARMUP_POLL_SECONDS) or 1)})
+    return tutor.result()
+
+
+def _session_out(session: TrainingSession) -> dict:
+    return session.to_dict()
+
+
+@app.post("/sessions")
+def start_session(body: StartSession, request: Request) -> dict:
+    if body.role not in get_available_roles():
+        raise HTTPException(status_code=422, detail=f"Unknown role: {body.role}")
+    if body.role == "Other (Please specify)" and not body.custom_role:
+        raise HTTPException(status_code=422, detail="custom_role is required for 'Other (Please specify)'")
+    session = TrainingSession()
+    session.start(body.name, body.role, body.custom_role)
+    request.app.state.store.save(session)
+    return _session_out(session)
+
+
+@app.get("/sessions/{session_id}")
+def get_session(session_id: str, request: Request) -> dict:
+    return _session_out(_load(request.app, session_id))
+
+
+@app.post("/sessions/{session_id}/module")
+def select_module(session_id: str, body: SelectModule, request: Request) -> dict:
+    if body.module not in ALL_MODULES:
+        raise HTTPException(status_code=404, detail=f"Unknown module: {body.module}")
+    session = _load(request.app, session_id)
+    session.select_module(body.module)
+    request.app.state.store.save(session)
+    return _session_out(session)
+
+
+@app.delete("/sessions/{session_id}/module")
+def leave_module(session_id: str, request: Request) -> dict:
+    session = _load(request.app, session_id)
+    session.leave_module()
+    request.app.state.store.save(session)
+    return _session_out(session)
+
+
+@app.post("/sessions/{session_id}/messages")
+def send_message(session_id: str, body: ChatMessage, request: Request) -> dict:
+    # A sync endpoint, so FastAPI runs it in its thread pool and the blocking turn doesn't stall the event loop
+    engine = _engine(request.app)
+    session = _load(request.app, session_id)
+    try:
+        reply = engine.run_turn(session, body.text)
+    except Exception:
+        logger.exception("Chat turn failed for session %s", session_id)
+        raise HTTPException(status_code=500, detail="The tutor could not answer that message; please try again")
+    finally:
+        # Keep the message and whatever the turn recorded before it failed
+        request.app.state.store.save(session)
+    return {"reply": reply, "session": _session_out(session)}
+
+
+@app.websocket("/sessions/{session_id}/chat")
+async def chat(websocket: WebSocket, session_id: str) -> None:
+    await websocket.accept()
+    store = websocket.app.state.store
+    tutor: BackgroundLoader = websocket.app.state.tutor
+    loop = asyncio.get_running_loop()
+    try:
+        while True:
+            body = await websocket.receive_json()
+            text = body.get("text") if isinstance(body, dict) else None
+            session = await asyncio.to_thread(store.load, session_id)
+            if session is None or not text or not tutor.ready:
+                detail = "Unknown or expired session" if session is None else "Empty message" if not text else "The tutor is still loading"
+                await websocket.send_json({"type": "error", "detail": detail})
+                continue
+            engine = tutor.result()
+
+            # The turn runs in a worker thread; its queue positions and chunks cross back to the loop through this queue
+            events: asyncio.Queue = asyncio.Queue()
+
+            def put(event: Optional[dict]) -> None:
+                loop.call_soon_threadsafe(events.put_nowait, event)
+
+            def run_turn(session: TrainingSession = session, text: str = text) -> str:
+                try:
+                    with queue_listener(lambda position: put({"type": "queue", "position": position})):
+                        return engine.run_turn(session, text, on_chunk=lambda chunk: put({"type": "token", "text": chunk}))
+                finally:
+                    put(None)
+
+            turn = loop.run_in_executor(None, run_turn)
+            failed = False
+            try:
+                while (event := await events.get()) is not None:
+                    await websocket.send_json(event)
+            finally:
+                # Even if the client has gone or the turn failed, finish it and keep what it recorded in the session
+                try:
+                    reply = await turn
+                except Exception:
+                    logger.exception("Chat turn failed for session %s", session_id)
+                    failed = True
+                await asyncio.to_thread(store.save, session)
+            if failed:
+                await websocket.send_json({"type": "error", "detail": "The tutor could not answer that message; please try again"})
+                continue
+            await websocket.send_json({"type": "done", "reply": reply})
+    except WebSocketDisconnect:
+        pass
+
+
+@app.get("/healthz")
+def healthz() -> dict:
+    return {"status": "ok"}
+
+
+@app.get("/readyz")
+def readyz(request: Request) -> dict:
+    _engine(request.app)
+    return {"status": "ready"}
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics() -> str:
+    return tracer.render_prometheus()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Serve the tutor over HTTP and WebSocket.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=1, help="Worker processes, each with its own engine")
+    args = parser.parse_args(argv)
+    uvicorn.run("tutor_api:app", host=args.host, port=args.port, workers=args.workers)
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
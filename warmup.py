@@ -0,0 +1,78 @@
+"""Loading the tutor on a background thread, so the UI can render while it warms up.
+
+Building the engine imports LangChain, FAISS and the embedding model and loads
+(or, the first time, builds) the index, which takes from seconds to minutes.
+``BackgroundLoader`` runs that on a daemon thread from process start; the UI
+renders straight away and asks ``ready`` before enabling anything that needs
+the result. Progress reported by the load (e.g. ``rag_index.BuildProgress``)
+is kept in ``progress`` for the UI to display, since only the script thread
+may draw.
+"""
+import logging
+import threading
+import time
+from typing import Any, Callable, Generic, Optional, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class BackgroundLoader(Generic[T]):
+    """Runs load(on_progress) once on a daemon thread and holds its result or error"""
+
+    def __init__(self, load: Callable[[Callable[[Any], None]], T], name: str = "background-loader"):
+        self._load = load
+        self._done = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._result: Optional[T] = None
+        self.error: Optional[BaseException] = None
+        self.progress: Any = None
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+
+    def start(self) -> "BackgroundLoader[T]":
+        self.started_at = time.monotonic()
+        self._thread.start()
+        return self
+
+    def _run(self) -> None:
+        try:
+            self._result = self._load(self._report)
+        except BaseException as exc:
+            logger.exception("Background load %s failed", self._thread.name)
+            self.error = exc
+        finally:
+            self.finished_at = time.monotonic()
+            self._done.set()
+
+    def _report(self, progress: Any) -> None:
+        self.progress = progress
+
+    @property
+    def ready(self) -> bool:
+        """The load finished successfully"""
+        return self._done.is_set() and self.error is None
+
+    @property
+    def failed(self) -> bool:
+        return self._done.is_set() and self.error is not None
+
+    def result(self, timeout: Optional[float] = None) -> T:
+        """The loaded value, waiting up to timeout seconds (forever if None) for it"""
+        if not self._done.wait(timeout):
+            raise TimeoutError(f"{self._thread.name} is still loading")
+        if self.error is not None:
+            raise self.error
+        return self._result
+
+    def close(self) -> None:
+        """Release a loaded value that holds threads or files, when the loader is being discarded"""
+        if self.ready and hasattr(self._result, "close"):
+            self._result.close()
+
+    def elapsed_seconds(self) -> float:
+        """Time the load took, or has taken so far"""
+        if self.started_at is None:
+            return 0.0
+        return (self.finished_at or time.monotonic()) - self.started_at